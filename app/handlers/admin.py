@@ -0,0 +1,101 @@
+import html
+import logging
+from datetime import datetime
+
+from aiogram import F, Router, types
+from aiogram.filters import Command, CommandObject
+
+from app.services import csv_cache
+from app.services.config import cfg
+from app.services.profiler import profiler
+from app.services.sender import sender
+from app.services.workers import run_io
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+# остальным пользователям эти команды не видны — апдейт уходит дальше по роутерам
+router.message.filter(F.from_user.id.in_(set(cfg.admin_ids)))
+
+PROFILE_USAGE = (
+    "/profile — состояние\n"
+    "/profile on | off\n"
+    "/profile rate 0.05 — доля профилируемых апдейтов\n"
+    "/profile slow 800 — порог медленного апдейта, мс (0 — не ловить)\n"
+    "/profiles — сохранённые снимки\n"
+    "/profile_get &lt;id&gt; — скачать снимок"
+)
+
+
+def _status() -> str:
+    st = profiler.stats()
+    return (
+        f"Профилирование: <b>{'вкл' if profiler.enabled else 'выкл'}</b>\n"
+        f"доля: {profiler.sample_rate:g}, порог: {profiler.slow_ms:g} мс\n"
+        f"профилей: {st['profiled']}, медленных: {st['slow']}, сохранено: {st['captured']}, "
+        f"пропущено (занято): {st['busy']}"
+    )
+
+
+@router.message(Command("profile"))
+async def cmd_profile(message: types.Message, command: CommandObject) -> None:
+    logger.info("Администратор %s: %s", message.from_user.id, message.text)
+    args = (command.args or "").split()
+    try:
+        if not args:
+            pass
+        elif args[0] in ("on", "off") and len(args) == 1:
+            profiler.configure(enabled=args[0] == "on")
+        elif args[0] == "rate" and len(args) == 2:
+            profiler.configure(sample_rate=float(args[1]))
+        elif args[0] == "slow" and len(args) == 2:
+            profiler.configure(slow_ms=float(args[1]))
+        else:
+            raise ValueError(args[0])
+    except ValueError:
+        await sender.answer(message, PROFILE_USAGE, parse_mode="HTML")
+        return
+    await sender.answer(message, _status(), parse_mode="HTML")
+
+
+@router.message(Command("profiles"))
+async def cmd_profiles(message: types.Message) -> None:
+    logger.info("Администратор %s: %s", message.from_user.id, message.text)
+    captures = await run_io(profiler.list_captures)
+    if not captures:
+        await sender.answer(message, "Снимков пока нет.\n\n" + PROFILE_USAGE, parse_mode="HTML")
+        return
+    lines = [
+        f"<code>{html.escape(c.id)}</code>\n"
+        f"{datetime.fromtimestamp(c.created):%d.%m %H:%M:%S} · {c.kind} · {html.escape(c.handler)} · "
+        f"{c.wall_ms:.0f} мс · {c.size // 1024} КБ"
+        for c in captures
+    ]
+    await sender.answer_many(message, lines, merge=True, parse_mode="HTML")
+
+
+@router.message(Command("profile_get"))
+async def cmd_profile_get(message: types.Message, command: CommandObject) -> None:
+    logger.info("Администратор %s: %s", message.from_user.id, message.text)
+    path = profiler.capture_path((command.args or "").strip())
+    if path is None:
+        await sender.answer(message, "Снимок не найден. Список: /profiles")
+        return
+    await sender.call(message.chat.id, lambda: message.answer_document(types.FSInputFile(path)))
+
+
+@router.message(Command("sheet_csv"))
+async def cmd_sheet_csv(message: types.Message, command: CommandObject) -> None:
+    logger.info("Администратор %s: %s", message.from_user.id, message.text)
+    arg = (command.args or "").strip()
+    if not arg.isdigit() or int(arg) not in cfg.gids:
+        gids = ", ".join(map(str, cfg.gids))
+        await sender.answer(message, f"/sheet_csv &lt;gid&gt; — исходный CSV листа\nЛисты: {gids}", parse_mode="HTML")
+        return
+    gid = int(arg)
+    data = await csv_cache.raw_csv(gid)
+    if data is None:
+        await sender.answer(message, f"❌ Не удалось получить CSV листа {gid}.")
+        return
+    document = types.BufferedInputFile(data, filename=f"gid_{gid}.csv")
+    await sender.call(message.chat.id, lambda: message.answer_document(document, caption=f"Исходный CSV листа {gid}"))
@@ -0,0 +1,84 @@
+import html
+import logging
+from datetime import datetime
+from typing import List
+from zoneinfo import ZoneInfo
+
+from aiogram import Router, types
+from aiogram.filters import Command
+
+from app.services.changes import ADDED, REMOVED, GroupDiff, LessonChange, change_feed
+from app.services.config import cfg
+from app.services.sender import MESSAGE_LIMIT, sender
+from app.services.user_state import user_states
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+FIELD_NAMES = {
+    "subject": "предмет",
+    "type": "вид",
+    "building": "здание",
+    "room1": "ауд.",
+    "room2": "ауд.",
+    "teacher": "преподаватель",
+}
+SHORT_DAYS = {
+    "Понедельник": "Пн", "Вторник": "Вт", "Среда": "Ср", "Четверг": "Чт", "Пятница": "Пт", "Суббота": "Сб",
+}
+
+
+def _slot(ch: LessonChange) -> str:
+    week = f" [{ch.week_type}]" if ch.week_type else ""
+    return f"{SHORT_DAYS.get(ch.day, ch.day)} {ch.time}{week}"
+
+
+def format_change(ch: LessonChange) -> str:
+    if ch.kind == ADDED:
+        return f"➕ {_slot(ch)}: {html.escape(ch.new.subject)}"
+    if ch.kind == REMOVED:
+        return f"➖ {_slot(ch)}: {html.escape(ch.old.subject)}"
+    details = "; ".join(
+        f"{FIELD_NAMES[f]} {html.escape(old or '—')} → {html.escape(new or '—')}" for f, old, new in ch.fields()
+    )
+    return f"✏️ {_slot(ch)}: {html.escape(ch.new.subject)}" + (f" ({details})" if details else "")
+
+
+def format_diffs(diffs: List[GroupDiff]) -> str:
+    # одно сообщение: строки добавляются, пока влезают в лимит; разметку не режем, остаток считаем
+    group = diffs[0].group
+    tz = ZoneInfo(cfg.tz)
+    entries = []
+    for d in diffs:
+        stamp = f"\n<i>{datetime.fromtimestamp(d.at, tz):%d.%m %H:%M}</i>"
+        entries += [([stamp] if i == 0 else []) + [format_change(ch)] for i, ch in enumerate(d.changes)]
+
+    lines = [f"🔔 <b>Изменения в расписании группы {group}</b>"]
+    size = len(lines[0])
+    reserve = len(f"\n\n…и ещё {len(entries)} изменений")
+    shown = 0
+    for entry in entries:
+        cost = sum(len(line) + 1 for line in entry)
+        if size + cost + reserve > MESSAGE_LIMIT:
+            break
+        lines += entry
+        size += cost
+        shown += 1
+    if shown < len(entries):
+        lines.append(f"\n…и ещё {len(entries) - shown} изменений")
+    return "\n".join(lines)
+
+
+@router.message(Command("changes"))
+async def cmd_changes(message: types.Message) -> None:
+    logger.info("Пользователь %s: %s", message.from_user.id, message.text)
+    state = await user_states.get(message.from_user.id)
+    if state is None:
+        await sender.answer(message, "Сначала найдите свою группу — отправьте её номер, например 8251160.")
+        return
+    diffs = change_feed.recent(state.group)
+    if not diffs:
+        await sender.answer(message, f"С момента запуска бота расписание группы <b>{state.group}</b> не менялось.",
+                            parse_mode="HTML")
+        return
+    await sender.answer(message, format_diffs(diffs), parse_mode="HTML")
@@ -0,0 +1,47 @@
+import logging
+from datetime import date
+from typing import Optional
+
+from aiogram import Router, types
+from aiogram.filters import Command
+
+from app.handlers.schedule_buttons import render_date
+from app.services.digest import digest_store
+from app.services.semester import calendar_index
+from app.services.sender import sender
+from app.services.user_state import user_states
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+
+def render_digest(group: str, day: date) -> Optional[str]:
+    # None — рассылать нечего: воскресенье, праздник, группа пропала или в этот день нет пар
+    if not calendar_index.on(group, day):
+        return None
+    return f"☀️ Доброе утро! Расписание группы <b>{group}</b> на сегодня:\n\n" + render_date(group, day)
+
+
+@router.message(Command("subscribe"))
+async def cmd_subscribe(message: types.Message) -> None:
+    logger.info("Пользователь %s: %s", message.from_user.id, message.text)
+    state = await user_states.get(message.from_user.id)
+    if state is None:
+        await sender.answer(message, "Сначала найдите свою группу — отправьте её номер, например 8251160.")
+        return
+    await digest_store.subscribe(message.from_user.id, message.chat.id)
+    await sender.answer(
+        message,
+        f"🔔 Каждое утро буду присылать расписание группы <b>{state.group}</b> на день.\n"
+        "Отписаться: /unsubscribe",
+        parse_mode="HTML",
+    )
+
+
+@router.message(Command("unsubscribe"))
+async def cmd_unsubscribe(message: types.Message) -> None:
+    logger.info("Пользователь %s: %s", message.from_user.id, message.text)
+    if await digest_store.unsubscribe(message.from_user.id):
+        await sender.answer(message, "🔕 Вы отписались от утренней рассылки.")
+    else:
+        await sender.answer(message, "Вы не подписаны на рассылку. Подписаться: /subscribe")
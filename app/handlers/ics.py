@@ -0,0 +1,37 @@
+import logging
+
+from aiogram import Router, types
+from aiogram.filters import Command
+
+from app.services import ics
+from app.services.sender import sender
+from app.services.user_state import user_states
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+
+@router.message(Command("ics"))
+async def cmd_ics(message: types.Message) -> None:
+    logger.info("Пользователь %s: %s", message.from_user.id, message.text)
+    state = await user_states.get(message.from_user.id)
+    if state is None:
+        await sender.answer(message, "Сначала найдите свою группу — отправьте её номер, например 8251160.")
+        return
+    url = ics.feed_url(state.group)
+    if url is not None:
+        await sender.answer(
+            message,
+            f"🗓 Подписка на расписание группы <b>{state.group}</b>:\n{url}\n\n"
+            "Добавьте ссылку в Google Календарь («Добавить по URL») или в календарь телефона — "
+            "изменения подтянутся сами.",
+            parse_mode="HTML", disable_web_page_preview=True,
+        )
+        return
+    feed = await ics.feeds.get(state.group)
+    if feed is None:
+        await sender.answer(message, "❌ Расписание группы не найдено.")
+        return
+    document = types.BufferedInputFile(feed[1], filename=f"{state.group}.ics")
+    await sender.call(message.chat.id, lambda: message.answer_document(
+        document, caption="🗓 Откройте файл, чтобы добавить занятия семестра в календарь."))
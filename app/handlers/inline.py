@@ -0,0 +1,105 @@
+import logging
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import List, Tuple
+
+from aiogram import Router, types
+
+from app.handlers.schedule_buttons import get_day_name, render_date
+from app.services import schedule_store
+from app.services.config import cfg
+from app.services.group_search import group_search, normalize_query
+from app.services.semester import local_now, local_today, week_dates
+from app.services.sender import MESSAGE_LIMIT
+from app.services.user_state import user_states
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+INLINE_LIMIT = 10
+
+# (группа, дата, поколение хранилища) -> готовые статьи; новое поколение само вытесняет старые
+_answers: "OrderedDict[Tuple[str, date, int], Tuple[types.InlineQueryResultArticle, ...]]" = OrderedDict()
+
+
+def _article(result_id: str, title: str, description: str, text: str) -> types.InlineQueryResultArticle:
+    return types.InlineQueryResultArticle(
+        id=result_id,
+        title=title,
+        description=description,
+        input_message_content=types.InputTextMessageContent(
+            message_text=text, parse_mode="HTML", disable_web_page_preview=True
+        ),
+    )
+
+
+def _more_days(n: int) -> str:
+    return f"\n\n… ещё дней: {n} — полное расписание в боте, кнопка «📋 Вся неделя»"
+
+
+def _week_text(group: str, today: date) -> str:
+    # в инлайн-ответе только одно сообщение: берём дни целиком, пока влезают, разметку не режем
+    dates = week_dates(today)
+    text = f"📆 <b>Расписание на неделю</b>\nГруппа: <b>{group}</b>"
+    for i, d in enumerate(dates):
+        day = render_date(group, d)
+        left = len(dates) - i - 1
+        if len(text) + 2 + len(day) + (len(_more_days(left)) if left else 0) > MESSAGE_LIMIT:
+            return text + _more_days(left + 1)
+        text += "\n\n" + day
+    return text
+
+
+def _build(group: str, today: date) -> Tuple[types.InlineQueryResultArticle, ...]:
+    tomorrow = today + timedelta(days=1)
+    day_today, day_tomorrow = get_day_name(0), get_day_name(1)
+    stamp = today.isoformat()
+    return (
+        _article(f"{group}:d:{stamp}", f"{group} — сегодня", day_today,
+                 f"Группа <b>{group}</b>\n" + render_date(group, today)),
+        _article(f"{group}:t:{stamp}", f"{group} — завтра", day_tomorrow,
+                 f"Группа <b>{group}</b>\n" + render_date(group, tomorrow)),
+        _article(f"{group}:w:{stamp}", f"{group} — неделя", "Текущая неделя",
+                 _week_text(group, today)),
+    )
+
+
+def get_answers(group: str, today: date) -> Tuple[types.InlineQueryResultArticle, ...]:
+    key = (group, today, schedule_store.current().generation)
+    answers = _answers.get(key)
+    if answers is None:
+        answers = _answers[key] = _build(group, today)
+        while len(_answers) > cfg.inline_cache_size:
+            _answers.popitem(last=False)
+    else:
+        _answers.move_to_end(key)
+    return answers
+
+
+def _seconds_until_midnight() -> int:
+    now = local_now()
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=now.tzinfo)
+    return int((midnight - now).total_seconds())
+
+
+@router.inline_query()
+async def inline_schedule(query: types.InlineQuery) -> None:
+    text = normalize_query(query.query)
+    today = local_today()
+    # «сегодня» меняется в полночь, поэтому Telegram не должен кэшировать ответ дольше
+    cache_time = max(1, min(cfg.inline_cache_sec, _seconds_until_midnight()))
+
+    if not text:
+        # пустой запрос — подставляем сохранённую группу пользователя, ответ у каждого свой
+        state = await user_states.get(query.from_user.id)
+        results: List[types.InlineQueryResultArticle] = []
+        if state is not None and state.group in group_search:
+            results = list(get_answers(state.group, today))
+        await query.answer(results, cache_time=cache_time, is_personal=True)
+        return
+
+    if text in group_search:
+        results = list(get_answers(text, today))
+    else:
+        results = [get_answers(code, today)[0] for code in group_search.suggest(text, INLINE_LIMIT)]
+    await query.answer(results, cache_time=cache_time, is_personal=False)
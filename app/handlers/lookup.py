@@ -0,0 +1,149 @@
+import html
+import logging
+import re
+from datetime import date
+from typing import List, Sequence
+
+from aiogram import Router, types
+from aiogram.filters import Command, CommandObject
+
+from app.handlers.schedule_buttons import day_off_reason, filter_by_week_type
+from app.services.reverse_index import Booking, reverse_index
+from app.services.semester import DAYS, LESSON_MINUTES, local_today, semester
+from app.services.sender import MESSAGE_LIMIT, sender
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+_TIME_RE = re.compile(r"^(\d{1,2})[:.](\d{2})$")
+
+
+def _minutes(time_str: str) -> int:
+    m = _TIME_RE.match((time_str or "").strip())
+    return int(m.group(1)) * 60 + int(m.group(2)) if m else -1
+
+
+def _on(bookings: Sequence[Booking], d: date) -> List[Booking]:
+    # чётность недели и выходные — по календарю семестра, как в расписании группы
+    if semester.day_off(d) is not None:
+        return []
+    day_list = filter_by_week_type(bookings, semester.week_type(d))
+    return sorted(day_list, key=lambda b: _minutes(b.time))
+
+
+def _day_line(d: date) -> str:
+    reason = day_off_reason(d)
+    return f"{DAYS[d.weekday()]}" + (f" — занятий нет, {reason}" if reason else "")
+
+
+def _format_booking(b: Booking, with_teacher: bool = True, with_place: bool = True) -> str:
+    lines = [f"⏰ {b.time}" + (f" [{b.week_type}]" if b.week_type else ""), html.escape(b.subject)]
+    if b.type:
+        lines.append(f"({html.escape(b.type)})")
+    if with_place:
+        rooms = ", ".join(b.rooms)
+        place = ", ".join(x for x in (html.escape(b.building), f"<i>ауд. {html.escape(rooms)}</i>" if rooms else "") if x)
+        if place:
+            lines.append(place)
+    if with_teacher and b.teacher:
+        lines.append(html.escape(b.teacher))
+    lines.append("Группы: " + ", ".join(b.groups))
+    return "\n".join(lines)
+
+
+def _rooms_blocks(building: str, rooms: Sequence[str]) -> List[str]:
+    # список аудиторий большого здания может не влезть в одно сообщение — делим по границам номеров
+    header = f"<b>{html.escape(building)}</b>"
+    if not rooms:
+        return [f"{header}\nнет свободных"]
+    blocks, line = [], ""
+    for room in map(html.escape, rooms):
+        if line and len(header) + len(line) + len(room) + 3 > MESSAGE_LIMIT:
+            blocks.append(f"{header}\n{line}")
+            header, line = f"<b>{html.escape(building)}</b> (продолжение)", ""
+        line = f"{line}, {room}" if line else room
+    blocks.append(f"{header}\n{line}")
+    return blocks
+
+
+@router.message(Command("teacher"))
+async def cmd_teacher(message: types.Message, command: CommandObject) -> None:
+    logger.info("Пользователь %s: %s", message.from_user.id, message.text)
+    if not command.args:
+        await sender.answer(message, "Использование: /teacher <Фамилия>\nПример: /teacher Петров")
+        return
+
+    keys = reverse_index.find_teachers(command.args)
+    if not keys:
+        await sender.answer(message, f"❌ Преподаватель <b>{html.escape(command.args)}</b> не найден.",
+                            parse_mode="HTML")
+        return
+    if len(keys) > 1:
+        names = "\n".join(f"• {html.escape(reverse_index.teachers[k][0])}" for k in keys)
+        await sender.answer(message, f"Нашлось несколько преподавателей, уточните ФИО:\n{names}",
+                            parse_mode="HTML")
+        return
+
+    name, bookings = reverse_index.teachers[keys[0]]
+    d = local_today()
+    day_name = DAYS[d.weekday()]
+    today = _on([b for b in bookings if b.day == day_name], d)
+    header = f"👤 <b>{html.escape(name)}</b>\n{_day_line(d)}"
+    if not today:
+        await sender.answer(message, header if day_off_reason(d) else f"{header}\n\nЗанятий нет",
+                            parse_mode="HTML")
+        return
+    await sender.answer_many(
+        message,
+        [header] + [_format_booking(b, with_teacher=False) for b in today],
+        parse_mode="HTML", disable_web_page_preview=True,
+    )
+
+
+@router.message(Command("room"))
+async def cmd_room(message: types.Message, command: CommandObject) -> None:
+    logger.info("Пользователь %s: %s", message.from_user.id, message.text)
+    parts = (command.args or "").split()
+    if not parts:
+        await sender.answer(
+            message,
+            "Использование:\n"
+            "/room <аудитория> — занятость аудитории сегодня, например /room 622\n"
+            "/room <здание> <время> — свободные аудитории, например /room Кремлевская 10:10",
+        )
+        return
+
+    d = local_today()
+    day_name = DAYS[d.weekday()]
+    at = _minutes(parts[-1])
+    if at >= 0 and len(parts) > 1:
+        building = " ".join(parts[:-1])
+        found = reverse_index.building_rooms(building)
+        if not found:
+            await sender.answer(message, f"❌ Здание <b>{html.escape(building)}</b> не найдено.", parse_mode="HTML")
+            return
+        blocks = [f"🚪 <b>Свободные аудитории в {parts[-1]}</b>\n{_day_line(d)}"]
+        for bld, rooms in sorted(found.items()):
+            free = [
+                room for room in rooms
+                if not any(0 <= at - _minutes(b.time) < LESSON_MINUTES
+                           for b in _on(reverse_index.room_day(bld, room, day_name), d))
+            ]
+            blocks += _rooms_blocks(bld, sorted(free, key=lambda x: (len(x), x)))
+        # зданий может быть много: всё, что не влезло в одно сообщение, уходит следующими
+        await sender.answer_many(message, blocks, merge=True, parse_mode="HTML")
+        return
+
+    room, building = parts[-1], " ".join(parts[:-1])
+    keys = reverse_index.find_rooms(room, building)
+    if not keys:
+        await sender.answer(message, f"❌ Аудитория <b>{html.escape(room)}</b> не найдена.", parse_mode="HTML")
+        return
+
+    blocks = []
+    for bld, r in keys:
+        today = _on(reverse_index.room_day(bld, r, day_name), d)
+        blocks.append(f"🚪 <b>{html.escape(bld)}, ауд. {html.escape(r)}</b>\n{_day_line(d)}")
+        if not day_off_reason(d):
+            blocks += [_format_booking(b, with_place=False) for b in today] or ["Занятий нет"]
+    await sender.answer_many(message, blocks, parse_mode="HTML", disable_web_page_preview=True)
@@ -1,86 +1,114 @@
 import html
 import logging
-from aiogram import Router, types
+from aiogram import F, Router, types
 from aiogram.filters import Command
+from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+from app.services import logs
 from app.services.config import cfg
-from app.handlers.schedule_buttons import get_schedule_keyboard, user_data
-from app.services.csv_cache import find_group_schedule_local
-from app.services.parser import parse_schedule
+from app.handlers.schedule_buttons import get_schedule_keyboard
+from app.services.group_search import group_search, normalize_query
+from app.services.schedule_store import get_lessons
+from app.services.sender import sender
+from app.services.user_state import user_states
 
 router = Router()
 logger = logging.getLogger(__name__)
 
 
-def _norm_group(s: str) -> str:
-    return "".join(ch for ch in (s or "") if ch.isdigit())
+SUGGEST_LIMIT = 8
+
+
+def get_candidates_keyboard(codes):
+    builder = InlineKeyboardBuilder()
+    for code in codes:
+        builder.add(types.InlineKeyboardButton(text=code, callback_data=f"grp:{code}"))
+    builder.adjust(2)
+    return builder.as_markup()
+
+
+async def _show_group(message: types.Message, user_id: int, group: str) -> None:
+    logs.bind(group=group)
+    lessons = get_lessons(group)
+    if lessons is None:
+        await sender.answer(
+            message,
+            f"❌ Группа <b>{html.escape(group)}</b> не найдена.\n"
+            "Проверьте правильность написания номера группы.",
+            parse_mode="HTML",
+        )
+        return
+
+    user_states.set_group(user_id, group)
+
+    if not lessons:
+        await sender.answer(
+            message,
+            f"ℹ️ Группа <b>{html.escape(group)}</b> найдена, но расписание пустое.\n"
+            "Возможно, на этой неделе нет занятий.",
+            parse_mode="HTML",
+        )
+        return
+
+    await sender.answer(
+        message,
+        f"✅ Группа <b>{html.escape(group)}</b> найдена!\n"
+        "Выберите период для просмотра:",
+        parse_mode="HTML",
+        reply_markup=get_schedule_keyboard(),
+    )
 
 
 @router.message(Command("schedule"))
-@router.message(lambda message: message.text and not message.text.startswith("/"))
+# сообщения, отправленные через инлайн-режим (via_bot), — это уже готовое расписание, а не запрос
+@router.message(lambda message: message.text and not message.text.startswith("/") and not message.via_bot)
 async def cmd_schedule(message: types.Message) -> None:
     logger.info("Пользователь %s запросил расписание: %s", message.from_user.id, message.text)
 
     if message.text.startswith("/"):
         args = (message.text or "").split(maxsplit=1)[1:]
         if not args:
-            await message.answer("Использование: /schedule <Группа>\nПример: /schedule 09-825")
+            await sender.answer(message, "Использование: /schedule <Группа>\nПример: /schedule 09-825")
             return
         group_input = args[0]
     else:
         group_input = message.text.strip()
 
-    group = _norm_group(group_input)
-    if not group:
-        await message.answer(
+    query = normalize_query(group_input)
+    if not query:
+        await sender.answer(
+            message,
             "Не распознал номер группы. Пример: 8251160\n"
             "Попробуйте еще раз:"
         )
         return
 
-    if len(group) != 7:
-        await message.answer(
-            "❗Номер группы должен содержать ровно 7 цифр.\n"
-            "Попробуйте снова:"
-        )
+    if query in group_search:
+        await _show_group(message, message.from_user.id, query)
         return
 
-    status_msg = await message.answer(f"🔍 Ищу группу {group}...")
-
-    csv_text = find_group_schedule_local(group)
-    if not csv_text:
-        await status_msg.edit_text(
-            f"❌ Группа <b>{html.escape(group)}</b> не найдена.\n"
+    candidates = group_search.suggest(query, SUGGEST_LIMIT)
+    if not candidates:
+        await sender.answer(
+            message,
+            f"❌ Группа <b>{html.escape(query)}</b> не найдена.\n"
             "Проверьте правильность написания номера группы.",
             parse_mode="HTML",
         )
         return
 
-    try:
-        lessons = parse_schedule(csv_text, group)
-    except Exception as e:
-        logger.exception("Ошибка парсинга для группы %s", group)
-        await status_msg.edit_text(
-            f"▲ Ошибка обработки: <code>{html.escape(str(e))}</code>",
-            parse_mode="HTML",
-        )
-        return
-
-    user_data[message.from_user.id] = (group, lessons)
-
-    if not lessons:
-        await status_msg.edit_text(
-            f"ℹ️ Группа <b>{html.escape(group)}</b> найдена, но расписание пустое.\n"
-            "Возможно, на этой неделе нет занятий.",
-            parse_mode="HTML",
-        )
-        return
+    total = group_search.count_prefix(query)
+    more = f"\nПоказаны первые {len(candidates)} из {total}, уточните номер." if total > len(candidates) else ""
+    await sender.answer(
+        message,
+        f"🔎 Возможно, вы имели в виду одну из групп:{more}",
+        reply_markup=get_candidates_keyboard(candidates),
+    )
 
-    await status_msg.delete()
 
-    await message.answer(
-        f"✅ Группа <b>{html.escape(group)}</b> найдена!\n"
-        "Выберите период для просмотра:",
-        parse_mode="HTML",
-        reply_markup=get_schedule_keyboard(),
-    )
+@router.callback_query(F.data.startswith("grp:"))
+async def pick_group(callback: types.CallbackQuery) -> None:
+    group = callback.data.split(":", 1)[1]
+    logger.info("Пользователь %s выбрал группу: %s", callback.from_user.id, group)
+    await callback.answer()
+    await _show_group(callback.message, callback.from_user.id, group)
@@ -1,14 +1,21 @@
 import logging
-from datetime import datetime, timedelta, date
-from typing import Dict, List, Tuple
-import re
+from datetime import timedelta, date
+from typing import List, Optional, Sequence
 from aiogram import Router, types
 from aiogram.utils.keyboard import ReplyKeyboardBuilder
 
+from app.services import logs
+from app.services.render_cache import render_cache
+from app.services.reverse_index import split_teachers
+from app.services.schedule_store import Lesson, get_lessons
+from app.services.semester import DAYS, HOLIDAY, calendar_index, local_today, norm_week, semester, week_dates
+from app.services.sender import sender
+from app.services.user_state import user_states
+
 router = Router()
 logger = logging.getLogger(__name__)
 
-user_data: Dict[int, Tuple[str, List[dict]]] = {}
+DAYS_ORDER = DAYS[:6]  # без воскресенья
 
 
 def get_schedule_keyboard():
@@ -32,13 +39,12 @@ def get_week_menu_keyboard():
 
 
 def get_day_name(day_offset: int = 0):
-    days = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье"]
-    today = datetime.now() + timedelta(days=day_offset)
-    return days[today.weekday()]
+    today = local_today() + timedelta(days=day_offset)
+    return DAYS[today.weekday()]
 
 
-def filter_lessons_by_day(lessons: List[dict], day_name: str):
-    return [lesson for lesson in lessons if lesson.get("day") == day_name]
+def filter_lessons_by_day(lessons: Sequence[Lesson], day_name: str):
+    return [lesson for lesson in lessons if lesson.day == day_name]
 
 
 def _time_to_minutes(time_str: str):
@@ -46,45 +52,46 @@ def _time_to_minutes(time_str: str):
     return hours * 60 + minutes
 
 
-def get_current_week_type(start_date: date = date(2025, 9, 1),target_date: date | None = None,):
-    d = target_date or date.today()
+def get_current_week_type(start_date: date | None = None, target_date: date | None = None):
+    # начало семестра и чётность — из настроек (SEMESTER_START)
+    d = target_date or local_today()
+    if start_date is None:
+        return semester.week_type(d)
     weeks_passed = (d - start_date).days // 7
     return "в" if weeks_passed % 2 == 0 else "н"
 
 
-def _norm_week(x: str) -> str:
-    x = (x or "").strip().lower()
-    return "в" if x.startswith("в") else ("н" if x.startswith("н") else x)
+def filter_by_week_type(lessons: Sequence[Lesson], week_type: str) -> list[Lesson]:
+    return [l for l in lessons if not l.week_type or norm_week(l.week_type) == week_type]
 
 
-def filter_by_week(lessons: list[dict], target_date: date | None = None) -> list[dict]:
-    wt = get_current_week_type(target_date=target_date)
-    return [l for l in lessons if not l.get("week_type") or _norm_week(l.get("week_type")) == wt]
+def filter_by_week(lessons: Sequence[Lesson], target_date: date | None = None) -> list[Lesson]:
+    return filter_by_week_type(lessons, get_current_week_type(target_date=target_date))
 
 
-def format_day_schedule(lessons: List[dict], day_name: str, show_week_per_lesson: bool = False):
+def format_day_schedule(lessons: Sequence[Lesson], day_name: str, show_week_per_lesson: bool = False):
     if not lessons:
         return f"<b>{day_name}</b>\n\nЗанятий нет\n"
 
-    lessons.sort(key=lambda l: _time_to_minutes(l.get("time", "")))
+    lessons = sorted(lessons, key=lambda l: _time_to_minutes(l.time))
 
     if show_week_per_lesson:
         header = f"<b>{day_name}</b>"
     else:
-        week = (lessons[0].get("week_type") or "").strip()
+        week = (lessons[0].week_type or "").strip()
         header = f"<b>{day_name} [{week}]</b>" if week else f"<b>{day_name}</b>"
 
     sep = "—" * 20
     out = [header, sep]
     for les in lessons:
-        time = les.get("time", "") or ""
-        week = (les.get("week_type") or "").strip()
-        subj = les.get("subject", "") or ""
-        ltype = les.get("type", "") or ""
-        building = les.get("building", "") or ""
-        room1 = les.get("room1", "") or ""
-        room2 = les.get("room2", "") or ""
-        traw = les.get("teacher", "") or ""
+        time = les.time
+        week = les.week_type.strip()
+        subj = les.subject
+        ltype = les.type
+        building = les.building
+        room1 = les.room1
+        room2 = les.room2
+        traw = les.teacher
 
         line_time = f"⏰ {time}" + (f" [{week}]" if show_week_per_lesson and week else "")
         line_subject = f"{subj}" if subj else ""
@@ -94,9 +101,7 @@ def format_day_schedule(lessons: List[dict], day_name: str, show_week_per_lesson
         loc_parts = ([building] if building else []) + ([f"<i>ауд. {rooms}</i>"] if rooms else [])
         loc = ", ".join(loc_parts)
 
-        clean_t = re.sub(r'[\u00A0\u2000-\u200B]', ' ', traw)
-        teachers = [s.strip() for s in re.split(r'[;,]|\s{2,}|\t+', clean_t) if s.strip()]
-        teach = ", ".join(teachers)
+        teach = ", ".join(split_teachers(traw))
 
         line_place = " — ".join([loc, teach]) if (loc and teach) else (loc or teach)
 
@@ -107,6 +112,70 @@ def format_day_schedule(lessons: List[dict], day_name: str, show_week_per_lesson
     return "\n".join(out)
 
 
+def day_off_reason(d: date) -> Optional[str]:
+    off = semester.day_off(d)
+    if off is None:
+        return None
+    return "праздничный день" if off == HOLIDAY else "вне учебного семестра"
+
+
+def format_day_off(d: date) -> str:
+    return f"<b>{DAYS[d.weekday()]}, {d:%d.%m}</b>\n\nЗанятий нет — {day_off_reason(d)}\n"
+
+
+def _format_days(lessons: Sequence[Lesson], days: Sequence[str], week_type: Optional[str],
+                 show_week_per_lesson: bool = False) -> List[str]:
+    out = []
+    for day_name in days:
+        day_lessons = filter_lessons_by_day(lessons, day_name)
+        if week_type:
+            day_lessons = filter_by_week_type(day_lessons, week_type)
+        out.append(format_day_schedule(day_lessons, day_name, show_week_per_lesson))
+    return out
+
+
+def render_day(group: str, lessons: Sequence[Lesson], day_name: str, week_type: Optional[str],
+               show_week_per_lesson: bool = False) -> str:
+    key = (group, day_name, week_type, show_week_per_lesson)
+    text = render_cache.get(key)
+    if text is None:
+        text = _format_days(lessons, [day_name], week_type, show_week_per_lesson)[0]
+        render_cache.put(key, text)
+    return text
+
+
+def render_days(group: str, lessons: Sequence[Lesson], days: Sequence[str], week_type: Optional[str],
+                show_week_per_lesson: bool = False) -> List[str]:
+    return [render_day(group, lessons, day_name, week_type, show_week_per_lesson) for day_name in days]
+
+
+def _date_key(group: str, d: date) -> Optional[tuple]:
+    # обычный день показывается так же, как день недели с его чётностью, и делит с ним кэш
+    if semester.day_off(d) is not None:
+        return None
+    return group, DAYS[d.weekday()], semester.week_type(d), False
+
+
+def _format_dates(dates: Sequence[date], day_lessons: Sequence[Sequence[Lesson]]) -> List[str]:
+    return [format_day_schedule(lessons, DAYS[d.weekday()]) if semester.day_off(d) is None else format_day_off(d)
+            for d, lessons in zip(dates, day_lessons)]
+
+
+def render_date(group: str, d: date) -> str:
+    key = _date_key(group, d)
+    if key is None:
+        return format_day_off(d)
+    text = render_cache.get(key)
+    if text is None:
+        text = _format_dates([d], [calendar_index.on(group, d)])[0]
+        render_cache.put(key, text)
+    return text
+
+
+def render_dates(group: str, dates: Sequence[date]) -> List[str]:
+    return [render_date(group, d) for d in dates]
+
+
 @router.message(lambda m: m.text in [
     "📅 Сегодня", "📅 Завтра", "📋 Вся неделя", "🔍 Другая группа",
     "🔎 Текущая неделя", "➡️ Следующая неделя", "📚 Вся без фильтров", "⬅️ Назад"
@@ -116,7 +185,8 @@ async def handle_schedule_buttons(message: types.Message) -> None:
 
     if message.text == "🔍 Другая группа":
         logger.info("Пользователь %s: %s", message.from_user.id, message.text)
-        await message.answer(
+        await sender.answer(
+            message,
             "Введите номер группы:\nПример: 09-825, 8251160, 8251",
             reply_markup=types.ReplyKeyboardRemove(),
         )
@@ -124,77 +194,66 @@ async def handle_schedule_buttons(message: types.Message) -> None:
 
     if message.text == "⬅️ Назад":
         logger.info("Пользователь %s: %s", message.from_user.id, message.text)
-        await message.answer("Выберите действие:", reply_markup=get_schedule_keyboard())
+        await sender.answer(message, "Выберите действие:", reply_markup=get_schedule_keyboard())
         return
 
-    if user_id not in user_data:
-        await message.answer(
+    state = await user_states.get(user_id)
+    lessons = get_lessons(state.group) if state else None
+    if lessons is None:
+        await sender.answer(
+            message,
             "❌ Расписание не найдено. Сначала найдите группу:",
             reply_markup=types.ReplyKeyboardRemove(),
         )
         return
 
-    group, lessons = user_data[user_id]
+    group = state.group
+    logs.bind(group=group)
+    await user_states.set_last_view(user_id, message.text)
 
     if message.text == "📅 Сегодня":
         logger.info("Пользователь %s: %s", message.from_user.id, message.text)
-        day_name = get_day_name(0)
-        day_lessons = filter_lessons_by_day(lessons, day_name)
-        day_lessons = filter_by_week(day_lessons, target_date=date.today())
-        await message.answer(
-            format_day_schedule(day_lessons, day_name),
+        await sender.answer(
+            message,
+            render_date(group, local_today()),
             parse_mode="HTML", disable_web_page_preview=True
         )
 
     elif message.text == "📅 Завтра":
         logger.info("Пользователь %s: %s", message.from_user.id, message.text)
-        day_name = get_day_name(1)
-        day_lessons = filter_lessons_by_day(lessons, day_name)
-        day_lessons = filter_by_week(day_lessons, target_date=date.today() + timedelta(days=1))
-        await message.answer(
-            format_day_schedule(day_lessons, day_name),
+        await sender.answer(
+            message,
+            render_date(group, local_today() + timedelta(days=1)),
             parse_mode="HTML", disable_web_page_preview=True
         )
 
     elif message.text == "📋 Вся неделя":
         logger.info("Пользователь %s: %s", message.from_user.id, message.text)
-        await message.answer("Выберите фильтр:", reply_markup=get_week_menu_keyboard())
+        await sender.answer(message, "Выберите фильтр:", reply_markup=get_week_menu_keyboard())
 
     elif message.text == "🔎 Текущая неделя":
         logger.info("Пользователь %s: %s", message.from_user.id, message.text)
-        await message.answer(
-            f"📆 <b>Расписание на текущую неделю</b>\nГруппа: <b>{group}</b>",
-            parse_mode="HTML", reply_markup=get_week_menu_keyboard()
+        await sender.answer_many(
+            message,
+            [f"📆 <b>Расписание на текущую неделю</b>\nГруппа: <b>{group}</b>"]
+            + render_dates(group, week_dates(local_today())),
+            parse_mode="HTML", disable_web_page_preview=True, reply_markup=get_week_menu_keyboard()
         )
-        days_order = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота"]
-        for day in days_order:
-            day_lessons = filter_lessons_by_day(lessons, day)
-            day_lessons = filter_by_week(day_lessons, target_date=date.today())
-            day_text = format_day_schedule(day_lessons, day)
-            await message.answer(day_text, parse_mode="HTML", disable_web_page_preview=True)
 
     elif message.text == "➡️ Следующая неделя":
         logger.info("Пользователь %s: %s", message.from_user.id, message.text)
-        await message.answer(
-            f"📆 <b>Расписание на следующую неделю</b>\nГруппа: <b>{group}</b>",
-            parse_mode="HTML", reply_markup=get_week_menu_keyboard()
+        await sender.answer_many(
+            message,
+            [f"📆 <b>Расписание на следующую неделю</b>\nГруппа: <b>{group}</b>"]
+            + render_dates(group, week_dates(local_today() + timedelta(days=7))),
+            parse_mode="HTML", disable_web_page_preview=True, reply_markup=get_week_menu_keyboard()
         )
-        days_order = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота"]
-        target = date.today() + timedelta(days=7)
-        for day in days_order:
-            day_lessons = filter_lessons_by_day(lessons, day)
-            day_lessons = filter_by_week(day_lessons, target_date=target)
-            day_text = day_text = format_day_schedule(day_lessons, day)
-            await message.answer(day_text, parse_mode="HTML", disable_web_page_preview=True)
 
     elif message.text == "📚 Вся без фильтров":
         logger.info("Пользователь %s: %s", message.from_user.id, message.text)
-        await message.answer(
-            f"📆 <b>Расписание на неделю (без фильтра)</b>\nГруппа: <b>{group}</b>",
-            parse_mode="HTML", reply_markup=get_week_menu_keyboard()
+        await sender.answer_many(
+            message,
+            [f"📆 <b>Расписание на неделю (без фильтра)</b>\nГруппа: <b>{group}</b>"]
+            + render_days(group, lessons, DAYS_ORDER, None, show_week_per_lesson=True),
+            parse_mode="HTML", disable_web_page_preview=True, reply_markup=get_week_menu_keyboard()
         )
-        days_order = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота"]
-        for day in days_order:
-            day_lessons = filter_lessons_by_day(lessons, day)
-            day_text = format_day_schedule(day_lessons, day, show_week_per_lesson=True)
-            await message.answer(day_text, parse_mode="HTML", disable_web_page_preview=True)
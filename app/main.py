@@ -1,37 +1,63 @@
 import asyncio
 import logging
 from logging.handlers import RotatingFileHandler
+from time import perf_counter
 from datetime import datetime, time, timedelta
+from typing import TYPE_CHECKING, List, Optional
 from zoneinfo import ZoneInfo
 
 from app.middlewares.antiflood import AntiFloodMiddleware
+from app.middlewares.concurrency import ConcurrencyLimitMiddleware
+from app.middlewares.metrics import HandlerMetricsMiddleware, UpdateMetricsMiddleware
+from app.middlewares.profiling import ProfilingMiddleware
 from app.middlewares.singleflight import SingleFlightMiddleware
+from app.services import ics, metrics, snapshot, workers
 from app.services.config import cfg
-from app.handlers import start, schedule, schedule_buttons
-from app.services.csv_cache import ensure_startup_cache, refresh_all
+from app.handlers import start, schedule, schedule_buttons, inline, lookup, digest, changes, admin, ics as ics_handlers
+from app.services.changes import change_feed, notify as notify_changes
+from app.services.csv_cache import close_session, ensure_startup_cache, refresh_all
+from app.services.digest import broadcast, digest_day, digest_store
+from app.services.logs import JsonFormatter, LogPipeline, parse_sampling
+from app.services.profiler import profiler
+from app.services.render_cache import render_cache
+from app.services.schedule_store import current as get_store
+from app.services.reverse_index import reverse_index
+from app.services.semester import calendar_index
+from app.services.sender import sender
+from app.services.user_state import user_states
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 
+if TYPE_CHECKING:
+    from app.services.cluster import Cluster
+
 logger = logging.getLogger(__name__)
 
 
-def setup_logging():
+def setup_logging() -> LogPipeline:
     import os
     os.makedirs("logs", exist_ok=True)
     handler = RotatingFileHandler(cfg.log_file, maxBytes=1_000_000, backupCount=3, encoding="utf-8")
-    fmt = logging.Formatter("%(asctime)s | %(levelname)-8s | %(name)s | %(message)s")
+    if cfg.log_format == "text":
+        fmt = logging.Formatter("%(asctime)s | %(levelname)-8s | %(name)s | %(message)s")
+    else:
+        fmt = JsonFormatter()
     handler.setFormatter(fmt)
+    # файл пишет поток QueueListener, цикл событий только кладёт запись в очередь
+    pipeline = LogPipeline([handler], cfg.log_queue_size, parse_sampling(cfg.log_sampling))
     root = logging.getLogger()
     root.setLevel(getattr(logging, cfg.log_level.upper(), logging.INFO))
-    root.addHandler(handler)
+    root.addHandler(pipeline.handler)
+    pipeline.start()
+    return pipeline
 
 
-async def _seconds_until_next_run() -> float:
+async def _seconds_until_next_run(times: Optional[List[str]] = None) -> float:
     tz = ZoneInfo(cfg.tz)
     now = datetime.now(tz)
     targets = []
-    for hhmm in cfg.refresh_at:
+    for hhmm in times or cfg.refresh_at:
         h, m = map(int, hhmm.split(":"))
         targets.append(datetime.combine(now.date(), time(h, m), tzinfo=tz))
         targets.append(datetime.combine(now.date() + timedelta(days=1), time(h, m), tzinfo=tz))
@@ -39,13 +65,28 @@ async def _seconds_until_next_run() -> float:
     return (future - now).total_seconds()
 
 
-async def _cron_refresh_task():
+async def _cron_refresh_task(cluster: Optional["Cluster"] = None, bot: Optional[Bot] = None):
+    # уведомления об изменениях, прерванные перезапуском, досылаются сразу после старта
+    resume = True
     while True:
         try:
+            if resume:
+                resume = False
+                if bot is not None and cfg.notify_changes and (cluster is None or cluster.is_leader):
+                    await notify_changes(bot, changes.format_diffs)
             secs = await _seconds_until_next_run()
             logger.info("Следующее обновление CSV через %.0f сек.", secs)
             await asyncio.sleep(secs)
+            if cluster is not None and not cluster.is_leader:
+                logger.info("Обновление CSV пропущено: процесс не лидер.")
+                continue
             await refresh_all()
+            if cluster is not None:
+                await cluster.publish()
+            else:
+                await _save_snapshot()
+            if bot is not None and cfg.notify_changes:
+                await notify_changes(bot, changes.format_diffs)
         except asyncio.CancelledError:
             raise
         except Exception as e:
@@ -53,34 +94,210 @@ async def _cron_refresh_task():
             await asyncio.sleep(60)
 
 
-async def main() -> None:
-    setup_logging()
-    logger.info("Запуск бота...")
+async def _save_snapshot():
+    try:
+        snapshot_id = await workers.run_io(snapshot.save_current, cfg.shared_dir)
+        logger.info("Снимок расписания %s сохранён.", snapshot_id)
+    except Exception as e:
+        logger.warning("Не удалось сохранить снимок расписания: %s", e)
 
-    await ensure_startup_cache()
 
-    asyncio.create_task(_cron_refresh_task())
+async def _cron_digest_task(bot: Bot, cluster: Optional["Cluster"] = None):
+    # рассылка, прерванная перезапуском, продолжается с контрольной точки сразу после старта
+    resume = True
+    while True:
+        try:
+            if resume:
+                resume = False
+                day = digest_day()
+                progress = await digest_store.load_broadcast(day.isoformat())
+                if progress is not None and not progress["finished"] and (cluster is None or cluster.is_leader):
+                    await broadcast(bot, digest.render_digest, day)
+            secs = await _seconds_until_next_run(cfg.digest_at)
+            logger.info("Следующая рассылка через %.0f сек.", secs)
+            await asyncio.sleep(secs)
+            if cluster is not None and not cluster.is_leader:
+                logger.info("Рассылка пропущена: процесс не лидер.")
+                continue
+            await broadcast(bot, digest.render_digest)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("Ошибка в планировщике рассылки: %s", e)
+            await asyncio.sleep(60)
 
-    bot = Bot(
-        token=cfg.bot_token,
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
-    )
+
+def build_dispatcher() -> Dispatcher:
     dp = Dispatcher()
 
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    dp.update.outer_middleware(ConcurrencyLimitMiddleware(cfg.max_concurrent_updates))
+
     dp.message.middleware(SingleFlightMiddleware())
     dp.callback_query.middleware(SingleFlightMiddleware())
 
-    dp.message.middleware(AntiFloodMiddleware(cooldown_sec=1.2))
-    dp.callback_query.middleware(AntiFloodMiddleware(cooldown_sec=0.7))
+    dp.message.middleware(AntiFloodMiddleware(rate=cfg.flood_message_rate, burst=cfg.flood_message_burst))
+    dp.callback_query.middleware(AntiFloodMiddleware(rate=cfg.flood_callback_rate, burst=cfg.flood_callback_burst))
+
+    dp.message.middleware(HandlerMetricsMiddleware())
+    dp.callback_query.middleware(HandlerMetricsMiddleware())
+    dp.inline_query.middleware(HandlerMetricsMiddleware())
+
+    dp.message.middleware(ProfilingMiddleware(profiler))
+    dp.callback_query.middleware(ProfilingMiddleware(profiler))
+    dp.inline_query.middleware(ProfilingMiddleware(profiler))
 
+    dp.include_router(admin.router)
     dp.include_router(start.router)
+    dp.include_router(lookup.router)
+    dp.include_router(digest.router)
+    dp.include_router(changes.router)
+    dp.include_router(ics_handlers.router)
     dp.include_router(schedule_buttons.router)
     dp.include_router(schedule.router)
+    dp.include_router(inline.router)
+    return dp
 
+
+def _concurrency_limiter(dp: Dispatcher) -> ConcurrencyLimitMiddleware:
+    return next(m for m in dp.update.outer_middleware if isinstance(m, ConcurrencyLimitMiddleware))
+
+
+def register_metrics(dp: Dispatcher, log_pipeline: Optional[LogPipeline] = None):
+    # готовые счётчики компонентов читаются только в момент запроса /metrics
+    metrics.stats_collector("tgbot_render_cache", "Кэш отрисовки", render_cache.stats)
+    metrics.stats_collector("tgbot_user_state", "Хранилище пользователей", user_states.stats)
+    metrics.stats_collector("tgbot_reverse_index", "Индексы преподавателей и аудиторий", reverse_index.stats)
+    metrics.stats_collector("tgbot_calendar", "Календарь по датам", calendar_index.stats)
+    metrics.stats_collector("tgbot_ics", "Ленты .ics", ics.feeds.stats)
+    metrics.stats_collector("tgbot_changes", "Лента изменений", change_feed.stats)
+    metrics.stats_collector("tgbot_coalesce", "Объединение одинаковых запросов", ics.feeds.coalescer.stats,
+                            ("name", ics.feeds.coalescer.name))
+    metrics.stats_collector("tgbot_profiler", "Профилирование апдейтов", profiler.stats)
+    metrics.stats_collector("tgbot_sender", "Очередь отправки", sender.stats)
+    for name, pool in (("io", workers.io_pool), ("cpu", workers.cpu_pool)):
+        metrics.stats_collector("tgbot_workers", "Пул воркеров", pool.stats, ("pool", name))
+    for observer in (dp.message, dp.callback_query):
+        for m in observer.middleware:
+            if isinstance(m, AntiFloodMiddleware):
+                metrics.stats_collector("tgbot_antiflood", "Антифлуд", m.limiter.stats,
+                                        ("event", observer.event_name))
+    if log_pipeline is not None:
+        metrics.stats_collector("tgbot_logging", "Очередь логов", log_pipeline.stats)
+    limiter = _concurrency_limiter(dp)
+    metrics.stats_collector("tgbot_concurrency", "Апдейты в обработке",
+                            lambda: {"pending": limiter.pending, "processed": limiter.processed})
+
+
+async def _run_polling(dp: Dispatcher, bot: Bot):
     try:
         await dp.start_polling(bot)
     except asyncio.CancelledError:
         logger.warning("Polling остановлен (CancelledError)")
+
+
+def build_webhook_app(dp: Dispatcher, bot: Bot):
+    from aiohttp import web
+    from aiogram.webhook.aiohttp_server import setup_application
+    from app.services.webhook import BoundedRequestHandler
+
+    app = web.Application()
+    BoundedRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=cfg.webhook_secret or None,
+        max_pending=cfg.webhook_max_pending,
+    ).register(app, path=cfg.webhook_path)
+    ics.add_routes(app)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def _run_webhook(dp: Dispatcher, bot: Bot):
+    from aiohttp import web
+
+    app = build_webhook_app(dp, bot)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, cfg.webhook_host, cfg.webhook_port)
+    await site.start()
+    logger.info("Webhook слушает %s:%s%s", cfg.webhook_host, cfg.webhook_port, cfg.webhook_path)
+
+    if cfg.webhook_base_url:
+        await bot.set_webhook(
+            cfg.webhook_base_url.rstrip("/") + cfg.webhook_path,
+            secret_token=cfg.webhook_secret or None,
+            max_connections=cfg.max_concurrent_updates,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+        logger.info("Webhook зарегистрирован в Telegram.")
+
+    try:
+        await asyncio.Event().wait()
+    except asyncio.CancelledError:
+        logger.warning("Webhook остановлен (CancelledError)")
+    finally:
+        # сначала перестаём принимать запросы, затем дожидаемся уже принятых апдейтов
+        await site.stop()
+        limiter = _concurrency_limiter(dp)
+        if not await limiter.drain(cfg.drain_timeout):
+            logger.warning("Не дождались %d апдейтов за %.0f сек.", limiter.pending, cfg.drain_timeout)
+        await runner.cleanup()
+
+
+async def main() -> None:
+    started = perf_counter()
+    log_pipeline = setup_logging()
+    logger.info("Запуск бота...")
+    profiler.configure(enabled=cfg.profile_enabled)
+
+    cluster: Optional["Cluster"] = None
+    if cfg.multi_worker:
+        # flock есть только в POSIX: в одиночном режиме модуль лидерства не нужен и не импортируется
+        from app.services.cluster import Cluster
+
+        cluster = Cluster(cfg.shared_dir, cfg.snapshot_poll_sec)
+        await cluster.startup()
+        cluster.start()
+    elif not await snapshot.warm_start(cfg.shared_dir, _save_snapshot):
+        await ensure_startup_cache()
+        await _save_snapshot()
+    logger.info("Расписание готово через %.2f сек после запуска (%d групп).",
+                perf_counter() - started, len(get_store()))
+    await user_states.open()
+    user_states.start()
+    await digest_store.open()
+
+    bot = Bot(
+        token=cfg.bot_token,
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+    )
+    asyncio.create_task(_cron_refresh_task(cluster, bot))
+    dp = build_dispatcher()
+    if cfg.digest_enabled:
+        asyncio.create_task(_cron_digest_task(bot, cluster))
+
+    metrics_runner = None
+    if cfg.metrics_port:
+        register_metrics(dp, log_pipeline)
+        metrics_runner = await metrics.start_http_server(cfg.metrics_host, cfg.metrics_port, ics.add_routes)
+
+    logger.info("Бот начинает принимать апдейты через %.2f сек после запуска.", perf_counter() - started)
+    try:
+        if cfg.mode == "webhook":
+            await _run_webhook(dp, bot)
+        else:
+            await _run_polling(dp, bot)
     finally:
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await sender.close()
         await bot.session.close()
+        await user_states.close()
+        await digest_store.close()
+        if cluster is not None:
+            await cluster.close()
+        await close_session()
+        workers.shutdown()
         logger.info("Бот завершил работу.")
+        log_pipeline.stop()
@@ -1,13 +1,70 @@
 import time
+from collections import OrderedDict
 from typing import Any, Awaitable, Callable, Dict, Optional
 
 from aiogram import BaseMiddleware, types
 
+from app.services import metrics
+from app.services.sender import sender
+
+
+class TokenBucketLimiter:
+    def __init__(self, rate: float, burst: float, idle_ttl: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst
+        # через burst / rate секунд простоя корзина снова полная — хранить её незачем
+        self.idle_ttl = idle_ttl if idle_ttl is not None else burst / rate
+        # key -> [токены, время последнего обращения]; порядок — по времени обращения
+        self._buckets: "OrderedDict[int, list]" = OrderedDict()
+        self.allowed = 0
+        self.throttled = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _evict(self, now: float):
+        buckets = self._buckets
+        while buckets:
+            bucket = next(iter(buckets.values()))
+            if now - bucket[1] < self.idle_ttl:
+                break
+            buckets.popitem(last=False)
+            self.evicted += 1
+
+    def allow(self, key: int, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        self._evict(now)
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = self.burst
+            bucket = self._buckets[key] = [tokens, now]
+        else:
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            self._buckets.move_to_end(key)
+
+        if tokens < 1:
+            bucket[0] = tokens
+            self.throttled += 1
+            return False
+        bucket[0] = tokens - 1
+        self.allowed += 1
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "tracked": len(self._buckets),
+            "allowed": self.allowed,
+            "throttled": self.throttled,
+            "evicted": self.evicted,
+        }
+
 
 class AntiFloodMiddleware(BaseMiddleware):
-    def __init__(self, cooldown_sec: float = 1.5):
-        self.cooldown = cooldown_sec
-        self._last_by_user: Dict[int, float] = {}
+    def __init__(self, rate: float = 1 / 1.5, burst: float = 2, idle_ttl: Optional[float] = None):
+        self.limiter = TokenBucketLimiter(rate, burst, idle_ttl)
 
     async def __call__(
             self,
@@ -19,13 +76,11 @@ class AntiFloodMiddleware(BaseMiddleware):
         if not user_id:
             return await handler(event, data)
 
-        now = time.monotonic()
-        last = self._last_by_user.get(user_id, 0.0)
-        if now - last < self.cooldown:
+        if not self.limiter.allow(user_id):
+            metrics.throttled_total.inc(type(event).__name__)
             if isinstance(event, types.Message):
-                await event.answer("⏳ Пожалуйста, не нажимайте так часто.")
+                await sender.answer(event, "⏳ Пожалуйста, не нажимайте так часто.")
             elif isinstance(event, types.CallbackQuery):
                 await event.answer("⏳ Подождите…", show_alert=False)
             return
-        self._last_by_user[user_id] = now
         return await handler(event, data)
@@ -0,0 +1,42 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, types
+
+
+class ConcurrencyLimitMiddleware(BaseMiddleware):
+    def __init__(self, limit: int = 64):
+        self.limit = limit
+        self._sem = asyncio.Semaphore(limit)
+        self._idle = asyncio.Event()
+        self._idle.set()
+        # апдейты, которые ждут слота или уже обрабатываются
+        self.pending = 0
+        self.processed = 0
+
+    async def __call__(
+            self,
+            handler: Callable[[types.TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: types.TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        self.pending += 1
+        self._idle.clear()
+        try:
+            async with self._sem:
+                return await handler(event, data)
+        finally:
+            self.pending -= 1
+            self.processed += 1
+            if not self.pending:
+                self._idle.set()
+
+    async def drain(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while self.pending:
+            try:
+                await asyncio.wait_for(self._idle.wait(), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                return False
+        return True
@@ -0,0 +1,62 @@
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, types
+
+from app.services import logs, metrics
+
+# по строке на апдейт: имя хендлера, пользователь и время обработки (сэмплируется через LOG_SAMPLING)
+access_log = logging.getLogger("app.access")
+
+_names: Dict[Callable, str] = {}
+
+
+def handler_name(data: Dict[str, Any]) -> str:
+    # "schedule_buttons.handle_schedule_buttons" — модуль без пакета и имя функции
+    handler_obj = data.get("handler")
+    if handler_obj is None:
+        return "unknown"
+    callback = handler_obj.callback
+    name = _names.get(callback)
+    if name is None:
+        module = getattr(callback, "__module__", "") or ""
+        name = _names[callback] = f"{module.rsplit('.', 1)[-1]}.{getattr(callback, '__name__', '?')}"
+    return name
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    # внешний middleware на dp.update: считает все апдейты по типу события
+    async def __call__(
+            self,
+            handler: Callable[[types.TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: types.TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        metrics.updates_total.inc(getattr(event, "event_type", None) or "unknown")
+        return await handler(event, data)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    # внутренний middleware: вызывается только для найденного хендлера, поэтому знает его имя
+    async def __call__(
+            self,
+            handler: Callable[[types.TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: types.TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        name = handler_name(data)
+        user = getattr(getattr(event, "from_user", None), "id", None)
+        token = logs.push_context(user=user, handler=name)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            metrics.handler_errors.inc(name)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.handler_seconds.observe(elapsed, name)
+            access_log.info("Апдейт обработан за %.1f мс", elapsed * 1000,
+                            extra={"event": type(event).__name__, "latency_ms": round(elapsed * 1000, 2)})
+            logs.pop_context(token)
@@ -0,0 +1,58 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Set
+
+from aiogram import BaseMiddleware, types
+
+from app.middlewares.metrics import handler_name
+from app.services.profiler import Profiler
+from app.services.workers import run_io
+
+logger = logging.getLogger(__name__)
+
+
+def _describe(event: types.TelegramObject) -> Dict[str, object]:
+    # снимки лежат на диске вне базы бота: ни id пользователя, ни текста запроса, только его длина
+    payload = getattr(event, "text", None) or getattr(event, "data", None) or getattr(event, "query", None)
+    return {
+        "event": type(event).__name__,
+        "payload_len": len(payload) if payload else 0,
+    }
+
+
+class ProfilingMiddleware(BaseMiddleware):
+    # внутренний middleware: включается и выключается на лету (/profile), пока выключен — почти ничего не стоит
+    def __init__(self, profiler: Profiler):
+        self.profiler = profiler
+        self._writes: Set[asyncio.Task] = set()
+
+    async def __call__(
+            self,
+            handler: Callable[[types.TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: types.TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        if not self.profiler.enabled:
+            return await handler(event, data)
+        name = handler_name(data)
+        profile = self.profiler.begin(name)
+        started, cpu_started = time.perf_counter(), time.process_time()
+        try:
+            return await handler(event, data)
+        finally:
+            capture = self.profiler.finish(
+                name, profile, time.perf_counter() - started, time.process_time() - cpu_started, _describe(event)
+            )
+            if capture is not None:
+                # запись на диск — в фоне, чтобы не задерживать ответ
+                task = asyncio.create_task(self._write(capture))
+                self._writes.add(task)
+                task.add_done_callback(self._writes.discard)
+
+    async def _write(self, capture: dict):
+        try:
+            path = await run_io(self.profiler.write_capture, capture)
+            logger.info("Сохранён профиль %s (%.0f мс).", path.name, capture["meta"]["wall_ms"])
+        except Exception:
+            logger.exception("Не удалось сохранить профиль")
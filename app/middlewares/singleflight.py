@@ -1,19 +1,30 @@
 import asyncio
-from typing import Any, Awaitable, Callable, Dict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
 
 from aiogram import BaseMiddleware, types
 
+from app.services import metrics
+
+
+def _payload(event: types.TelegramObject) -> Optional[Hashable]:
+    if isinstance(event, types.Message):
+        return event.text
+    if isinstance(event, types.CallbackQuery):
+        return event.data
+    return None
+
 
 class SingleFlightMiddleware(BaseMiddleware):
+    # Повтор того же запроса пользователя, пока первый ещё обрабатывается, не запускает вторую обработку:
+    # он дожидается первой, ответ на которую пользователь и получит. Разные запросы одного пользователя
+    # идут параллельно, порядок ответов держит sender.
     def __init__(self):
-        self._locks: Dict[int, asyncio.Lock] = {}
+        self._active: Dict[Tuple[int, Hashable], asyncio.Future] = {}
+        self.coalesced = 0
 
-    def _get_lock(self, user_id: int):
-        lock = self._locks.get(user_id)
-        if lock is None:
-            lock = asyncio.Lock()
-            self._locks[user_id] = lock
-        return lock
+    @property
+    def in_flight(self) -> int:
+        return len(self._active)
 
     async def __call__(
             self,
@@ -25,13 +36,19 @@ class SingleFlightMiddleware(BaseMiddleware):
         if not user:
             return await handler(event, data)
 
-        lock = self._get_lock(user.id)
-        if lock.locked():
-            if isinstance(event, types.Message):
-                await event.answer("⏳ Обрабатываю предыдущий запрос…")
-            elif isinstance(event, types.CallbackQuery):
-                await event.answer("⏳ Обрабатываю предыдущий запрос…", show_alert=False)
-            return
+        key = (user.id, _payload(event))
+        first = self._active.get(key)
+        if first is not None:
+            self.coalesced += 1
+            metrics.singleflight_coalesced.inc(type(event).__name__)
+            await asyncio.shield(first)
+            if isinstance(event, types.CallbackQuery):
+                await event.answer()
+            return None
 
-        async with lock:
+        done = self._active[key] = asyncio.get_running_loop().create_future()
+        try:
             return await handler(event, data)
+        finally:
+            del self._active[key]
+            done.set_result(None)
@@ -0,0 +1,183 @@
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from aiogram import Bot
+
+from app.services import schedule_store
+from app.services.config import cfg
+from app.services.digest import digest_store, send_batch
+from app.services.schedule_store import Lesson
+from app.services.semester import DAYS
+from app.services.user_state import user_states
+
+logger = logging.getLogger(__name__)
+
+ADDED = "added"
+REMOVED = "removed"
+CHANGED = "changed"
+
+# поля, изменение которых показываем пользователю
+DETAIL_FIELDS = ("subject", "type", "building", "room1", "room2", "teacher")
+KEEP_PER_GROUP = 5
+_DAY_INDEX = {d: i for i, d in enumerate(DAYS)}
+
+
+@dataclass(frozen=True, slots=True)
+class LessonChange:
+    kind: str
+    day: str
+    time: str
+    week_type: str
+    old: Optional[Lesson] = None
+    new: Optional[Lesson] = None
+
+    def fields(self) -> List[Tuple[str, str, str]]:
+        if self.old is None or self.new is None:
+            return []
+        return [(f, getattr(self.old, f), getattr(self.new, f))
+                for f in DETAIL_FIELDS if getattr(self.old, f) != getattr(self.new, f)]
+
+
+@dataclass(frozen=True, slots=True)
+class GroupDiff:
+    group: str
+    generation: int
+    at: float
+    changes: Tuple[LessonChange, ...]
+
+
+def _slots(lessons: Iterable[Lesson]) -> Dict[Tuple[str, str, str], List[Lesson]]:
+    out: Dict[Tuple[str, str, str], List[Lesson]] = {}
+    for les in lessons:
+        if les.subject:
+            out.setdefault((les.day, les.time, les.week_type.strip()), []).append(les)
+    return out
+
+
+def _slot_order(key: Tuple[str, str, str]):
+    day, time_str, week = key
+    hh, _, mm = time_str.partition(":")
+    minutes = int(hh) * 60 + int(mm) if hh.isdigit() and mm.isdigit() else 0
+    return _DAY_INDEX.get(day, len(_DAY_INDEX)), minutes, week
+
+
+def diff_lessons(old: Iterable[Lesson], new: Iterable[Lesson]) -> List[LessonChange]:
+    # занятие определяется слотом (день, время, неделя); в одном слоте может быть несколько подгрупп
+    before, after = _slots(old), _slots(new)
+    out: List[LessonChange] = []
+    for key in sorted(before.keys() | after.keys(), key=_slot_order):
+        a, b = before.get(key, []), after.get(key, [])
+        if a == b:
+            continue
+        common = [x for x in a if x in b]
+        a = [x for x in a if x not in common]
+        b = [x for x in b if x not in common]
+        for x, y in zip(a, b):
+            out.append(LessonChange(CHANGED, *key, old=x, new=y))
+        out += [LessonChange(REMOVED, *key, old=x) for x in a[len(b):]]
+        out += [LessonChange(ADDED, *key, new=y) for y in b[len(a):]]
+    return out
+
+
+class ChangeFeed:
+    def __init__(self, keep: int = KEEP_PER_GROUP):
+        self.keep = keep
+        self._by_group: Dict[str, Deque[GroupDiff]] = {}
+        # ещё не разосланные подписчикам изменения; у процесса-не-лидера они только копятся, поэтому ограничены
+        self._unsent: Deque[GroupDiff] = deque(maxlen=10_000)
+        self._previous: Optional[Dict[str, Tuple[Lesson, ...]]] = None
+        self.diffed = 0
+        self.diff_seconds = 0.0
+
+    def on_update(self, store: schedule_store.ScheduleStore, changed: Set[str]):
+        previous, self._previous = self._previous, store.groups
+        # первая загрузка — сравнивать не с чем
+        if previous is None or not previous:
+            return
+        started = time.perf_counter()
+        now = time.time()
+        diffs = []
+        for group in changed:
+            if group not in previous or group not in store.groups:
+                continue
+            changes = diff_lessons(previous[group], store.groups[group])
+            if changes:
+                diffs.append(GroupDiff(group, store.generation, now, tuple(changes)))
+        for d in diffs:
+            self._by_group.setdefault(d.group, deque(maxlen=self.keep)).append(d)
+        self._unsent.extend(diffs)
+        self.diffed += len(changed)
+        self.diff_seconds += time.perf_counter() - started
+        if diffs:
+            logger.info("Расписание изменилось у %d групп (%.3f сек на сравнение).",
+                        len(diffs), time.perf_counter() - started)
+
+    def recent(self, group: str) -> List[GroupDiff]:
+        return list(self._by_group.get(group, ()))
+
+    def unsent(self) -> List[GroupDiff]:
+        return list(self._unsent)
+
+    def ack(self, diffs: List[GroupDiff]):
+        # новые изменения дописываются в конец, поэтому отданные — всегда в начале очереди
+        done = {id(d) for d in diffs}
+        while self._unsent and id(self._unsent[0]) in done:
+            self._unsent.popleft()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "groups": len(self._by_group),
+            "unsent": len(self._unsent),
+            "diffed": self.diffed,
+            "diff_seconds": self.diff_seconds,
+        }
+
+
+change_feed = ChangeFeed()
+schedule_store.add_listener(change_feed.on_update)
+
+
+async def notify(bot: Bot, render: Callable[[List[GroupDiff]], str], batch: Optional[int] = None) -> int:
+    # изменения получают подписчики утренней рассылки (/subscribe) этой группы;
+    # тексты уходят из ленты только после записи в базу — прерванная рассылка продолжится с контрольной точки
+    diffs = change_feed.unsent()
+    if diffs:
+        by_group: Dict[str, List[GroupDiff]] = {}
+        for d in diffs:
+            by_group.setdefault(d.group, []).append(d)
+        await digest_store.add_notices({grp: render(items) for grp, items in by_group.items()})
+        change_feed.ack(diffs)
+
+    batches = await digest_store.notice_batches()
+    if not batches:
+        return 0
+    await user_states.flush()
+    sent = 0
+    for notice_batch in batches:
+        sent += await _notify_batch(bot, notice_batch, batch or cfg.digest_batch)
+    return sent
+
+
+async def _notify_batch(bot: Bot, notice_batch: int, batch: int) -> int:
+    broadcast_id = f"changes-{notice_batch}"
+    progress = await digest_store.load_broadcast(broadcast_id)
+    if progress is None:
+        progress = {"cursor": ("", 0), "sent": 0, "blocked": 0, "failed": 0, "finished": False}
+    texts = await digest_store.notices(notice_batch)
+
+    while True:
+        rows = await digest_store.notice_page(notice_batch, progress["cursor"], batch)
+        if not rows:
+            break
+        await send_batch(bot, [(uid, chat_id, texts[grp]) for uid, chat_id, grp in rows], progress)
+        last_user, _, last_grp = rows[-1]
+        progress["cursor"] = (last_grp, last_user)
+        await digest_store.checkpoint(broadcast_id, progress)
+
+    await digest_store.finish_notices(notice_batch, broadcast_id)
+    logger.info("Уведомления об изменениях (%s): %d групп, отправлено %d, недоступны %d, ошибок %d.",
+                broadcast_id, len(texts), progress["sent"], progress["blocked"], progress["failed"])
+    return progress["sent"]
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+from pathlib import Path
+from typing import Optional
+
+from app.services import snapshot
+from app.services.csv_cache import ensure_startup_cache, set_group_index
+from app.services.leader import FileLease
+from app.services.workers import run_io
+
+logger = logging.getLogger(__name__)
+
+LEASE_FILE = "refresh.lock"
+
+
+class Cluster:
+    # Несколько процессов бота на одной машине: обновляет CSV только лидер,
+    # остальные подхватывают опубликованный им снимок по смене его id
+    def __init__(self, shared_dir: str, poll_sec: float = 5.0):
+        self.shared_dir = shared_dir
+        self.poll_sec = poll_sec
+        self.lease = FileLease(str(Path(shared_dir) / LEASE_FILE))
+        self.loaded_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self.lease.held
+
+    async def _become_leader(self):
+        # снимок на диске уже есть — отдаём его сразу, а CSV проверяем в фоне и публикуем, если что-то изменилось
+        if await snapshot.warm_start(self.shared_dir, self.publish):
+            self.loaded_id = await run_io(snapshot.read_id, self.shared_dir)
+            return
+        await ensure_startup_cache()
+        await self.publish()
+
+    async def startup(self):
+        if self.lease.try_acquire():
+            await self._become_leader()
+            return
+        logger.info("Процесс работает ведомым, жду снимок от лидера...")
+        while not await self.reload():
+            await asyncio.sleep(self.poll_sec)
+            if self.lease.try_acquire():
+                await self._become_leader()
+                return
+
+    async def publish(self):
+        self.loaded_id = await run_io(snapshot.save_current, self.shared_dir)
+        logger.info("Снимок расписания %s опубликован.", self.loaded_id)
+
+    async def reload(self) -> bool:
+        snapshot_id = await run_io(snapshot.read_id, self.shared_dir)
+        if snapshot_id is None:
+            return False
+        if snapshot_id == self.loaded_id:
+            return True
+        loaded = await run_io(snapshot.load, self.shared_dir)
+        if loaded is None:
+            return False
+        store = snapshot.install(loaded)
+        set_group_index(store.sources)
+        self.loaded_id = loaded[0]
+        return True
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.poll_sec)
+            try:
+                if self.is_leader:
+                    continue
+                if self.lease.try_acquire():
+                    await self._become_leader()
+                    continue
+                await self.reload()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Ошибка синхронизации со снимком лидера: %s", e)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.lease.release()
@@ -0,0 +1,50 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class Coalescer:
+    # Одинаковые одновременные запросы (по ключу) ждут одно и то же вычисление
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.requests = 0
+        self.computations = 0
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        self.requests += 1
+        fut = self._inflight.get(key)
+        if fut is not None:
+            # shield: отмена одного из ждущих не должна отменять общее вычисление
+            return await asyncio.shield(fut)
+
+        self.computations += 1
+        fut = self._inflight[key] = asyncio.get_running_loop().create_future()
+        # ждущих может не быть — помечаем ошибку прочитанной, чтобы asyncio не ругался в лог
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+        try:
+            result = await factory()
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, float]:
+        joined = self.requests - self.computations
+        return {
+            "requests": self.requests,
+            "computations": self.computations,
+            "joined": joined,
+            "ratio": joined / self.requests if self.requests else 0.0,
+            "in_flight": len(self._inflight),
+        }
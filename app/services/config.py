@@ -1,7 +1,8 @@
 import os
+from datetime import date, timedelta
 from pathlib import Path
 from dataclasses import dataclass, field
-from typing import List
+from typing import List, Optional
 from dotenv import load_dotenv
 
 # Загружаем .env
@@ -13,14 +14,44 @@ def _parse_gids() -> List[int]:
     return [int(x.strip()) for x in raw.split(",") if x.strip().isdigit()]
 
 
-def _parse_times() -> List[str]:
-    raw = os.getenv("REFRESH_AT", "04:00,19:00")
+def _parse_ids(name: str) -> List[int]:
+    raw = os.getenv(name, "")
+    return [int(x.strip()) for x in raw.split(",") if x.strip().lstrip("-").isdigit()]
+
+
+def _parse_date(name: str, default: str = "") -> Optional[date]:
+    # пустое значение (SEMESTER_START=) — как не заданное
+    raw = os.getenv(name, "").strip() or default
+    try:
+        return date.fromisoformat(raw) if raw else None
+    except ValueError:
+        return date.fromisoformat(default) if default else None
+
+
+def _parse_dates(name: str) -> List[date]:
+    # "2025-11-04,2025-12-29..2026-01-11" — отдельные дни и диапазоны включительно
+    out = []
+    for part in os.getenv(name, "").split(","):
+        first, _, last = part.strip().partition("..")
+        try:
+            d = date.fromisoformat(first.strip())
+            end = date.fromisoformat(last.strip()) if last else d
+        except ValueError:
+            continue
+        while d <= end:
+            out.append(d)
+            d += timedelta(days=1)
+    return out
+
+
+def _parse_times(name: str = "REFRESH_AT", default: str = "04:00,19:00") -> List[str]:
+    raw = os.getenv(name, default)
     out = []
     for part in raw.split(","):
         s = part.strip()
         if len(s) == 5 and s[2] == ":" and s[:2].isdigit() and s[3:].isdigit():
             out.append(s)
-    return out or ["04:00", "19:00"]
+    return out or default.split(",")
 
 
 @dataclass(frozen=True)
@@ -29,12 +60,103 @@ class Config:
     spreadsheet_id: str = os.getenv("SPREADSHEET_ID", "")
     gids: List[int] = field(default_factory=_parse_gids)
 
+    # polling | webhook
+    mode: str = os.getenv("MODE", "polling").strip().lower()
+    webhook_base_url: str = os.getenv("WEBHOOK_BASE_URL", "")
+    webhook_path: str = os.getenv("WEBHOOK_PATH", "/webhook")
+    webhook_secret: str = os.getenv("WEBHOOK_SECRET", "")
+    webhook_host: str = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    webhook_port: int = int(os.getenv("WEBHOOK_PORT", "8080"))
+    max_concurrent_updates: int = int(os.getenv("MAX_CONCURRENT_UPDATES", "64"))
+    # сколько принятых webhook-апдейтов может ждать обработки; сверх — 503, Telegram повторит позже
+    webhook_max_pending: int = int(os.getenv("WEBHOOK_MAX_PENDING", "256"))
+    drain_timeout: float = float(os.getenv("DRAIN_TIMEOUT", "15"))
+
     cache_dir: str = os.getenv("CACHE_DIR", "data/csv")
+    sheets_base_url: str = os.getenv(
+        "SHEETS_BASE_URL", "https://docs.google.com/spreadsheets/d/{id}/export?format=csv&gid={gid}"
+    )
+    # листы хранятся сжатыми срезами по группам; исходный CSV оставлять рядом только для отладки
+    keep_raw_csv: bool = os.getenv("KEEP_RAW_CSV", "0") not in ("0", "false", "no", "")
+    http_pool_size: int = int(os.getenv("HTTP_POOL_SIZE", "8"))
     refresh_at: List[str] = field(default_factory=_parse_times)
     tz: str = os.getenv("TZ", "Europe/Moscow")
 
+    # учебный календарь: чётность недель считается от понедельника недели SEMESTER_START,
+    # в праздники и вне семестра занятий нет; пустой SEMESTER_END — семестр без конца
+    semester_start: date = field(default_factory=lambda: _parse_date("SEMESTER_START", "2025-09-01"))
+    semester_end: Optional[date] = field(default_factory=lambda: _parse_date("SEMESTER_END"))
+    holidays: List[date] = field(default_factory=lambda: _parse_dates("HOLIDAYS"))
+    # на сколько дней вперёд раскладываем занятия по датам (если конец семестра не задан)
+    calendar_horizon_days: int = int(os.getenv("CALENDAR_HORIZON_DAYS", "120"))
+    calendar_cache_size: int = int(os.getenv("CALENDAR_CACHE_SIZE", "1024"))
+    # публичный адрес, по которому доступны /ics/<группа>.ics (webhook-сервер или порт метрик)
+    calendar_base_url: str = os.getenv("CALENDAR_BASE_URL", "").rstrip("/")
+
+    # снимок разобранного расписания для быстрого старта; при нескольких процессах
+    # CSV обновляет только лидер, остальные читают его снимок
+    multi_worker: bool = os.getenv("MULTI_WORKER", "0") not in ("0", "false", "no", "")
+    shared_dir: str = os.getenv("SHARED_DIR", "data/shared")
+    snapshot_poll_sec: float = float(os.getenv("SNAPSHOT_POLL_SEC", "5"))
+
+    parser_engine: str = os.getenv("PARSER_ENGINE", "pandas")
+    io_workers: int = int(os.getenv("IO_WORKERS", "4"))
+    parse_workers: int = int(os.getenv("PARSE_WORKERS", "2"))
+
+    render_cache_size: int = int(os.getenv("RENDER_CACHE_SIZE", "4096"))
+    render_cache_bytes: int = int(os.getenv("RENDER_CACHE_BYTES", str(8 * 1024 * 1024)))
+
+    # инлайн-режим: сколько Telegram кэширует ответ и сколько групп держим готовыми
+    inline_cache_sec: int = int(os.getenv("INLINE_CACHE_SEC", "300"))
+    inline_cache_size: int = int(os.getenv("INLINE_CACHE_SIZE", "2048"))
+
+    # утренняя рассылка «сегодня» подписчикам (/subscribe)
+    digest_enabled: bool = os.getenv("DIGEST_ENABLED", "1") not in ("0", "false", "no", "")
+    digest_at: List[str] = field(default_factory=lambda: _parse_times("DIGEST_AT", "07:00"))
+    digest_batch: int = int(os.getenv("DIGEST_BATCH", "500"))
+    # после обновления присылать подписчикам группы, что изменилось в расписании
+    notify_changes: bool = os.getenv("NOTIFY_CHANGES", "1") not in ("0", "false", "no", "")
+
+    user_db: str = os.getenv("USER_DB", "data/users.sqlite3")
+    user_cache_size: int = int(os.getenv("USER_CACHE_SIZE", "10000"))
+    user_flush_sec: float = float(os.getenv("USER_FLUSH_SEC", "2"))
+    # при MULTI_WORKER: сколько секунд процесс верит своему кэшу пользователей, не перечитывая общую базу
+    user_cache_ttl: float = float(os.getenv("USER_CACHE_TTL", "5"))
+
+    # антифлуд: средняя частота (событий/сек) и допустимая пачка подряд
+    flood_message_rate: float = float(os.getenv("FLOOD_MESSAGE_RATE", "0.8"))
+    flood_message_burst: float = float(os.getenv("FLOOD_MESSAGE_BURST", "3"))
+    flood_callback_rate: float = float(os.getenv("FLOOD_CALLBACK_RATE", "1.5"))
+    flood_callback_burst: float = float(os.getenv("FLOOD_CALLBACK_BURST", "3"))
+
+    # лимиты Telegram: ~30 сообщений/сек всего и ~1 сообщение/сек в один чат
+    send_global_rate: float = float(os.getenv("SEND_GLOBAL_RATE", "30"))
+    send_chat_rate: float = float(os.getenv("SEND_CHAT_RATE", "1"))
+    send_chat_burst: float = float(os.getenv("SEND_CHAT_BURST", "3"))
+    merge_week_messages: bool = os.getenv("MERGE_WEEK_MESSAGES", "1") not in ("0", "false", "no", "")
+
+    # Prometheus: /metrics на отдельном порту, 0 — выключено
+    metrics_host: str = os.getenv("METRICS_HOST", "127.0.0.1")
+    metrics_port: int = int(os.getenv("METRICS_PORT", "0"))
+
+    # Telegram id администраторов: им доступны /profile и /profiles
+    admin_ids: List[int] = field(default_factory=lambda: _parse_ids("ADMIN_IDS"))
+    # профилирование апдейтов; включается и на лету командой /profile on
+    profile_enabled: bool = os.getenv("PROFILE_ENABLED", "0") not in ("0", "false", "no", "")
+    profile_sample_rate: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0.01"))
+    profile_slow_ms: float = float(os.getenv("PROFILE_SLOW_MS", "1000"))
+    # глубина стека tracemalloc на время профилируемого апдейта, 0 — без снимков памяти
+    profile_tracemalloc: int = int(os.getenv("PROFILE_TRACEMALLOC", "1"))
+    profile_dir: str = os.getenv("PROFILE_DIR", "data/profiles")
+    profile_keep: int = int(os.getenv("PROFILE_KEEP", "20"))
+
     log_level: str = os.getenv("LOG_LEVEL", "INFO")
     log_file: str = os.getenv("LOG_FILE", "logs/bot.log")
+    # json | text; запись в файл идёт из отдельного потока через ограниченную очередь
+    log_format: str = os.getenv("LOG_FORMAT", "json").strip().lower()
+    log_queue_size: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    # доля сохраняемых INFO/DEBUG-записей по логгерам: "app.access=0.1,app.handlers=0.5"
+    log_sampling: str = os.getenv("LOG_SAMPLING", "app.access=0.1")
 
 
 cfg = Config()
\ No newline at end of file
@@ -1,14 +1,52 @@
 import asyncio
+import json
 import logging
 import os
+import time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
+import aiohttp
+
+from app.services import metrics, schedule_store, sheet_slices
 from app.services.config import cfg
-from app.services.google_csv import fetch_csv_text
+from app.services.google_csv import create_session, fetch_csv_to_file
+from app.services.sheet_slices import SheetReader
+from app.services.workers import run_cpu, run_io
 
 logger = logging.getLogger(__name__)
 
+INDEX_FILE = "groups.json"
+META_FILE = "meta.json"
+SLICE_SUFFIX = ".slc"
+
+# код группы -> (gid листа, номер колонки в шапке)
+_group_index: Dict[str, Tuple[int, int]] = {}
+
+_session: Optional[aiohttp.ClientSession] = None
+
+
+@dataclass(frozen=True)
+class Download:
+    gid: int
+    path: Path
+    changed: bool
+
+
+def get_session() -> aiohttp.ClientSession:
+    global _session
+    if _session is None or _session.closed:
+        _session = create_session(pool_size=cfg.http_pool_size)
+    return _session
+
+
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
 
 def _cache_dir():
     d = Path(os.getenv("CACHE_DIR", getattr(cfg, "cache_dir", "data/csv")))
@@ -17,44 +55,197 @@ def _cache_dir():
 
 
 def _gid_path(gid: int):
+    return _cache_dir() / f"gid_{gid}{SLICE_SUFFIX}"
+
+
+def _raw_path(gid: int):
     return _cache_dir() / f"gid_{gid}.csv"
 
 
+def _gid_of(path: Path) -> int:
+    return int(path.stem.split("_")[1])
+
+
+def _store_sheet(src: Path, gid: int, sha256: str = ""):
+    # CSV листа -> сжатые срезы по группам; исходник остаётся только с KEEP_RAW_CSV
+    raw = _raw_path(gid)
+    if cfg.keep_raw_csv and src != raw:
+        src.replace(raw)
+        src = raw
+    size = sheet_slices.convert(src, _gid_path(gid), sha256)
+    if not cfg.keep_raw_csv:
+        src.unlink(missing_ok=True)
+    return size
+
+
+def import_raw_files():
+    # gid_N.csv, оставшиеся от прежней версии или положенные в кэш вручную (бенчмарки), переводим в срезы;
+    # вызывается один раз при старте — свежие загрузки сразу сохраняются срезами
+    for raw in _cache_dir().glob("gid_*.csv"):
+        slc = raw.with_suffix(SLICE_SUFFIX)
+        try:
+            raw_size = raw.stat().st_size
+            if slc.exists() and slc.stat().st_mtime >= raw.stat().st_mtime:
+                continue
+            size = _store_sheet(raw, _gid_of(raw))
+            logger.info("CSV %s переведён в срезы: %d -> %d байт", raw.name, raw_size, size)
+        except Exception as e:
+            logger.warning("Не удалось перевести %s в срезы: %s", raw, e)
+
+
 def list_cached_files():
     d = _cache_dir()
-    return sorted([p for p in d.glob("gid_*.csv") if p.is_file()])
+    return sorted([p for p in d.glob(f"gid_*{SLICE_SUFFIX}") if p.is_file()])
+
+
+def build_group_index(paths: Optional[List[Path]] = None) -> Dict[str, Tuple[int, int]]:
+    # шапки не читаем: коды групп и их колонки лежат в индексе файла среза
+    index: Dict[str, Tuple[int, int]] = {}
+    for p in paths if paths is not None else list_cached_files():
+        try:
+            with SheetReader(p) as reader:
+                groups = reader.groups
+        except Exception as e:
+            logger.warning("Не удалось прочитать индекс %s: %s", p, e)
+            continue
+        gid = _gid_of(p)
+        for code, col in groups.items():
+            index.setdefault(code, (gid, col))
+    return index
+
+
+def _save_group_index(index: Dict[str, Tuple[int, int]]):
+    path = _cache_dir() / INDEX_FILE
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps({k: list(v) for k, v in index.items()}), encoding="utf-8")
+    tmp.replace(path)
+
 
+async def load_group_index() -> Dict[str, Tuple[int, int]]:
+    global _group_index
+    path = _cache_dir() / INDEX_FILE
+    try:
+        raw = json.loads(await run_io(path.read_text, encoding="utf-8"))
+        index = {k: (int(v[0]), int(v[1])) for k, v in raw.items()}
+    except FileNotFoundError:
+        return await rebuild_group_index()
+    except Exception as e:
+        logger.warning("Индекс групп %s повреждён (%s) — перестраиваю.", path, e)
+        return await rebuild_group_index()
+    _group_index = index
+    logger.info("Индекс групп загружен: %d групп.", len(index))
+    return index
 
-async def download_gid(gid: int):
-    csv_text = await fetch_csv_text(cfg.spreadsheet_id, gid)
-    if not csv_text:
+
+async def rebuild_group_index() -> Dict[str, Tuple[int, int]]:
+    global _group_index
+    index = await run_io(build_group_index)
+    try:
+        await run_io(_save_group_index, index)
+    except Exception as e:
+        logger.warning("Не удалось сохранить индекс групп: %s", e)
+    _group_index = index
+    logger.info("Индекс групп перестроен: %d групп.", len(index))
+    return index
+
+
+def set_group_index(index: Dict[str, Tuple[int, int]]):
+    global _group_index
+    _group_index = dict(index)
+
+
+def lookup_group(group_code: str) -> Optional[Tuple[int, int]]:
+    return _group_index.get(group_code)
+
+
+async def rebuild_schedule_store(changed_gids: Optional[Iterable[int]] = None):
+    paths = {_gid_of(p): p for p in await run_io(list_cached_files)}
+    return await schedule_store.rebuild(_group_index, paths, changed_gids)
+
+
+def _load_meta() -> Dict[str, dict]:
+    try:
+        return json.loads((_cache_dir() / META_FILE).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.warning("Не удалось прочитать %s: %s", META_FILE, e)
+        return {}
+
+
+def _save_meta(meta: Dict[str, dict]):
+    path = _cache_dir() / META_FILE
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(meta, ensure_ascii=False, indent=1), encoding="utf-8")
+    tmp.replace(path)
+
+
+async def download_gid(gid: int, meta: Optional[Dict[str, dict]] = None) -> Optional[Download]:
+    meta = meta if meta is not None else await run_io(_load_meta)
+    path = _gid_path(gid)
+    prev = meta.get(str(gid), {}) if await run_io(path.exists) else {}
+
+    tmp = _raw_path(gid).with_suffix(".csv.tmp")
+    label = str(gid)
+    started = time.perf_counter()
+    res = await fetch_csv_to_file(
+        get_session(), cfg.spreadsheet_id, gid, tmp,
+        etag=prev.get("etag"), last_modified=prev.get("last_modified"),
+        base_url=cfg.sheets_base_url,
+    )
+    metrics.download_seconds.observe(time.perf_counter() - started, label)
+    if res.not_modified:
+        metrics.download_unchanged.inc(label)
+        return Download(gid, path, changed=False)
+    if not res.ok:
+        metrics.download_failures.inc(label)
+        await run_io(tmp.unlink, missing_ok=True)
         logger.warning("Не удалось скачать CSV для GID=%s", gid)
         return None
 
-    tmp = _gid_path(gid).with_suffix(".csv.tmp")
-    tmp.write_text(csv_text, encoding="utf-8")
-    tmp.replace(_gid_path(gid))
-    logger.info("CSV сохранён: %s", _gid_path(gid))
-    return _gid_path(gid)
+    metrics.download_bytes.set(res.size, label)
+    meta[str(gid)] = {
+        "sha256": res.sha256,
+        "size": res.size,
+        "etag": res.etag,
+        "last_modified": res.last_modified,
+    }
+    if prev.get("sha256") == res.sha256:
+        metrics.download_unchanged.inc(label)
+        await run_io(tmp.unlink, missing_ok=True)
+        logger.info("CSV не изменился: GID=%s", gid)
+        return Download(gid, path, changed=False)
 
+    stored = await run_cpu(_store_sheet, tmp, gid, res.sha256)
+    logger.info("Лист сохранён: %s (CSV %d байт, на диске %d байт)", path, res.size, stored)
+    return Download(gid, path, changed=True)
 
-async def download_all(gids: Optional[List[int]] = None):
+
+async def download_all(gids: Optional[List[int]] = None) -> List[Download]:
     gids = gids or cfg.gids
     sem = asyncio.Semaphore(4)
-    saved: List[Path] = []
+    meta = await run_io(_load_meta)
+    results: List[Download] = []
 
     async def _one(g):
         async with sem:
-            p = await download_gid(g)
-            if p:
-                saved.append(p)
+            d = await download_gid(g, meta)
+            if d:
+                results.append(d)
 
     await asyncio.gather(*[_one(g) for g in gids])
-    return saved
+    await run_io(_save_meta, meta)
+
+    changed = [d.gid for d in results if d.changed]
+    if changed or not schedule_store.current().groups:
+        await rebuild_group_index()
+        await rebuild_schedule_store(changed)
+    return results
 
 
 async def ensure_startup_cache():
-    existing = {int(p.stem.split("_")[1]) for p in list_cached_files()}
+    await run_io(import_raw_files)
+    existing = {_gid_of(p) for p in await run_io(list_cached_files)}
     missing = [g for g in cfg.gids if g not in existing]
 
     if not existing:
@@ -65,24 +256,62 @@ async def ensure_startup_cache():
         await download_all(missing)
     else:
         logger.info("CSV уже есть в кэше (%d файлов).", len(existing))
+        await load_group_index()
+        await rebuild_schedule_store()
+
+
+def source_hashes() -> Dict[str, str]:
+    # gid -> sha256 CSV-файлов в кэше: по ним снимок понимает, из каких данных он собран
+    return {gid: m["sha256"] for gid, m in _load_meta().items() if m.get("sha256")}
+
+
+async def revalidate(built_from: Dict[str, str]):
+    # данные уже отданы из снимка: сначала доразбираем листы, скачанные после его записи,
+    # затем обычным условным запросом проверяем, не изменились ли листы в таблице
+    meta = await run_io(source_hashes)
+    stale = [int(gid) for gid, sha in meta.items() if built_from.get(gid) != sha]
+    if stale:
+        logger.info("Снимок устарел для %d лист(ов): %s — разбираю заново.", len(stale), stale)
+        await load_group_index()
+        await rebuild_schedule_store(stale)
+    await download_all()
 
 
 async def refresh_all():
     logger.info("Обновление CSV: скачиваю новые версии и заменяю старые...")
-    saved = await download_all()
-    logger.info("Готово. Обновлено файлов: %d", len(saved))
+    results = await download_all()
+    changed = sum(1 for d in results if d.changed)
+    logger.info("Готово. Обновлено файлов: %d, без изменений: %d", changed, len(results) - changed)
+    return results
 
 
-def find_group_schedule_local(group_code: str):
+async def find_group_schedule_local(group_code: str):
+    # CSV только из колонок группы (и общих день/время/неделя) — читается лишь её срез
     group_code = "".join(ch for ch in (group_code or "") if ch.isdigit())
-    for p in list_cached_files():
-        try:
-            txt = p.read_text(encoding="utf-8", errors="ignore")
-        except Exception as e:
-            logger.warning("Не удалось прочитать %s: %s", p, e)
-            continue
-        if group_code and group_code in txt:
-            logger.info("Группа %s найдена в %s", group_code, p.name)
-            return txt
-    logger.warning("Группа %s не найдена ни в одном локальном CSV.", group_code)
-    return None
+    loc = lookup_group(group_code)
+    if loc is None:
+        logger.warning("Группа %s не найдена ни в одном локальном CSV.", group_code)
+        return None
+
+    p = _gid_path(loc[0])
+    try:
+        txt = await run_io(sheet_slices.read_group_csv, p, loc[1])
+    except Exception as e:
+        logger.warning("Не удалось прочитать %s: %s", p, e)
+        return None
+    logger.info("Группа %s найдена в %s", group_code, p.name)
+    return txt
+
+
+async def raw_csv(gid: int) -> Optional[bytes]:
+    # исходный CSV листа для отладки: из срезов его не восстановить (лишние колонки и пустые строки
+    # не хранятся), поэтому без KEEP_RAW_CSV лист скачивается заново, мимо кэша и его метаданных
+    path = _raw_path(gid)
+    if cfg.keep_raw_csv and await run_io(path.exists):
+        return await run_io(path.read_bytes)
+    tmp = path.with_suffix(".csv.debug.tmp")
+    try:
+        res = await fetch_csv_to_file(get_session(), cfg.spreadsheet_id, gid, tmp, base_url=cfg.sheets_base_url)
+        return await run_io(tmp.read_bytes) if res.ok else None
+    finally:
+        await run_io(tmp.unlink, missing_ok=True)
@@ -0,0 +1,262 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from app.services.config import cfg
+from app.services.semester import local_today
+from app.services.sender import BULK, sender
+from app.services.user_state import user_states
+from app.services.workers import run_io
+
+logger = logging.getLogger(__name__)
+
+# (группа, user_id) последнего обработанного подписчика: рассылка идёт в этом порядке
+Cursor = Tuple[str, int]
+
+
+class DigestStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+
+    def _open(self):
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS subscriptions ("
+            " user_id INTEGER PRIMARY KEY,"
+            " chat_id INTEGER NOT NULL,"
+            " active INTEGER NOT NULL DEFAULT 1,"
+            " updated REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS broadcasts ("
+            " id TEXT PRIMARY KEY,"
+            " cursor_grp TEXT NOT NULL DEFAULT '',"
+            " cursor_user INTEGER NOT NULL DEFAULT 0,"
+            " sent INTEGER NOT NULL DEFAULT 0,"
+            " blocked INTEGER NOT NULL DEFAULT 0,"
+            " failed INTEGER NOT NULL DEFAULT 0,"
+            " finished INTEGER NOT NULL DEFAULT 0,"
+            " updated REAL NOT NULL)"
+        )
+        # уведомления об изменениях, ещё не разосланные до конца; пачка удаляется после рассылки
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS change_notices ("
+            " batch INTEGER NOT NULL,"
+            " grp TEXT NOT NULL,"
+            " text TEXT NOT NULL,"
+            " PRIMARY KEY (batch, grp))"
+        )
+        conn.commit()
+        self._conn = conn
+
+    async def open(self):
+        if self._conn is None:
+            await run_io(self._open)
+
+    async def close(self):
+        if self._conn is not None:
+            await run_io(self._conn.close)
+            self._conn = None
+
+    def _execute(self, sql: str, params=()) -> int:
+        with self._db_lock, self._conn:
+            return self._conn.execute(sql, params).rowcount
+
+    def _query(self, sql: str, params=()) -> list:
+        with self._db_lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    async def subscribe(self, user_id: int, chat_id: int):
+        await run_io(
+            self._execute,
+            "INSERT INTO subscriptions (user_id, chat_id, active, updated) VALUES (?, ?, 1, ?)"
+            " ON CONFLICT(user_id) DO UPDATE SET chat_id = excluded.chat_id, active = 1, updated = excluded.updated",
+            (user_id, chat_id, time.time()),
+        )
+
+    async def unsubscribe(self, user_id: int) -> bool:
+        changed = await run_io(
+            self._execute,
+            "UPDATE subscriptions SET active = 0, updated = ? WHERE user_id = ? AND active = 1",
+            (time.time(), user_id),
+        )
+        return changed > 0
+
+    def _deactivate(self, user_ids: List[int]):
+        now = time.time()
+        with self._db_lock, self._conn:
+            self._conn.executemany(
+                "UPDATE subscriptions SET active = 0, updated = ? WHERE user_id = ?",
+                [(now, uid) for uid in user_ids],
+            )
+
+    async def deactivate(self, user_ids: List[int]):
+        if user_ids:
+            await run_io(self._deactivate, user_ids)
+
+    async def page(self, after: Cursor, limit: int) -> List[Tuple[int, int, str]]:
+        # группа берётся из users в момент рассылки: сменил группу — получит новую
+        return await run_io(
+            self._query,
+            "SELECT s.user_id, s.chat_id, u.grp FROM subscriptions s JOIN users u ON u.user_id = s.user_id"
+            " WHERE s.active = 1 AND (u.grp > ? OR (u.grp = ? AND s.user_id > ?))"
+            " ORDER BY u.grp, s.user_id LIMIT ?",
+            (after[0], after[0], after[1], limit),
+        )
+
+    def _add_notices(self, texts: Dict[str, str]) -> int:
+        with self._db_lock, self._conn:
+            batch = self._conn.execute("SELECT COALESCE(MAX(batch), 0) + 1 FROM change_notices").fetchone()[0]
+            self._conn.executemany(
+                "INSERT INTO change_notices (batch, grp, text) VALUES (?, ?, ?)",
+                [(batch, grp, text) for grp, text in texts.items()],
+            )
+        return batch
+
+    async def add_notices(self, texts: Dict[str, str]) -> int:
+        return await run_io(self._add_notices, texts)
+
+    async def notice_batches(self) -> List[int]:
+        rows = await run_io(self._query, "SELECT DISTINCT batch FROM change_notices ORDER BY batch")
+        return [row[0] for row in rows]
+
+    async def notices(self, batch: int) -> Dict[str, str]:
+        rows = await run_io(self._query, "SELECT grp, text FROM change_notices WHERE batch = ?", (batch,))
+        return dict(rows)
+
+    async def notice_page(self, batch: int, after: Cursor, limit: int) -> List[Tuple[int, int, str]]:
+        return await run_io(
+            self._query,
+            "SELECT s.user_id, s.chat_id, u.grp FROM subscriptions s JOIN users u ON u.user_id = s.user_id"
+            " WHERE s.active = 1 AND u.grp IN (SELECT grp FROM change_notices WHERE batch = ?)"
+            " AND (u.grp > ? OR (u.grp = ? AND s.user_id > ?))"
+            " ORDER BY u.grp, s.user_id LIMIT ?",
+            (batch, after[0], after[0], after[1], limit),
+        )
+
+    def _finish_notices(self, batch: int, broadcast_id: str):
+        with self._db_lock, self._conn:
+            self._conn.execute("DELETE FROM change_notices WHERE batch = ?", (batch,))
+            self._conn.execute("DELETE FROM broadcasts WHERE id = ?", (broadcast_id,))
+
+    async def finish_notices(self, batch: int, broadcast_id: str):
+        await run_io(self._finish_notices, batch, broadcast_id)
+
+    async def load_broadcast(self, broadcast_id: str) -> Optional[dict]:
+        rows = await run_io(
+            self._query,
+            "SELECT cursor_grp, cursor_user, sent, blocked, failed, finished FROM broadcasts WHERE id = ?",
+            (broadcast_id,),
+        )
+        if not rows:
+            return None
+        grp, uid, sent, blocked, failed, finished = rows[0]
+        return {"cursor": (grp, uid), "sent": sent, "blocked": blocked, "failed": failed, "finished": bool(finished)}
+
+    async def checkpoint(self, broadcast_id: str, progress: dict):
+        await run_io(
+            self._execute,
+            "INSERT INTO broadcasts (id, cursor_grp, cursor_user, sent, blocked, failed, finished, updated)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(id) DO UPDATE SET cursor_grp = excluded.cursor_grp, cursor_user = excluded.cursor_user,"
+            " sent = excluded.sent, blocked = excluded.blocked, failed = excluded.failed,"
+            " finished = excluded.finished, updated = excluded.updated",
+            (broadcast_id, progress["cursor"][0], progress["cursor"][1], progress["sent"],
+             progress["blocked"], progress["failed"], int(progress["finished"]), time.time()),
+        )
+
+
+digest_store = DigestStore(cfg.user_db)
+
+
+def unreachable(exc: BaseException) -> bool:
+    # бот заблокирован или чата больше нет: повторять отправку бессмысленно
+    if isinstance(exc, TelegramForbiddenError):
+        return True
+    return isinstance(exc, TelegramBadRequest) and "chat not found" in exc.message.lower()
+
+
+async def send_batch(bot: Bot, targets: Sequence[Tuple[int, int, str]], progress: dict):
+    results = await asyncio.gather(
+        *[sender.send_message(bot, chat_id, text, BULK, parse_mode="HTML", disable_web_page_preview=True)
+          for _, chat_id, text in targets],
+        return_exceptions=True,
+    )
+    blocked = []
+    for (user_id, _, _), res in zip(targets, results):
+        if isinstance(res, BaseException) and unreachable(res):
+            blocked.append(user_id)
+        elif isinstance(res, BaseException):
+            progress["failed"] += 1
+        else:
+            progress["sent"] += 1
+    # недоступных отписываем одной транзакцией на пачку
+    await digest_store.deactivate(blocked)
+    progress["blocked"] += len(blocked)
+
+
+def digest_day() -> date:
+    # день рассылки — по часовому поясу бота, а не хоста
+    return local_today()
+
+
+async def broadcast(bot: Bot, render: Callable[[str, date], Optional[str]], day: Optional[date] = None,
+                    batch: Optional[int] = None) -> dict:
+    # один и тот же день и для контрольной точки, и для текста: иначе после перезапуска около полуночи
+    # рассылка продолжилась бы по одной дате, а расписание показала бы за другую
+    day = day or digest_day()
+    broadcast_id = day.isoformat()
+    batch = batch or cfg.digest_batch
+
+    progress = await digest_store.load_broadcast(broadcast_id)
+    if progress is not None and progress["finished"]:
+        logger.info("Рассылка %s уже завершена.", broadcast_id)
+        return progress
+    if progress is None:
+        progress = {"cursor": ("", 0), "sent": 0, "blocked": 0, "failed": 0, "finished": False}
+    else:
+        logger.info("Продолжаю рассылку %s с группы %s (отправлено %d).",
+                    broadcast_id, progress["cursor"][0], progress["sent"])
+
+    # смены групп, ещё не сброшенные на диск, должны попасть в выборку
+    await user_states.flush()
+    started = time.monotonic()
+    texts: Dict[str, Optional[str]] = {}
+
+    while True:
+        rows = await digest_store.page(progress["cursor"], batch)
+        if not rows:
+            break
+
+        targets = []
+        for user_id, chat_id, grp in rows:
+            if grp not in texts:
+                texts.clear()  # подписчики идут по группам — держим только текущий текст
+                texts[grp] = render(grp, day)
+            if texts[grp]:
+                targets.append((user_id, chat_id, texts[grp]))
+
+        await send_batch(bot, targets, progress)
+
+        last_user, _, last_grp = rows[-1]
+        progress["cursor"] = (last_grp, last_user)
+        await digest_store.checkpoint(broadcast_id, progress)
+
+    progress["finished"] = True
+    await digest_store.checkpoint(broadcast_id, progress)
+    logger.info("Рассылка %s завершена за %.1f сек: отправлено %d, заблокировали бота %d, ошибок %d.",
+                broadcast_id, time.monotonic() - started, progress["sent"], progress["blocked"], progress["failed"])
+    return progress
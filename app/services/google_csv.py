@@ -1,53 +1,97 @@
+import hashlib
 import logging
-from typing import Optional, List
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
 
 import aiohttp
 
+from app.services.workers import run_io
+
 logger = logging.getLogger(__name__)
 
 BASE_URL = "https://docs.google.com/spreadsheets/d/{id}/export?format=csv&gid={gid}"
+CHUNK_SIZE = 64 * 1024
+# сколько накопить, прежде чем отдать запись в пул: один поход в пул на пачку, а не на каждый кусок
+FLUSH_SIZE = 1024 * 1024
 
 
-async def fetch_csv_text(spreadsheet_id: str, gid: int, session: Optional[aiohttp.ClientSession] = None):
-    url = BASE_URL.format(id=spreadsheet_id, gid=gid)
-    logger.info("Загрузка CSV: GID=%s", gid)
-    logger.debug("URL: %s", url)
+@dataclass(frozen=True)
+class FetchResult:
+    status: int
+    sha256: str = ""
+    size: int = 0
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
 
-    try:
-        close_session = False
-        if session is None:
-            session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15))
-            close_session = True
+    @property
+    def ok(self) -> bool:
+        return self.status == 200
 
-        async with session.get(url) as resp:
-            if resp.status == 200:
-                text = await resp.text()
-                return text
+    @property
+    def not_modified(self) -> bool:
+        return self.status == 304
 
-            logger.error("Ошибка загрузки CSV: GID=%s, статус=%s", gid, resp.status)
-            return None
 
-    except Exception as e:
-        logger.exception("Ошибка при загрузке GID=%s: %s", gid, e)
-        return None
+def create_session(pool_size: int = 8, timeout_sec: float = 60) -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(limit=pool_size, keepalive_timeout=60)
+    return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout_sec))
 
-    finally:
-        if close_session:
-            await session.close()
 
+async def fetch_csv_to_file(
+        session: aiohttp.ClientSession,
+        spreadsheet_id: str,
+        gid: int,
+        dest: Path,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        base_url: str = BASE_URL,
+) -> FetchResult:
+    url = base_url.format(id=spreadsheet_id, gid=gid)
+    logger.info("Загрузка CSV: GID=%s", gid)
+    logger.debug("URL: %s", url)
+
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
 
-async def find_group_schedule(spreadsheet_id: str, gids: List[int], group_code: str):
-    logger.info("Поиск группы %s в листах: %s", group_code, gids)
+    try:
+        async with session.get(url, headers=headers) as resp:
+            if resp.status == 304:
+                logger.info("CSV не изменился (304): GID=%s", gid)
+                return FetchResult(304, etag=etag, last_modified=last_modified)
+            if resp.status != 200:
+                logger.error("Ошибка загрузки CSV: GID=%s, статус=%s", gid, resp.status)
+                return FetchResult(resp.status)
 
-    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15)) as session:
-        for gid in gids:
-            csv_text = await fetch_csv_text(spreadsheet_id, gid, session=session)
-            if csv_text and group_code in csv_text:
-                logger.info("Группа %s найдена в GID=%s", group_code, gid)
-                return csv_text
+            digest = hashlib.sha256()
+            size = 0
+            pending, pending_size = [], 0
+            fh = await run_io(open, dest, "wb")
+            try:
+                async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    pending.append(chunk)
+                    pending_size += len(chunk)
+                    if pending_size >= FLUSH_SIZE:
+                        await run_io(fh.writelines, pending)
+                        pending, pending_size = [], 0
+                if pending:
+                    await run_io(fh.writelines, pending)
+            finally:
+                await run_io(fh.close)
 
-            if csv_text:
-                logger.debug("Группа %s не найдена в GID=%s", group_code, gid)
+            return FetchResult(
+                200,
+                sha256=digest.hexdigest(),
+                size=size,
+                etag=resp.headers.get("ETag"),
+                last_modified=resp.headers.get("Last-Modified"),
+            )
 
-    logger.warning("Группа %s не найдена ни в одном листе", group_code)
-    return None
+    except Exception as e:
+        logger.exception("Ошибка при загрузке GID=%s: %s", gid, e)
+        return FetchResult(0)
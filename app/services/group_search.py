@@ -0,0 +1,108 @@
+import bisect
+import logging
+import re
+from typing import Dict, Iterable, List, Tuple
+
+from app.services import schedule_store
+
+logger = logging.getLogger(__name__)
+
+# «09-825» — номер группы в шапке листа, коды таких групп начинаются с 825
+_DASHED_RE = re.compile(r"^\s*\d{1,2}\s*-\s*(\d+)\s*$")
+
+
+def _deletions(code: str) -> Iterable[str]:
+    return {code[:i] + code[i + 1:] for i in range(len(code))}
+
+
+def _within_one(a: str, b: str) -> bool:
+    # общее удаление находит и пары на расстоянии 2, поэтому кандидатов проверяем точно
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    i = 0
+    while i < min(la, lb) and a[i] == b[i]:
+        i += 1
+    if la == lb:
+        return a[i + 1:] == b[i + 1:] or (a[i + 2:] == b[i + 2:] and a[i:i + 2] == b[i:i + 2][::-1])
+    return a[i + 1:] == b[i:] if la > lb else a[i:] == b[i + 1:]
+
+
+class GroupSearch:
+    def __init__(self, codes: Iterable[str] = ()):
+        self._codes: Tuple[str, ...] = ()
+        self._set: frozenset = frozenset()
+        # вариант кода без одной цифры (или сам код) -> коды; поиск с расстоянием 1 через общие удаления
+        self._deletes: Dict[str, Tuple[str, ...]] = {}
+        self.build(codes)
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self._set
+
+    def build(self, codes: Iterable[str]):
+        ordered = tuple(sorted(set(codes)))
+        deletes: Dict[str, List[str]] = {}
+        for code in ordered:
+            deletes.setdefault(code, []).append(code)
+            for variant in _deletions(code):
+                deletes.setdefault(variant, []).append(code)
+        self._codes = ordered
+        self._set = frozenset(ordered)
+        self._deletes = {k: tuple(v) for k, v in deletes.items()}
+
+    def prefix(self, prefix: str, limit: int = 8) -> List[str]:
+        codes = self._codes
+        i = bisect.bisect_left(codes, prefix)
+        out: List[str] = []
+        while i < len(codes) and len(out) < limit and codes[i].startswith(prefix):
+            out.append(codes[i])
+            i += 1
+        return out
+
+    def count_prefix(self, prefix: str) -> int:
+        # все коды с префиксом лежат между prefix и prefix + «цифра больше 9»
+        codes = self._codes
+        return bisect.bisect_left(codes, prefix + ":") - bisect.bisect_left(codes, prefix)
+
+    def near(self, code: str, limit: int = 8) -> List[str]:
+        found = set()
+        for key in {code, *_deletions(code)}:
+            found.update(self._deletes.get(key, ()))
+        found.discard(code)
+        return sorted(c for c in found if _within_one(code, c))[:limit]
+
+    def suggest(self, query: str, limit: int = 8) -> List[str]:
+        if not query:
+            return []
+        if query in self._set:
+            return [query]
+        out = self.prefix(query, limit)
+        if len(out) < limit:
+            out += [c for c in self.near(query, limit) if c not in out][:limit - len(out)]
+        return out
+
+
+def normalize_query(text: str) -> str:
+    m = _DASHED_RE.match(text or "")
+    if m:
+        return m.group(1)
+    return "".join(ch for ch in (text or "") if ch.isdigit())
+
+
+group_search = GroupSearch()
+
+
+def _on_store_update(store: schedule_store.ScheduleStore, changed):
+    # состав групп меняется редко: пересобираем индекс, только если он действительно другой
+    if len(store.groups) == len(group_search) and all(code in group_search for code in store.groups):
+        return
+    group_search.build(store.groups)
+    logger.info("Индекс поиска групп перестроен: %d кодов.", len(group_search))
+
+
+schedule_store.add_listener(_on_store_update)
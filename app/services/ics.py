@@ -0,0 +1,156 @@
+import hashlib
+import logging
+from collections import OrderedDict
+from datetime import date, datetime, time, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+from app.services import schedule_store
+from app.services.coalesce import Coalescer
+from app.services.config import cfg
+from app.services.reverse_index import split_teachers
+from app.services.schedule_store import Lesson
+from app.services.semester import LESSON_MINUTES, calendar_index, time_to_minutes
+from app.services.workers import run_io
+
+logger = logging.getLogger(__name__)
+
+PRODID = "-//KFU schedule bot//RU"
+CONTENT_TYPE = "text/calendar"
+# календарные клиенты и так опрашивают подписки редко; повторный запрос с If-None-Match стоит копейки
+MAX_AGE = 3600
+
+Feed = Tuple[str, bytes]  # (ETag, тело)
+
+
+def _escape(value: str) -> str:
+    return (value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _fold(line: str) -> str:
+    # RFC 5545: строки длиннее 75 байт переносятся, не разрывая символы UTF-8
+    if len(line.encode("utf-8")) <= 75:
+        return line
+    parts, current, size = [], [], 0
+    for ch in line:
+        n = len(ch.encode("utf-8"))
+        if size + n > (75 if not parts else 74):
+            parts.append("".join(current))
+            current, size = [], 0
+        current.append(ch)
+        size += n
+    parts.append("".join(current))
+    return "\r\n ".join(parts)
+
+
+def _utc(d: date, minutes: int, tz: ZoneInfo) -> str:
+    local = datetime.combine(d, time(minutes // 60, minutes % 60), tzinfo=tz)
+    return local.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def build(group: str, occurrences: Sequence[Tuple[date, Tuple[Lesson, ...]]], stamp: date) -> bytes:
+    tz = ZoneInfo(cfg.tz)
+    dtstamp = stamp.strftime("%Y%m%dT000000Z")
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape(f'Расписание {group}')}",
+        f"X-WR-TIMEZONE:{cfg.tz}",
+    ]
+    for d, lessons in occurrences:
+        seen: Dict[str, int] = {}
+        for les in lessons:
+            start = time_to_minutes(les.time)
+            if start < 0 or not les.subject:
+                continue
+            slot = f"{d:%Y%m%d}-{start // 60:02d}{start % 60:02d}"
+            seen[slot] = seen.get(slot, 0) + 1
+            rooms = ", ".join(x for x in (les.room1, les.room2) if x)
+            location = ", ".join(x for x in (les.building, f"ауд. {rooms}" if rooms else "") if x)
+            summary = f"{les.subject} ({les.type})" if les.type else les.subject
+            lines += [
+                "BEGIN:VEVENT",
+                f"UID:{group}-{slot}-{seen[slot]}@kfu-schedule",
+                f"DTSTAMP:{dtstamp}",
+                f"DTSTART:{_utc(d, start, tz)}",
+                f"DTEND:{_utc(d, start + LESSON_MINUTES, tz)}",
+                f"SUMMARY:{_escape(summary)}",
+            ]
+            if location:
+                lines.append(f"LOCATION:{_escape(location)}")
+            teachers = ", ".join(split_teachers(les.teacher))
+            if teachers:
+                lines.append(f"DESCRIPTION:{_escape(teachers)}")
+            lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(_fold(line) for line in lines) + "\r\n").encode("utf-8")
+
+
+class IcsFeeds:
+    # Готовые .ics по группам; ключ — поколение хранилища и окно дат, ETag — хэш тела
+    def __init__(self, max_groups: int = 1024):
+        self.max_groups = max_groups
+        self._feeds: "OrderedDict[str, Tuple[tuple, Feed]]" = OrderedDict()
+        self.coalescer = Coalescer("ics")
+        self.builds = 0
+        self.hits = 0
+        self.not_modified = 0
+
+    async def get(self, group: str) -> Optional[Feed]:
+        # get() заодно сдвигает окно дат, если сменились сутки
+        if calendar_index.get(group) is None:
+            return None
+        key = (schedule_store.current().generation, calendar_index.window)
+        cached = self._feeds.get(group)
+        if cached is not None and cached[0] == key:
+            self._feeds.move_to_end(group)
+            self.hits += 1
+            return cached[1]
+        occurrences = calendar_index.occurrences(group)
+        body = await self.coalescer.run((group, key), lambda: run_io(build, group, occurrences, key[1][0]))
+        feed = (f'"{hashlib.sha1(body).hexdigest()}"', body)
+        self._feeds[group] = (key, feed)
+        self._feeds.move_to_end(group)
+        self.builds += 1
+        while len(self._feeds) > self.max_groups:
+            self._feeds.popitem(last=False)
+        return feed
+
+    def stats(self) -> Dict[str, int]:
+        return {"feeds": len(self._feeds), "builds": self.builds, "hits": self.hits,
+                "not_modified": self.not_modified}
+
+
+feeds = IcsFeeds(cfg.calendar_cache_size)
+
+
+def feed_url(group: str) -> Optional[str]:
+    return f"{cfg.calendar_base_url}/ics/{group}.ics" if cfg.calendar_base_url else None
+
+
+def _etags(header: str) -> List[str]:
+    return [t.strip().removeprefix("W/") for t in header.split(",") if t.strip()]
+
+
+async def handle(request):
+    from aiohttp import web
+
+    group = request.match_info["group"]
+    feed = await feeds.get(group)
+    if feed is None:
+        raise web.HTTPNotFound(text="Группа не найдена")
+    etag, body = feed
+    headers = {"ETag": etag, "Cache-Control": f"max-age={MAX_AGE}"}
+    match = _etags(request.headers.get("If-None-Match", ""))
+    if etag in match or "*" in match:
+        feeds.not_modified += 1
+        return web.Response(status=304, headers=headers)
+    return web.Response(body=body, content_type=CONTENT_TYPE, charset="utf-8", headers=headers)
+
+
+def add_routes(app):
+    app.router.add_get("/ics/{group}.ics", handle)
@@ -0,0 +1,146 @@
+import copy
+import json
+import logging
+import queue
+import random
+from contextvars import ContextVar, Token
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional
+
+# поля, которые попадают в JSON отдельными ключами
+STRUCTURED_FIELDS = ("user", "group", "handler", "latency_ms", "event")
+
+# поля текущего апдейта (user, handler, group...), их добавляет ко всем записям ContextFilter
+_context: ContextVar[Optional[dict]] = ContextVar("log_context", default=None)
+
+
+def push_context(**fields) -> Token:
+    return _context.set(dict(fields))
+
+
+def pop_context(token: Token):
+    _context.reset(token)
+
+
+def bind(**fields):
+    ctx = _context.get()
+    if ctx is not None:
+        ctx.update(fields)
+
+
+def parse_sampling(raw: str) -> Dict[str, float]:
+    # "app.handlers=0.1,app.access=0.05" -> {"app.handlers": 0.1, "app.access": 0.05}
+    out: Dict[str, float] = {}
+    for part in (raw or "").split(","):
+        name, _, rate = part.partition("=")
+        try:
+            out[name.strip()] = max(0.0, min(1.0, float(rate)))
+        except ValueError:
+            continue
+    return out
+
+
+class ContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        ctx = _context.get()
+        if ctx:
+            for key, value in ctx.items():
+                if not hasattr(record, key):
+                    setattr(record, key, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    # Пропускает долю rate записей ниже WARNING от логгера и его потомков; предупреждения и ошибки — всегда
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._cache: Dict[str, float] = {}
+        self.sampled_out = 0
+
+    def _rate(self, name: str) -> float:
+        rate = self._cache.get(name)
+        if rate is None:
+            rate, probe = 1.0, name
+            while probe:
+                if probe in self.rates:
+                    rate = self.rates[probe]
+                    break
+                probe = probe.rpartition(".")[0]
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class DroppingQueueHandler(QueueHandler):
+    # Не блокирует цикл событий: при переполненной очереди запись отбрасывается и учитывается
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # форматирование — в потоке слушателя; здесь только фиксируем текст и трейсбек
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key in STRUCTURED_FIELDS:
+            value = getattr(record, key, None)
+            if value is not None:
+                out[key] = value
+        if record.exc_text:
+            out["exc"] = record.exc_text
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+
+class LogPipeline:
+    def __init__(self, handlers: List[logging.Handler], queue_size: int = 10_000,
+                 sampling: Optional[Dict[str, float]] = None):
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.sampler = SamplingFilter(sampling or {})
+        self.handler.addFilter(self.sampler)
+        self.handler.addFilter(ContextFilter())
+        self.listener = QueueListener(self.queue, *handlers, respect_handler_level=True)
+
+    def start(self):
+        self.listener.start()
+
+    def stop(self):
+        # дописывает всё, что уже в очереди
+        self.listener.stop()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self.queue.qsize(),
+            "dropped": self.handler.dropped,
+            "sampled_out": self.sampler.sampled_out,
+        }
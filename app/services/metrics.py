@@ -0,0 +1,200 @@
+import bisect
+import logging
+import math
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _fmt_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def _labels(self, values: Labels) -> Dict[str, str]:
+        return dict(zip(self.labelnames, values))
+
+    def samples(self) -> Iterable[Sample]:
+        return ()
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def get(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, value in self._values.items():
+            yield self.name, self._labels(labels), value
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, *labels: str):
+        self._values[labels] = value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [счётчики по корзинам..., +Inf], сумма
+        self._counts: Dict[Labels, List[int]] = {}
+        self._sums: Dict[Labels, float] = {}
+
+    def observe(self, value: float, *labels: str):
+        counts = self._counts.get(labels)
+        if counts is None:
+            counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+            self._sums[labels] = 0.0
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[labels] += value
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, counts in self._counts.items():
+            base = self._labels(labels)
+            acc = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                acc += count
+                yield f"{self.name}_bucket", {**base, "le": _fmt_value(bound)}, acc
+            yield f"{self.name}_sum", base, self._sums[labels]
+            yield f"{self.name}_count", base, acc
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        # функции, которые при выдаче /metrics возвращают готовые значения (name, help, type, samples)
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, Iterable[Sample]]]]] = []
+
+    def _register(self, metric: _Metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def add_collector(self, fn: Callable[[], Iterable[Tuple[str, str, str, Iterable[Sample]]]]):
+        self._collectors.append(fn)
+
+    def render(self) -> str:
+        # одно семейство может прийти от нескольких сборщиков (например, пулы io и cpu)
+        families: Dict[str, Tuple[str, str, List[Sample]]] = {}
+        for metric in list(self._metrics.values()):
+            families[metric.name] = (metric.help, metric.type, list(metric.samples()))
+        for collector in self._collectors:
+            try:
+                for name, help, type_, samples in collector():
+                    families.setdefault(name, (help, type_, []))[2].extend(samples)
+            except Exception:
+                logger.exception("Ошибка в сборщике метрик")
+
+        lines: List[str] = []
+        for name, (help, type_, samples) in families.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {type_}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_fmt_labels(labels)} {_fmt_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+updates_total = registry.counter("tgbot_updates_total", "Обработанные события", ("event",))
+handler_seconds = registry.histogram("tgbot_handler_seconds", "Время работы хендлера", ("handler",))
+handler_errors = registry.counter("tgbot_handler_errors_total", "Исключения в хендлерах", ("handler",))
+throttled_total = registry.counter("tgbot_throttled_total", "Отклонено антифлудом", ("event",))
+singleflight_coalesced = registry.counter(
+    "tgbot_singleflight_coalesced_total", "Повторы запроса, пришедшие, пока такой же ещё обрабатывается", ("event",)
+)
+download_seconds = registry.histogram(
+    "tgbot_download_seconds", "Длительность скачивания листа", ("gid",),
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+download_bytes = registry.gauge("tgbot_download_bytes", "Размер последнего скачанного листа", ("gid",))
+download_failures = registry.counter("tgbot_download_failures_total", "Неудачные скачивания листа", ("gid",))
+download_unchanged = registry.counter("tgbot_download_unchanged_total", "Скачивания без изменений", ("gid",))
+parse_seconds = registry.histogram(
+    "tgbot_parse_seconds", "Длительность разбора листа", ("gid",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+
+def stats_collector(prefix: str, help: str, source: Callable[[], Dict[str, float]],
+                    label: Optional[Tuple[str, str]] = None):
+    # превращает dict из .stats() компонента в набор gauge-метрик
+    def collect():
+        labels = {label[0]: label[1]} if label else {}
+        values = dict(source())
+        if "hits" in values and "misses" in values:
+            total = values["hits"] + values["misses"]
+            values["hit_ratio"] = values["hits"] / total if total else 0.0
+        for key, value in values.items():
+            yield f"{prefix}_{key}", f"{help}: {key}", "gauge", [(f"{prefix}_{key}", labels, value)]
+
+    registry.add_collector(collect)
+
+
+async def start_http_server(host: str, port: int, setup: Optional[Callable] = None):
+    from aiohttp import web
+
+    async def handle(_request):
+        return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    if setup is not None:
+        # дополнительные маршруты на том же порту (например, ленты .ics)
+        setup(app)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Метрики доступны на http://%s:%s/metrics", host, port)
+    return runner
@@ -1,83 +1,39 @@
-import logging
-from io import StringIO
-from typing import List, Dict
-import re
+import importlib
+from pathlib import Path
+from types import ModuleType
+from typing import Dict, List, Optional
 
-import pandas as pd
+from app.services.config import cfg
+from app.services.sheet_slices import read_projected
 
-logger = logging.getLogger(__name__)
+# pandas импортируется только при выборе соответствующего движка
+ENGINES = {
+    "pandas": "app.services.parser_pandas",
+    "csv": "app.services.parser_csv",
+}
 
 
-def _clean_series(series: pd.Series):
-    return series.astype(str).str.strip().replace("nan", "")
+def get_engine(name: Optional[str] = None) -> ModuleType:
+    name = (name or cfg.parser_engine).strip().lower()
+    module = ENGINES.get(name)
+    if module is None:
+        raise ValueError(f"Неизвестный движок парсера: {name}")
+    return importlib.import_module(module)
 
 
-def _strip_dot_zero(series: pd.Series):
-    return series.apply(
-        lambda s: re.sub(r'^(\d+)\.0$', r'\1', s) if isinstance(s, str) else s
-    )
+def parse_schedule(csv_text: str, group_code: str, engine: Optional[str] = None) -> List[Dict]:
+    return get_engine(engine).parse_schedule(csv_text, group_code)
 
 
-def parse_schedule(csv_text: str, group_code: str) -> List[Dict]:
-    if not csv_text:
-        logger.warning("Получен пустой CSV для группы %s", group_code)
-        return []
+def parse_sheet(csv_text: str, columns: Dict[str, int], engine: Optional[str] = None) -> Dict[str, List[Dict]]:
+    return get_engine(engine).parse_sheet(csv_text, columns)
 
-    try:
-        df = pd.read_csv(StringIO(csv_text), header=[0, 1])
-    except Exception as e:
-        logger.error("Ошибка при чтении CSV для группы %s: %s", group_code, e)
-        return []
 
-    col_day, col_time, col_week = df.columns[:3]
-    days = df[col_day].ffill()
-    times = _clean_series(df[col_time])
-    weeks = _clean_series(df[col_week])
-
-    start_idx = next(
-        (i for i, col in enumerate(df.columns) if group_code in str(col[0])),
-        None,
-    )
-    if start_idx is None:
-        logger.warning("Группа %s не найдена в таблице", group_code)
-        return []
-
-    try:
-        col_subj = df.columns[start_idx]
-        col_build = df.columns[start_idx + 1]
-        col_room1 = df.columns[start_idx + 2]
-        col_room2 = df.columns[start_idx + 3]
-        col_type = df.columns[start_idx + 4]
-        col_teacher = df.columns[start_idx + 7]
-    except Exception as e:
-        logger.error("Ошибка при определении колонок для группы %s: %s", group_code, e)
-        return []
-
-    subj = _clean_series(df[col_subj])
-    build = _clean_series(df[col_build])
-    room1 = _strip_dot_zero(_clean_series(df[col_room1]))
-    room2 = _strip_dot_zero(_clean_series(df[col_room2]))
-    type_ = _clean_series(df[col_type])
-    teach = _clean_series(df[col_teacher])
-
-    out = []
-    for d, t, w, s, b, r1, r2, ty, te in zip(
-            days, times, weeks, subj, build, room1, room2, type_, teach
-    ):
-        if s and t:
-            out.append(
-                {
-                    "group": group_code,
-                    "day": d,
-                    "time": t,
-                    "week_type": w,
-                    "subject": s,
-                    "building": b,
-                    "room1": r1,
-                    "room2": r2,
-                    "type": ty,
-                    "teacher": te,
-                }
-            )
-
-    return out
+def parse_sheet_file(path: str, columns: Dict[str, int], engine: Optional[str] = None) -> Dict[str, List[Dict]]:
+    if path.endswith(".csv"):
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            return parse_sheet(f.read(), columns, engine)
+    # срезы: парсер получает CSV только из колонок этих групп, с новыми номерами колонок
+    csv_text, remapped = read_projected(Path(path), columns)
+    parsed = parse_sheet(csv_text, remapped, engine)
+    return {code: parsed.get(code, []) for code in columns}
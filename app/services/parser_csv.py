@@ -0,0 +1,184 @@
+import csv
+import logging
+import re
+from io import StringIO
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Значения, которые pandas.read_csv по умолчанию считает пропусками
+NA_VALUES = frozenset({
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None",
+    "n/a", "nan", "null",
+})
+TRUE_VALUES = frozenset({"True", "TRUE", "true"})
+FALSE_VALUES = frozenset({"False", "FALSE", "false"})
+
+# только ASCII-цифры: «٣» и прочие цифры Unicode pandas оставляет строкой
+_INT_RE = re.compile(r"^\s*[+-]?[0-9]+\s*$")
+_FLOAT_RE = re.compile(r"^\s*[+-]?(?:[0-9]+\.?[0-9]*(?:[eE][+-]?[0-9]+)?|\.[0-9]+(?:[eE][+-]?[0-9]+)?|inf|Inf|INF|infinity|Infinity)\s*$")
+_DOT_ZERO_RE = re.compile(r'^(\d+)\.0$')
+
+# Смещения колонок группы относительно колонки с её кодом
+SUBJ, BUILD, ROOM1, ROOM2, TYPE_, TEACHER = 0, 1, 2, 3, 4, 7
+GROUP_WIDTH = TEACHER + 1
+
+
+def _is_na(token: Optional[str]) -> bool:
+    return token is None or token in NA_VALUES
+
+
+def _clean_column(tokens: List[Optional[str]]) -> List[str]:
+    # Повторяет вывод типов pandas + astype(str).str.strip().replace("nan", "")
+    values = [t for t in tokens if not _is_na(t)]
+    has_na = len(values) != len(tokens)
+
+    if values and all(_INT_RE.match(v) for v in values):
+        if has_na:
+            conv = lambda t: repr(float(int(t)))
+        else:
+            conv = lambda t: str(int(t))
+    elif values and all(_FLOAT_RE.match(v) for v in values):
+        conv = lambda t: repr(float(t))
+    elif values and all(v in TRUE_VALUES or v in FALSE_VALUES for v in values):
+        # с пропусками pandas держит колонку как object, но значения всё равно True/False
+        conv = lambda t: "True" if t in TRUE_VALUES else "False"
+    else:
+        conv = lambda t: t
+
+    out = []
+    for t in tokens:
+        s = "" if _is_na(t) else conv(t).strip()
+        out.append("" if s == "nan" else s)
+    return out
+
+
+def _strip_dot_zero(values: List[str]) -> List[str]:
+    return [_DOT_ZERO_RE.sub(r'\1', s) for s in values]
+
+
+def _ffill(tokens: List[Optional[str]]) -> List[Optional[str]]:
+    out = []
+    last = None
+    for t in tokens:
+        if not _is_na(t):
+            last = t
+        out.append(last)
+    return out
+
+
+def _read_columns(rows: Iterable[List[str]], wanted: List[int]) -> Dict[int, List[Optional[str]]]:
+    cols: Dict[int, List[Optional[str]]] = {i: [] for i in wanted}
+    for row in rows:
+        if not row:
+            continue
+        n = len(row)
+        for i, col in cols.items():
+            col.append(row[i] if i < n else None)
+    return cols
+
+
+def _header_names(first: List[str], width: int) -> List[str]:
+    names = []
+    for i in range(width):
+        cell = first[i] if i < len(first) else ""
+        names.append(cell if cell else f"Unnamed: {i}_level_0")
+    return names
+
+
+def _build_lessons(cols: Dict[int, List[Optional[str]]], cleaned: Dict[int, List[str]],
+                   start_idx: int, group_code: str) -> List[Dict]:
+    days = _ffill(cols[0])
+    times = cleaned[1]
+    weeks = cleaned[2]
+    subj = cleaned[start_idx + SUBJ]
+    build = cleaned[start_idx + BUILD]
+    room1 = _strip_dot_zero(cleaned[start_idx + ROOM1])
+    room2 = _strip_dot_zero(cleaned[start_idx + ROOM2])
+    type_ = cleaned[start_idx + TYPE_]
+    teach = cleaned[start_idx + TEACHER]
+
+    out = []
+    for d, t, w, s, b, r1, r2, ty, te in zip(
+            days, times, weeks, subj, build, room1, room2, type_, teach
+    ):
+        if s and t:
+            out.append(
+                {
+                    "group": group_code,
+                    "day": d,
+                    "time": t,
+                    "week_type": w,
+                    "subject": s,
+                    "building": b,
+                    "room1": r1,
+                    "room2": r2,
+                    "type": ty,
+                    "teacher": te,
+                }
+            )
+    return out
+
+
+def _parse(csv_text: str, columns: Dict[str, int]) -> Dict[str, List[Dict]]:
+    reader = csv.reader(StringIO(csv_text, newline=""))
+    first = next(reader, [])
+    second = next(reader, [])
+    width = max(len(first), len(second))
+    if width < 3:
+        raise ValueError("в CSV меньше трёх колонок")
+
+    starts: Dict[str, int] = {}
+    for code, start_idx in columns.items():
+        if start_idx + GROUP_WIDTH > width:
+            logger.error("Ошибка при определении колонок для группы %s: колонка %d вне таблицы",
+                         code, start_idx + TEACHER)
+            continue
+        starts[code] = start_idx
+
+    wanted = {0, 1, 2}
+    for start_idx in starts.values():
+        wanted.update(start_idx + off for off in (SUBJ, BUILD, ROOM1, ROOM2, TYPE_, TEACHER))
+    cols = _read_columns(reader, sorted(wanted))
+    cleaned = {i: _clean_column(tokens) for i, tokens in cols.items() if i != 0}
+
+    result = {code: [] for code in columns}
+    for code, start_idx in starts.items():
+        result[code] = _build_lessons(cols, cleaned, start_idx, code)
+    return result
+
+
+def find_group_column(csv_text: str, group_code: str) -> Optional[int]:
+    reader = csv.reader(StringIO(csv_text, newline=""))
+    first = next(reader, [])
+    second = next(reader, [])
+    names = _header_names(first, max(len(first), len(second)))
+    return next((i for i, name in enumerate(names) if group_code in name), None)
+
+
+def parse_schedule(csv_text: str, group_code: str) -> List[Dict]:
+    if not csv_text:
+        logger.warning("Получен пустой CSV для группы %s", group_code)
+        return []
+
+    try:
+        start_idx = find_group_column(csv_text, group_code)
+        if start_idx is None:
+            logger.warning("Группа %s не найдена в таблице", group_code)
+            return []
+        return _parse(csv_text, {group_code: start_idx})[group_code]
+    except Exception as e:
+        logger.error("Ошибка при чтении CSV для группы %s: %s", group_code, e)
+        return []
+
+
+def parse_sheet(csv_text: str, columns: Dict[str, int]) -> Dict[str, List[Dict]]:
+    if not csv_text:
+        return {}
+
+    try:
+        return _parse(csv_text, columns)
+    except Exception as e:
+        logger.error("Ошибка при чтении CSV листа: %s", e)
+        return {}
@@ -0,0 +1,213 @@
+import cProfile
+import io
+import json
+import logging
+import marshal
+import pstats
+import random
+import re
+import time
+import tracemalloc
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from app.services.config import cfg
+
+logger = logging.getLogger(__name__)
+
+SAMPLE = "sample"
+SLOW = "slow"
+# не чаще одного снимка медленного апдейта за это время — в час пик иначе будем писать на диск каждую секунду
+SLOW_COOLDOWN_SEC = 10.0
+TOP_LINES = 40
+_ID_RE = re.compile(r"^(sample|slow)-[\w.-]+$")
+
+
+@dataclass(frozen=True, slots=True)
+class Capture:
+    id: str
+    kind: str
+    handler: str
+    wall_ms: float
+    created: float
+    size: int
+
+
+class Profiler:
+    # Профилирует часть апдейтов cProfile и сохраняет профиль + tracemalloc для медленных.
+    # cProfile ставит хук на весь поток, поэтому одновременно профилируется не больше одного апдейта,
+    # а в профиль попадает всё, что цикл событий выполнял за это время. tracemalloc включается только
+    # на время профилируемого апдейта: остальные аллокации процесса не платят за трассировку.
+    def __init__(self, directory: str, keep: int = 20, sample_rate: float = 0.0, slow_ms: float = 0.0,
+                 trace_frames: int = 1):
+        self.directory = Path(directory)
+        self.keep = keep
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.trace_frames = trace_frames
+        self.enabled = False
+        self._active: Optional[cProfile.Profile] = None
+        # tracemalloc запущен нами для текущего профиля (а не, например, через PYTHONTRACEMALLOC)
+        self._tracing = False
+        # хендлеры, которые недавно были медленными без профиля — следующий их вызов профилируем
+        self._armed: Set[str] = set()
+        self._last_slow = 0.0
+        self.profiled = 0
+        self.slow = 0
+        self.captured = 0
+        self.busy = 0
+
+    def configure(self, enabled: Optional[bool] = None, sample_rate: Optional[float] = None,
+                  slow_ms: Optional[float] = None):
+        if sample_rate is not None:
+            self.sample_rate = max(0.0, min(1.0, sample_rate))
+        if slow_ms is not None:
+            self.slow_ms = max(0.0, slow_ms)
+        if enabled is not None and enabled != self.enabled:
+            self.enabled = enabled
+            logger.info("Профилирование %s (доля %.3f, порог %.0f мс).",
+                        "включено" if enabled else "выключено", self.sample_rate, self.slow_ms)
+
+    def begin(self, handler: str) -> Optional[cProfile.Profile]:
+        if not self.enabled:
+            return None
+        armed = handler in self._armed
+        if not armed and not (self.sample_rate and random.random() < self.sample_rate):
+            return None
+        if self._active is not None:
+            self.busy += 1
+            return None
+        self._armed.discard(handler)
+        if self.trace_frames > 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(self.trace_frames)
+            self._tracing = True
+        self._active = cProfile.Profile()
+        self._active.enable()
+        self.profiled += 1
+        return self._active
+
+    def finish(self, handler: str, profile: Optional[cProfile.Profile], wall: float, cpu: float,
+               info: Dict[str, object]) -> Optional[dict]:
+        # Возвращает описание снимка, который нужно записать (write_capture), или None
+        traced = self._tracing and profile is not None and self._active is profile
+        if profile is not None:
+            profile.disable()
+            if self._active is profile:
+                self._active = None
+        try:
+            return self._finish(handler, profile, wall, cpu, info, traced)
+        finally:
+            if traced:
+                tracemalloc.stop()
+                self._tracing = False
+
+    def _finish(self, handler: str, profile: Optional[cProfile.Profile], wall: float, cpu: float,
+                info: Dict[str, object], traced: bool) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        wall_ms = wall * 1000
+        is_slow = self.slow_ms > 0 and wall_ms >= self.slow_ms
+        if is_slow:
+            self.slow += 1
+            now = time.monotonic()
+            if now - self._last_slow < SLOW_COOLDOWN_SEC:
+                is_slow = False
+            else:
+                self._last_slow = now
+                if profile is None:
+                    self._armed.add(handler)
+        if not is_slow and profile is None:
+            return None
+        self.captured += 1
+        meta = {
+            "kind": SLOW if is_slow else SAMPLE,
+            "handler": handler,
+            "wall_ms": round(wall_ms, 2),
+            "cpu_ms": round(cpu * 1000, 2),
+            "profiled": profile is not None,
+            "created": time.time(),
+            **info,
+        }
+        snapshot = None
+        if traced:
+            current, peak = tracemalloc.get_traced_memory()
+            meta["traced_current"], meta["traced_peak"] = current, peak
+            # снимок — сразу по окончании апдейта: в пуле потоков куча была бы уже другой
+            if is_slow:
+                snapshot = tracemalloc.take_snapshot()
+        return {"meta": meta, "profile": profile, "memory": snapshot}
+
+    def write_capture(self, capture: dict) -> Path:
+        # вызывается в пуле потоков: разбор статистики и снимка памяти, запись на диск
+        meta, profile = capture["meta"], capture["profile"]
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(meta["created"]))
+        millis = int(meta["created"] * 1000) % 1000
+        handler = re.sub(r"[^\w.]", "_", meta["handler"])
+        capture_id = f"{meta['kind']}-{stamp}-{millis:03d}-{handler}"
+        report = []
+
+        path = self.directory / f"{capture_id}.zip"
+        tmp = path.with_suffix(".tmp")
+        with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as zf:
+            if profile is not None:
+                buf = io.StringIO()
+                stats = pstats.Stats(profile, stream=buf)
+                stats.sort_stats("cumulative").print_stats(TOP_LINES)
+                report.append(buf.getvalue())
+                # .prof открывается snakeviz / python -m pstats
+                zf.writestr("profile.prof", marshal.dumps(stats.stats))
+            if capture["memory"] is not None:
+                snap = capture["memory"].filter_traces((
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                ))
+                report.append("\n".join(str(s) for s in snap.statistics("lineno")[:TOP_LINES]))
+                dump = tmp.with_suffix(".tracemalloc")
+                snap.dump(str(dump))
+                zf.write(dump, "memory.tracemalloc")
+                dump.unlink()
+            zf.writestr("meta.json", json.dumps(meta, ensure_ascii=False, indent=1))
+            zf.writestr("report.txt", "\n\n".join(report))
+        tmp.replace(path)
+        self._trim(meta["kind"])
+        return path
+
+    def _trim(self, kind: str):
+        # отдельное кольцо для каждого вида, чтобы частые сэмплы не вытесняли медленные апдейты
+        files = sorted(self.directory.glob(f"{kind}-*.zip"))
+        for old in files[:max(0, len(files) - self.keep)]:
+            old.unlink(missing_ok=True)
+
+    def list_captures(self) -> List[Capture]:
+        out = []
+        for path in sorted(self.directory.glob("*.zip"), key=lambda p: p.stat().st_mtime, reverse=True):
+            try:
+                with zipfile.ZipFile(path) as zf:
+                    meta = json.loads(zf.read("meta.json"))
+            except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+                continue
+            out.append(Capture(path.stem, meta["kind"], meta["handler"], meta["wall_ms"], meta["created"],
+                               path.stat().st_size))
+        return out
+
+    def capture_path(self, capture_id: str) -> Optional[Path]:
+        if not _ID_RE.match(capture_id):
+            return None
+        path = self.directory / f"{capture_id}.zip"
+        return path if path.exists() else None
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "enabled": int(self.enabled),
+            "profiled": self.profiled,
+            "slow": self.slow,
+            "captured": self.captured,
+            "busy": self.busy,
+        }
+
+
+profiler = Profiler(cfg.profile_dir, cfg.profile_keep, cfg.profile_sample_rate, cfg.profile_slow_ms,
+                    cfg.profile_tracemalloc)
@@ -0,0 +1,84 @@
+import sys
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from app.services import schedule_store
+from app.services.config import cfg
+
+# (группа, день, тип недели или None, show_week_per_lesson)
+RenderKey = Tuple[str, str, Optional[str], bool]
+
+
+class RenderCache:
+    def __init__(self, max_entries: int = 4096, max_bytes: int = 8 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[RenderKey, str]" = OrderedDict()
+        self._by_group: Dict[str, Set[RenderKey]] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: RenderKey) -> Optional[str]:
+        text = self._data.get(key)
+        if text is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return text
+
+    def put(self, key: RenderKey, text: str):
+        old = self._data.pop(key, None)
+        if old is not None:
+            self._bytes -= sys.getsizeof(old)
+        self._data[key] = text
+        self._bytes += sys.getsizeof(text)
+        self._by_group.setdefault(key[0], set()).add(key)
+        while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+            self._drop(next(iter(self._data)))
+            self.evictions += 1
+
+    def _drop(self, key: RenderKey):
+        text = self._data.pop(key)
+        self._bytes -= sys.getsizeof(text)
+        keys = self._by_group.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_group[key[0]]
+
+    def invalidate_group(self, group: str):
+        for key in list(self._by_group.get(group, ())):
+            self._drop(key)
+
+    def invalidate_groups(self, groups: Iterable[Hashable]):
+        for group in groups:
+            self.invalidate_group(group)
+
+    def clear(self):
+        self._data.clear()
+        self._by_group.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+render_cache = RenderCache(cfg.render_cache_size, cfg.render_cache_bytes)
+
+schedule_store.add_listener(lambda store, changed: render_cache.invalidate_groups(changed))
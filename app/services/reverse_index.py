@@ -0,0 +1,133 @@
+import bisect
+import logging
+import re
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.services import schedule_store
+from app.services.schedule_store import Lesson
+
+logger = logging.getLogger(__name__)
+
+_SPACES_RE = re.compile(r'[\u00A0\u2000-\u200B]')
+_TEACHER_SPLIT_RE = re.compile(r'[;,]|\s{2,}|\t+')
+_WS_RE = re.compile(r'\s+')
+
+
+def split_teachers(raw: str) -> List[str]:
+    clean = _SPACES_RE.sub(' ', raw or "")
+    return [s.strip() for s in _TEACHER_SPLIT_RE.split(clean) if s.strip()]
+
+
+def normalize_name(name: str) -> str:
+    return _WS_RE.sub(" ", (name or "").replace("ё", "е").replace("Ё", "Е")).strip().lower()
+
+
+def normalize_room(room: str) -> str:
+    return _WS_RE.sub("", room or "").lower()
+
+
+@dataclass(frozen=True, slots=True)
+class Booking:
+    # одно занятие в аудитории; у потоковых лекций несколько групп
+    day: str
+    time: str
+    week_type: str
+    subject: str
+    type: str
+    building: str
+    rooms: Tuple[str, ...]
+    teacher: str
+    groups: Tuple[str, ...]
+
+
+def _bookings(groups: Dict[str, Tuple[Lesson, ...]]) -> List[Booking]:
+    merged: Dict[tuple, List[str]] = {}
+    for code, lessons in groups.items():
+        for les in lessons:
+            if not les.subject:
+                continue
+            key = (les.day, les.time, les.week_type, les.subject, les.type, les.building,
+                   tuple(r for r in (les.room1, les.room2) if r), les.teacher)
+            merged.setdefault(key, []).append(code)
+    return [Booking(*key, tuple(sorted(codes))) for key, codes in merged.items()]
+
+
+class ReverseIndex:
+    def __init__(self):
+        # нормализованное ФИО -> (ФИО как в таблице, занятия)
+        self.teachers: Dict[str, Tuple[str, Tuple[Booking, ...]]] = {}
+        self._teacher_keys: Tuple[str, ...] = ()
+        # (здание, аудитория) -> день -> занятия
+        self.rooms: Dict[Tuple[str, str], Dict[str, Tuple[Booking, ...]]] = {}
+        self.generation = -1
+
+    def build(self, groups: Dict[str, Tuple[Lesson, ...]], generation: int = 0):
+        teachers: Dict[str, Tuple[str, List[Booking]]] = {}
+        rooms: Dict[Tuple[str, str], Dict[str, List[Booking]]] = {}
+        for b in _bookings(groups):
+            for name in split_teachers(b.teacher):
+                teachers.setdefault(normalize_name(name), (name, []))[1].append(b)
+            for room in b.rooms:
+                rooms.setdefault((b.building, room), {}).setdefault(b.day, []).append(b)
+
+        self.teachers = {k: (name, tuple(items)) for k, (name, items) in teachers.items()}
+        self._teacher_keys = tuple(sorted(self.teachers))
+        self.rooms = {key: {day: tuple(items) for day, items in days.items()} for key, days in rooms.items()}
+        self.generation = generation
+
+    def find_teachers(self, query: str, limit: int = 10) -> List[str]:
+        # совпадение с началом ФИО или с началом любого слова в нём
+        q = normalize_name(query)
+        if not q:
+            return []
+        if q in self.teachers:
+            return [q]
+        keys = self._teacher_keys
+        out: List[str] = []
+        i = bisect.bisect_left(keys, q)
+        while i < len(keys) and keys[i].startswith(q) and len(out) < limit:
+            out.append(keys[i])
+            i += 1
+        if len(out) < limit:
+            out += [k for k in keys if k not in out and f" {q}" in f" {k}"][:limit - len(out)]
+        return out
+
+    def teacher_lessons(self, key: str) -> Optional[Tuple[str, Tuple[Booking, ...]]]:
+        return self.teachers.get(key)
+
+    def find_rooms(self, room: str, building: str = "") -> List[Tuple[str, str]]:
+        r = normalize_room(room)
+        b = normalize_name(building)
+        return sorted(key for key in self.rooms
+                      if normalize_room(key[1]) == r and (not b or b in normalize_name(key[0])))
+
+    def room_day(self, building: str, room: str, day: str) -> Tuple[Booking, ...]:
+        return self.rooms.get((building, room), {}).get(day, ())
+
+    def building_rooms(self, building: str) -> Dict[str, Set[str]]:
+        b = normalize_name(building)
+        out: Dict[str, Set[str]] = {}
+        for bld, room in self.rooms:
+            if b and b in normalize_name(bld):
+                out.setdefault(bld, set()).add(room)
+        return out
+
+    def stats(self) -> Dict[str, int]:
+        return {"teachers": len(self.teachers), "rooms": len(self.rooms)}
+
+
+reverse_index = ReverseIndex()
+
+
+def _on_store_update(store: schedule_store.ScheduleStore, changed: Iterable[str]):
+    if not changed and reverse_index.generation >= 0:
+        return
+    started = time.perf_counter()
+    reverse_index.build(store.groups, store.generation)
+    logger.info("Индексы преподавателей и аудиторий перестроены за %.3f сек: %d преподавателей, %d аудиторий.",
+                time.perf_counter() - started, len(reverse_index.teachers), len(reverse_index.rooms))
+
+
+schedule_store.add_listener(_on_store_update)
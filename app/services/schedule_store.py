@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import sys
+import time
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.services import metrics
+from app.services.config import cfg
+from app.services.parser import parse_sheet_file
+from app.services.workers import run_cpu
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class Lesson:
+    group: str
+    day: str
+    time: str
+    week_type: str
+    subject: str
+    building: str
+    room1: str
+    room2: str
+    type: str
+    teacher: str
+
+
+LESSON_FIELDS = tuple(f.name for f in fields(Lesson))
+
+
+def _s(value, intern: bool = False) -> str:
+    s = value if isinstance(value, str) else ""
+    return sys.intern(s) if intern else s
+
+
+def _to_lesson(d: dict) -> Lesson:
+    return Lesson(
+        group=_s(d.get("group"), True),
+        day=_s(d.get("day"), True),
+        time=_s(d.get("time"), True),
+        week_type=_s(d.get("week_type"), True),
+        subject=_s(d.get("subject"), True),
+        building=_s(d.get("building"), True),
+        room1=_s(d.get("room1")),
+        room2=_s(d.get("room2")),
+        type=_s(d.get("type"), True),
+        teacher=_s(d.get("teacher"), True),
+    )
+
+
+def lesson_to_row(lesson: Lesson) -> tuple:
+    return tuple(getattr(lesson, f) for f in LESSON_FIELDS)
+
+
+def lesson_from_row(row: Iterable[str]) -> Lesson:
+    return _to_lesson(dict(zip(LESSON_FIELDS, row)))
+
+
+class ScheduleStore:
+    __slots__ = ("groups", "sources", "generation")
+
+    def __init__(self, groups: Dict[str, Tuple[Lesson, ...]],
+                 sources: Optional[Dict[str, Tuple[int, int]]] = None, generation: int = 0):
+        self.groups = groups
+        # код группы -> (gid, колонка), из которых разобраны занятия
+        self.sources = sources or {}
+        self.generation = generation
+
+    def get(self, group: str) -> Optional[Tuple[Lesson, ...]]:
+        return self.groups.get(group)
+
+    def __contains__(self, group: str) -> bool:
+        return group in self.groups
+
+    def __len__(self) -> int:
+        return len(self.groups)
+
+
+_store = ScheduleStore({})
+
+# Вызываются после каждой подмены хранилища: (новое хранилище, изменившиеся группы)
+_listeners: List[Callable[[ScheduleStore, Set[str]], None]] = []
+
+
+def add_listener(fn: Callable[[ScheduleStore, Set[str]], None]):
+    _listeners.append(fn)
+
+
+def current() -> ScheduleStore:
+    return _store
+
+
+def get_lessons(group: str) -> Optional[Tuple[Lesson, ...]]:
+    return _store.get(group)
+
+
+async def _parse_gid(gid: int, path: Path, columns: Dict[str, int],
+                     previous: Optional[ScheduleStore]) -> Dict[str, Tuple[Lesson, ...]]:
+    started = time.perf_counter()
+    try:
+        parsed: Dict[str, List[dict]] = await run_cpu(parse_sheet_file, str(path), columns, cfg.parser_engine)
+    except Exception as e:
+        logger.warning("Не удалось разобрать %s: %s — оставляю прежние данные", path, e)
+        old = previous.groups if previous is not None else {}
+        return {code: old[code] for code in columns if code in old}
+    metrics.parse_seconds.observe(time.perf_counter() - started, str(gid))
+    return {code: tuple(_to_lesson(d) for d in lessons) for code, lessons in parsed.items()}
+
+
+async def build_groups(index: Dict[str, Tuple[int, int]], paths: Dict[int, Path],
+                       previous: Optional[ScheduleStore] = None,
+                       changed_gids: Optional[Set[int]] = None) -> Dict[str, Tuple[Lesson, ...]]:
+    by_gid: Dict[int, Dict[str, int]] = {}
+    for code, (gid, col) in index.items():
+        by_gid.setdefault(gid, {})[code] = col
+
+    groups: Dict[str, Tuple[Lesson, ...]] = {}
+    jobs = []
+    for gid, columns in by_gid.items():
+        if previous is not None and changed_gids is not None and gid not in changed_gids:
+            if all(previous.sources.get(code) == (gid, col) for code, col in columns.items()):
+                groups.update((code, previous.groups[code]) for code in columns)
+                continue
+
+        path = paths.get(gid)
+        if path is not None:
+            jobs.append(_parse_gid(gid, path, columns, previous))
+
+    for parsed in await asyncio.gather(*jobs):
+        groups.update(parsed)
+    return groups
+
+
+def changed_groups(old: Dict[str, Tuple[Lesson, ...]], new: Dict[str, Tuple[Lesson, ...]]) -> Set[str]:
+    return {g for g in old.keys() | new.keys() if old.get(g) is not new.get(g) and old.get(g) != new.get(g)}
+
+
+async def rebuild(index: Dict[str, Tuple[int, int]], paths: Dict[int, Path],
+                  changed_gids: Optional[Iterable[int]] = None) -> ScheduleStore:
+    changed_gids = set(changed_gids) if changed_gids is not None else None
+    groups = await build_groups(index, paths, _store, changed_gids)
+    sources = {code: loc for code, loc in index.items() if code in groups}
+    return install(groups, sources)
+
+
+def install(groups: Dict[str, Tuple[Lesson, ...]], sources: Dict[str, Tuple[int, int]]) -> ScheduleStore:
+    global _store
+    changed = changed_groups(_store.groups, groups)
+    _store = ScheduleStore(groups, sources, _store.generation + 1)
+    logger.info("Хранилище расписаний обновлено: %d групп, изменилось %d (поколение %d).",
+                len(groups), len(changed), _store.generation)
+    for fn in _listeners:
+        try:
+            fn(_store, changed)
+        except Exception:
+            logger.exception("Ошибка в обработчике обновления хранилища")
+    return _store
@@ -0,0 +1,174 @@
+import logging
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from zoneinfo import ZoneInfo
+
+from app.services import schedule_store
+from app.services.config import cfg
+from app.services.schedule_store import Lesson
+
+logger = logging.getLogger(__name__)
+
+DAYS = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье"]
+WEEK_TYPES = ("в", "н")
+LESSON_MINUTES = 90
+
+HOLIDAY = "holiday"
+OUTSIDE = "outside"
+
+DaySlots = Dict[Tuple[int, str], Tuple[Lesson, ...]]
+
+
+def local_now() -> datetime:
+    # время бота (TZ), а не хоста: «сегодня», чётность недели и рассылка везде совпадают
+    return datetime.now(ZoneInfo(cfg.tz))
+
+
+def local_today() -> date:
+    return local_now().date()
+
+
+def norm_week(x: str) -> str:
+    x = (x or "").strip().lower()
+    return "в" if x.startswith("в") else ("н" if x.startswith("н") else x)
+
+
+def time_to_minutes(time_str: str) -> int:
+    hh, _, mm = (time_str or "").strip().partition(":")
+    return int(hh) * 60 + int(mm) if hh.isdigit() and mm.isdigit() else -1
+
+
+def week_dates(d: date) -> List[date]:
+    # понедельник–суббота недели, в которую попадает d
+    monday = d - timedelta(days=d.weekday())
+    return [monday + timedelta(days=i) for i in range(6)]
+
+
+class Semester:
+    def __init__(self, start: date, end: Optional[date] = None, holidays: Iterable[date] = ()):
+        self.start = start
+        self.end = end
+        self.holidays = frozenset(holidays)
+        # чётность меняется по понедельникам, даже если семестр начался в середине недели
+        self._monday = start - timedelta(days=start.weekday())
+
+    def week_type(self, d: date) -> str:
+        return WEEK_TYPES[((d - self._monday).days // 7) % 2]
+
+    def contains(self, d: date) -> bool:
+        return self.start <= d and (self.end is None or d <= self.end)
+
+    def day_off(self, d: date) -> Optional[str]:
+        # почему в этот день занятий нет (праздник, вне семестра) или None для обычного дня
+        if d in self.holidays:
+            return HOLIDAY
+        if not self.contains(d):
+            return OUTSIDE
+        return None
+
+
+def build_slots(lessons: Sequence[Lesson]) -> DaySlots:
+    # (день недели, чётность) -> занятия этого дня по времени; занятия без недели попадают в обе
+    by_day: Dict[int, List[Lesson]] = {}
+    for les in lessons:
+        weekday = DAYS.index(les.day) if les.day in DAYS else -1
+        if weekday >= 0:
+            by_day.setdefault(weekday, []).append(les)
+    slots: DaySlots = {}
+    for weekday, items in by_day.items():
+        items.sort(key=lambda les: time_to_minutes(les.time))
+        for wt in WEEK_TYPES:
+            picked = tuple(les for les in items if not les.week_type or norm_week(les.week_type) == wt)
+            if picked:
+                slots[(weekday, wt)] = picked
+    return slots
+
+
+class GroupCalendar:
+    __slots__ = ("slots", "dates")
+
+    def __init__(self, slots: DaySlots, dates: Dict[date, Tuple[Lesson, ...]]):
+        self.slots = slots
+        # только учебные даты с занятиями; кортежи общие со slots
+        self.dates = dates
+
+
+class CalendarIndex:
+    # Расписание групп, разложенное по конкретным датам окна [сегодня - 4 недели, конец семестра].
+    # Группа раскладывается при первом обращении и живёт, пока не изменилась или не сменились сутки.
+    def __init__(self, semester: Semester, horizon_days: int = 120, max_groups: int = 1024):
+        self.semester = semester
+        self.horizon_days = horizon_days
+        self.max_groups = max_groups
+        self._groups: "OrderedDict[str, GroupCalendar]" = OrderedDict()
+        self._built_on: Optional[date] = None
+        self.window: Tuple[date, date] = (semester.start, semester.start)
+        self.builds = 0
+        self.hits = 0
+
+    def _window(self, today: date) -> Tuple[date, date]:
+        first = max(self.semester.start, today - timedelta(days=28))
+        last = self.semester.end or today + timedelta(days=self.horizon_days)
+        return first, max(first, last)
+
+    def _expand(self, slots: DaySlots) -> Dict[date, Tuple[Lesson, ...]]:
+        first, last = self.window
+        dates: Dict[date, Tuple[Lesson, ...]] = {}
+        d = first
+        while d <= last:
+            if self.semester.day_off(d) is None:
+                lessons = slots.get((d.weekday(), self.semester.week_type(d)))
+                if lessons:
+                    dates[d] = lessons
+            d += timedelta(days=1)
+        return dates
+
+    def get(self, group: str, today: Optional[date] = None) -> Optional[GroupCalendar]:
+        today = today or local_today()
+        if today != self._built_on:
+            # окно сдвинулось — раскладка по датам устарела у всех групп
+            self._groups.clear()
+            self._built_on = today
+            self.window = self._window(today)
+        cal = self._groups.get(group)
+        if cal is not None:
+            self._groups.move_to_end(group)
+            self.hits += 1
+            return cal
+        lessons = schedule_store.get_lessons(group)
+        if lessons is None:
+            return None
+        slots = build_slots(lessons)
+        cal = self._groups[group] = GroupCalendar(slots, self._expand(slots))
+        self.builds += 1
+        while len(self._groups) > self.max_groups:
+            self._groups.popitem(last=False)
+        return cal
+
+    def on(self, group: str, d: date) -> Tuple[Lesson, ...]:
+        cal = self.get(group)
+        if cal is None:
+            return ()
+        first, last = self.window
+        if first <= d <= last:
+            return cal.dates.get(d, ())
+        if self.semester.day_off(d) is not None:
+            return ()
+        return cal.slots.get((d.weekday(), self.semester.week_type(d)), ())
+
+    def occurrences(self, group: str) -> List[Tuple[date, Tuple[Lesson, ...]]]:
+        cal = self.get(group)
+        return sorted(cal.dates.items()) if cal is not None else []
+
+    def on_update(self, store: schedule_store.ScheduleStore, changed: Set[str]):
+        for group in changed:
+            self._groups.pop(group, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"groups": len(self._groups), "builds": self.builds, "hits": self.hits}
+
+
+semester = Semester(cfg.semester_start, cfg.semester_end, cfg.holidays)
+calendar_index = CalendarIndex(semester, cfg.calendar_horizon_days, cfg.calendar_cache_size)
+schedule_store.add_listener(calendar_index.on_update)
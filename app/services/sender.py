@@ -0,0 +1,246 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from aiogram import Bot, types
+from aiogram.exceptions import TelegramRetryAfter
+
+from app.services.config import cfg
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+BULK = 10
+
+MESSAGE_LIMIT = 4096
+
+
+class _Bucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated", "paused_until")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def delay(self, now: float) -> float:
+        if now < self.paused_until:
+            return self.paused_until - now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class _PriorityGate:
+    # Глобальный лимит: токены выдаются ожидающим строго по (приоритет, очередь)
+    def __init__(self, bucket: _Bucket):
+        self.bucket = bucket
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def waiting(self) -> int:
+        return len(self._heap)
+
+    async def acquire(self, priority: int):
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (priority, next(self._seq), fut))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        await fut
+
+    async def _run(self):
+        heap = self._heap
+        while heap:
+            fut = heap[0][2]
+            if fut.done():
+                heapq.heappop(heap)
+                continue
+            delay = self.bucket.delay(time.monotonic())
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            heapq.heappop(heap)
+            self.bucket.take()
+            fut.set_result(None)
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+        for _, _, fut in self._heap:
+            fut.cancel()
+        self._heap.clear()
+
+
+class _Job:
+    __slots__ = ("call", "priority", "future", "attempts")
+
+    def __init__(self, call: Callable[[], Awaitable[Any]], priority: int, future: asyncio.Future):
+        self.call = call
+        self.priority = priority
+        self.future = future
+        self.attempts = 0
+
+
+class _Chat:
+    __slots__ = ("bucket", "jobs", "task")
+
+    def __init__(self, bucket: _Bucket):
+        self.bucket = bucket
+        # куча (приоритет, очередь, задание): ответ пользователю обгоняет рассылку и в пределах чата
+        self.jobs: List[tuple] = []
+        self.task: Optional[asyncio.Task] = None
+
+    def remove(self, entry: tuple):
+        # пока задание отправлялось, вперёд могли встать более срочные
+        if self.jobs[0] is entry:
+            heapq.heappop(self.jobs)
+        else:
+            self.jobs.remove(entry)
+            heapq.heapify(self.jobs)
+
+
+class MessageSender:
+    def __init__(self, global_rate: float = 30, chat_rate: float = 1, chat_burst: float = 3, max_retries: int = 3):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._gate = _PriorityGate(_Bucket(global_rate, global_rate))
+        self._chats: Dict[int, _Chat] = {}
+        self._seq = itertools.count()
+        self._sweep_at = 1024
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    async def call(self, chat_id: int, call: Callable[[], Awaitable[Any]], priority: int = INTERACTIVE) -> Any:
+        fut = asyncio.get_running_loop().create_future()
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            if len(self._chats) >= self._sweep_at:
+                self._sweep()
+            chat = self._chats[chat_id] = _Chat(_Bucket(self.chat_rate, self.chat_burst))
+        heapq.heappush(chat.jobs, (priority, next(self._seq), _Job(call, priority, fut)))
+        if chat.task is None or chat.task.done():
+            chat.task = asyncio.create_task(self._drain(chat_id, chat))
+        return await fut
+
+    async def _drain(self, chat_id: int, chat: _Chat):
+        while chat.jobs:
+            entry = chat.jobs[0]
+            job = entry[2]
+            if job.future.done():
+                heapq.heappop(chat.jobs)
+                continue
+
+            delay = chat.bucket.delay(time.monotonic())
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            await self._gate.acquire(job.priority)
+            chat.bucket.take()
+
+            try:
+                result = await job.call()
+            except TelegramRetryAfter as e:
+                job.attempts += 1
+                self.retried += 1
+                logger.warning("429 для чата %s: повтор через %s сек.", chat_id, e.retry_after)
+                chat.bucket.pause(e.retry_after)
+                if job.attempts > self.max_retries:
+                    chat.remove(entry)
+                    self.failed += 1
+                    if not job.future.done():
+                        job.future.set_exception(e)
+                continue
+            except Exception as e:
+                chat.remove(entry)
+                self.failed += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+                continue
+
+            chat.remove(entry)
+            self.sent += 1
+            if not job.future.done():
+                job.future.set_result(result)
+
+    def _sweep(self):
+        # чат без очереди, чья корзина уже восстановилась, ничем не отличается от нового
+        now = time.monotonic()
+        idle = self.chat_burst / self.chat_rate
+        for chat_id in [cid for cid, c in self._chats.items()
+                        if not c.jobs and now - c.bucket.updated >= idle and now >= c.bucket.paused_until]:
+            del self._chats[chat_id]
+        self._sweep_at = max(1024, 2 * len(self._chats))
+
+    async def send_message(self, bot: Bot, chat_id: int, text: str, priority: int = INTERACTIVE,
+                           **kwargs) -> types.Message:
+        return await self.call(chat_id, lambda: bot.send_message(chat_id, text, **kwargs), priority)
+
+    async def answer(self, message: types.Message, text: str, priority: int = INTERACTIVE,
+                     **kwargs) -> types.Message:
+        return await self.send_message(message.bot, message.chat.id, text, priority, **kwargs)
+
+    async def answer_many(self, message: types.Message, texts: Sequence[str], priority: int = INTERACTIVE,
+                          merge: Optional[bool] = None, reply_markup: Any = None,
+                          **kwargs) -> List[types.Message]:
+        merge = cfg.merge_week_messages if merge is None else merge
+        chunks = merge_blocks(texts) if merge else list(texts)
+        jobs = [
+            self.answer(message, text, priority, **kwargs, **({"reply_markup": reply_markup} if i == 0 else {}))
+            for i, text in enumerate(chunks)
+        ]
+        return list(await asyncio.gather(*jobs))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "chats": len(self._chats),
+            "queued": sum(len(c.jobs) for c in self._chats.values()),
+            "waiting_global": self._gate.waiting,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+    async def close(self):
+        self._gate.close()
+        tasks = [c.task for c in self._chats.values() if c.task is not None]
+        for chat in self._chats.values():
+            for _, _, job in chat.jobs:
+                job.future.cancel()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._chats.clear()
+
+
+def merge_blocks(texts: Sequence[str], limit: int = MESSAGE_LIMIT, sep: str = "\n\n") -> List[str]:
+    out: List[str] = []
+    current = ""
+    for text in texts:
+        if not current:
+            current = text
+        elif len(current) + len(sep) + len(text) <= limit:
+            current = current + sep + text
+        else:
+            out.append(current)
+            current = text
+    if current:
+        out.append(current)
+    return out
+
+
+sender = MessageSender(cfg.send_global_rate, cfg.send_chat_rate, cfg.send_chat_burst)
@@ -0,0 +1,144 @@
+import csv
+import json
+import re
+import struct
+import zlib
+from io import StringIO
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Лист расписания на диске: общие колонки (день, время, неделя) и по срезу на каждую группу
+# (8 её колонок), каждый срез сжат отдельно. В начале — индекс: где лежит срез какой группы.
+# Остальные колонки листа не сохраняются; исходный CSV при необходимости хранится рядом (KEEP_RAW_CSV).
+MAGIC = b"KFUSLC\x00\x00"
+VERSION = 1
+_PREFIX = struct.Struct("<8sHI")  # magic, версия, длина JSON-индекса
+COMMON_WIDTH = 3
+GROUP_WIDTH = 8
+LEVEL = 6
+
+GROUP_RE = re.compile(r"(?<!\d)\d{7}(?!\d)")
+
+Rows = List[List[str]]
+
+
+def _pack(rows: Rows) -> bytes:
+    return zlib.compress(json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), LEVEL)
+
+
+def _unpack(blob: bytes) -> Rows:
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+def _project(rows: Rows, start: int, width: int) -> Rows:
+    return [row[start:start + width] + [""] * (width - len(row[start:start + width])) for row in rows]
+
+
+def encode(csv_text: str, sha256: str = "") -> bytes:
+    # пустые строки пропускают оба движка парсера, поэтому их не храним
+    rows = [row for row in csv.reader(StringIO(csv_text, newline="")) if row]
+    width = max((len(r) for r in rows[:2]), default=0)
+
+    groups: Dict[str, int] = {}
+    for col, cell in enumerate(rows[0] if rows else []):
+        for code in GROUP_RE.findall(cell):
+            groups.setdefault(code, col)
+
+    blobs = [_pack(_project(rows, 0, COMMON_WIDTH))]
+    blocks: Dict[str, List[int]] = {}
+    offset = len(blobs[0])
+    for col in sorted(set(groups.values())):
+        blob = _pack(_project(rows, col, min(GROUP_WIDTH, max(0, width - col))))
+        blocks[str(col)] = [offset, len(blob)]
+        blobs.append(blob)
+        offset += len(blob)
+
+    index = json.dumps({
+        "rows": len(rows),
+        "width": width,
+        "sha256": sha256,
+        "common": [0, len(blobs[0])],
+        "blocks": blocks,
+        "groups": groups,
+    }, ensure_ascii=False).encode("utf-8")
+    return b"".join([_PREFIX.pack(MAGIC, VERSION, len(index)), index, *blobs])
+
+
+def write(path: Path, csv_text: str, sha256: str = "") -> int:
+    data = encode(csv_text, sha256)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_bytes(data)
+    tmp.replace(path)
+    return len(data)
+
+
+def convert(src: Path, dst: Path, sha256: str = "") -> int:
+    return write(dst, src.read_text(encoding="utf-8", errors="ignore"), sha256)
+
+
+class SheetReader:
+    # Открывает файл и читает только индекс; срезы — по запросу, seek + read своих байт
+    def __init__(self, path: Path):
+        self.path = path
+        self._f = open(path, "rb")
+        try:
+            magic, version, index_len = _PREFIX.unpack(self._f.read(_PREFIX.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path.name}: неподдерживаемый формат среза {magic!r} v{version}")
+            self.index = json.loads(self._f.read(index_len).decode("utf-8"))
+        except Exception:
+            self._f.close()
+            raise
+        self._base = _PREFIX.size + index_len
+
+    def __enter__(self) -> "SheetReader":
+        return self
+
+    def __exit__(self, *exc):
+        self._f.close()
+
+    @property
+    def groups(self) -> Dict[str, int]:
+        return self.index["groups"]
+
+    def _read(self, offset: int, length: int) -> Rows:
+        self._f.seek(self._base + offset)
+        return _unpack(self._f.read(length))
+
+    def common(self) -> Rows:
+        return self._read(*self.index["common"])
+
+    def block(self, col: int) -> Optional[Rows]:
+        loc = self.index["blocks"].get(str(col))
+        return self._read(*loc) if loc is not None else None
+
+
+def _to_csv(rows: Rows) -> str:
+    out = StringIO()
+    csv.writer(out, lineterminator="\n").writerows(rows)
+    return out.getvalue()
+
+
+def read_projected(path: Path, columns: Optional[Dict[str, int]] = None) -> Tuple[str, Dict[str, int]]:
+    # CSV только из нужных колонок: общие + срезы запрошенных групп подряд.
+    # Возвращает текст и новые номера колонок групп в нём — парсеры работают с ним как с обычным листом.
+    with SheetReader(path) as reader:
+        columns = dict(reader.groups) if columns is None else columns
+        rows = reader.common()
+        remapped: Dict[str, int] = {}
+        placed: Dict[int, int] = {}
+        # по возрастанию исходной колонки: обрезанный край листа остаётся последним, как в оригинале
+        for code, col in sorted(columns.items(), key=lambda item: item[1]):
+            if col not in placed:
+                block = reader.block(col)
+                if block is None:
+                    continue
+                placed[col] = len(rows[0]) if rows else COMMON_WIDTH
+                rows = [a + b for a, b in zip(rows, block)]
+            remapped[code] = placed[col]
+    return _to_csv(rows), remapped
+
+
+def read_group_csv(path: Path, col: int) -> Optional[str]:
+    text, remapped = read_projected(path, {"": col})
+    return text if remapped else None
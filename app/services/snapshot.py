@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import struct
+import sys
+import time
+from array import array
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.services import csv_cache, schedule_store
+from app.services.schedule_store import LESSON_FIELDS, Lesson, ScheduleStore, lesson_to_row
+from app.services.workers import run_io
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = "snapshot.bin"
+SNAPSHOT_ID_FILE = "snapshot.id"
+
+# Формат: заголовок, таблица строк, группы (код, gid, колонка, число занятий),
+# занятия как индексы в таблице строк, хэши CSV, из которых собран снимок.
+# При любом изменении раскладки повышаем VERSION — старый файл просто не будет прочитан.
+MAGIC = b"KFUSNAP\x00"
+VERSION = 2
+_HEADER = struct.Struct("<8sHQIIII")  # magic, version, id, строк, байт строк, групп, хэшей
+_WIDTH = len(LESSON_FIELDS)
+
+Loaded = Tuple[int, Dict[str, Tuple[Lesson, ...]], Dict[str, Tuple[int, int]], Dict[str, str]]
+
+_revalidate_task: Optional[asyncio.Task] = None
+
+
+def _paths(shared_dir: str) -> Tuple[Path, Path]:
+    d = Path(shared_dir)
+    d.mkdir(parents=True, exist_ok=True)
+    return d / SNAPSHOT_FILE, d / SNAPSHOT_ID_FILE
+
+
+def _native(arr: array) -> array:
+    # на диске всё little-endian
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr
+
+
+def encode(snapshot_id: int, store: ScheduleStore, hashes: Dict[str, str]) -> bytes:
+    strings: Dict[str, int] = {}
+
+    def idx(s: str) -> int:
+        i = strings.get(s)
+        if i is None:
+            i = strings[s] = len(strings)
+        return i
+
+    groups = array("q")
+    lessons = array("I")
+    for code, items in store.groups.items():
+        gid, col = store.sources.get(code, (-1, -1))
+        groups.extend((idx(code), gid, col, len(items)))
+        for les in items:
+            lessons.extend(idx(v) for v in lesson_to_row(les))
+    pairs = array("I")
+    for gid, sha in hashes.items():
+        pairs.extend((idx(gid), idx(sha)))
+
+    blob = "\x00".join(strings).encode("utf-8")
+    header = _HEADER.pack(MAGIC, VERSION, snapshot_id, len(strings), len(blob), len(store.groups), len(hashes))
+    return b"".join((header, blob, _native(groups).tobytes(), _native(lessons).tobytes(), _native(pairs).tobytes()))
+
+
+def decode(data: bytes) -> Loaded:
+    magic, version, snapshot_id, n_strings, blob_len, n_groups, n_hashes = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"неподдерживаемый снимок: {magic!r} v{version}")
+    pos = _HEADER.size
+    strings: List[str] = data[pos:pos + blob_len].decode("utf-8").split("\x00") if n_strings else []
+    if len(strings) != n_strings:
+        raise ValueError("повреждённая таблица строк")
+    pos += blob_len
+
+    groups_arr = array("q")
+    groups_arr.frombytes(data[pos:pos + n_groups * 4 * groups_arr.itemsize])
+    pos += n_groups * 4 * groups_arr.itemsize
+    _native(groups_arr)
+
+    n_lessons = sum(groups_arr[i + 3] for i in range(0, len(groups_arr), 4))
+    lessons_arr = array("I")
+    lessons_arr.frombytes(data[pos:pos + n_lessons * _WIDTH * lessons_arr.itemsize])
+    pos += n_lessons * _WIDTH * lessons_arr.itemsize
+    _native(lessons_arr)
+
+    pairs = array("I")
+    pairs.frombytes(data[pos:pos + n_hashes * 2 * pairs.itemsize])
+    _native(pairs)
+
+    # одинаковые строки — один и тот же объект из таблицы, как после sys.intern
+    values = [strings[i] for i in lessons_arr]
+    groups: Dict[str, Tuple[Lesson, ...]] = {}
+    sources: Dict[str, Tuple[int, int]] = {}
+    offset = 0
+    for i in range(0, len(groups_arr), 4):
+        code_idx, gid, col, count = groups_arr[i:i + 4]
+        code = strings[code_idx]
+        end = offset + count * _WIDTH
+        groups[code] = tuple(Lesson(*values[k:k + _WIDTH]) for k in range(offset, end, _WIDTH))
+        offset = end
+        if gid >= 0:
+            sources[code] = (gid, col)
+    hashes = {strings[pairs[i]]: strings[pairs[i + 1]] for i in range(0, len(pairs), 2)}
+    return snapshot_id, groups, sources, hashes
+
+
+def save(shared_dir: str, store: ScheduleStore, hashes: Optional[Dict[str, str]] = None) -> int:
+    path, id_path = _paths(shared_dir)
+    snapshot_id = time.time_ns()
+    tmp = path.with_suffix(".tmp")
+    tmp.write_bytes(encode(snapshot_id, store, hashes or {}))
+    tmp.replace(path)
+    # id пишем последним: читатель, увидевший новый id, гарантированно найдёт и новый снимок
+    id_tmp = id_path.with_suffix(".tmp")
+    id_tmp.write_text(str(snapshot_id), encoding="utf-8")
+    id_tmp.replace(id_path)
+    return snapshot_id
+
+
+def save_current(shared_dir: str) -> int:
+    return save(shared_dir, schedule_store.current(), csv_cache.source_hashes())
+
+
+def read_id(shared_dir: str) -> Optional[int]:
+    _, id_path = _paths(shared_dir)
+    try:
+        return int(id_path.read_text(encoding="utf-8").strip())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def load(shared_dir: str) -> Optional[Loaded]:
+    path, _ = _paths(shared_dir)
+    try:
+        return decode(path.read_bytes())
+    except FileNotFoundError:
+        return None
+    except (ValueError, struct.error, IndexError) as e:
+        logger.warning("Снимок %s не прочитан: %s", path, e)
+        return None
+
+
+def install(loaded: Loaded) -> ScheduleStore:
+    snapshot_id, groups, sources, _ = loaded
+    store = schedule_store.install(groups, sources)
+    logger.info("Загружен снимок расписания %s: %d групп.", snapshot_id, len(groups))
+    return store
+
+
+async def warm_start(shared_dir: str, on_revalidated: Callable[[], Awaitable[None]]) -> bool:
+    # Сразу отдаём данные из снимка, а скачивание и разбор изменившихся листов идут в фоне
+    global _revalidate_task
+    started = time.perf_counter()
+    loaded = await run_io(load, shared_dir)
+    if loaded is None or not loaded[1]:
+        return False
+    install(loaded)
+    csv_cache.set_group_index(loaded[2])
+    logger.info("Снимок прочитан за %.3f сек, обновление данных продолжится в фоне.", time.perf_counter() - started)
+
+    async def _revalidate():
+        try:
+            t0 = time.perf_counter()
+            generation = schedule_store.current().generation
+            await csv_cache.revalidate(loaded[3])
+            if schedule_store.current().generation != generation:
+                await on_revalidated()
+            logger.info("Фоновая проверка данных завершена за %.1f сек.", time.perf_counter() - t0)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Фоновое обновление после запуска из снимка не удалось — работаю на данных снимка")
+
+    _revalidate_task = asyncio.create_task(_revalidate())
+    return True
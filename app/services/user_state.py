@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from app.services.config import cfg
+from app.services.workers import run_io
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+@dataclass(frozen=True, slots=True)
+class UserState:
+    group: str
+    last_view: Optional[str] = None
+
+
+class UserStateStore:
+    def __init__(self, path: str, hot_size: int = 10_000, flush_interval: float = 2.0,
+                 ttl: Optional[float] = None):
+        self.path = path
+        self.hot_size = hot_size
+        self.flush_interval = flush_interval
+        # ttl задан, когда база общая для нескольких процессов: запись могла измениться в соседнем,
+        # поэтому кэш живёт недолго, а «пользователя нет» не кэшируется вовсе
+        self.ttl = ttl
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        # user_id -> (UserState или _MISSING — пользователь точно не найден в базе, время записи)
+        self._hot: "OrderedDict[int, Tuple[object, float]]" = OrderedDict()
+        self._dirty: Dict[int, UserState] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.flushed = 0
+
+    def _open(self):
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            " user_id INTEGER PRIMARY KEY,"
+            " grp TEXT NOT NULL,"
+            " last_view TEXT,"
+            " updated REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS users_grp ON users (grp)")
+        conn.commit()
+        self._conn = conn
+
+    async def open(self):
+        if self._conn is None:
+            await run_io(self._open)
+            logger.info("Хранилище пользователей открыто: %s", self.path)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._conn is not None:
+            await run_io(self._conn.close)
+            self._conn = None
+
+    def _remember(self, user_id: int, value: object):
+        if value is _MISSING and self.ttl is not None:
+            return
+        self._hot[user_id] = (value, time.monotonic())
+        self._hot.move_to_end(user_id)
+        while len(self._hot) > self.hot_size:
+            self._hot.popitem(last=False)
+
+    def _select(self, user_id: int) -> Optional[UserState]:
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT grp, last_view FROM users WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return UserState(row[0], row[1]) if row else None
+
+    async def get(self, user_id: int) -> Optional[UserState]:
+        state = self._dirty.get(user_id)
+        if state is not None:
+            self.hits += 1
+            return state
+
+        cached = self._hot.get(user_id)
+        if cached is not None and self.ttl is not None and time.monotonic() - cached[1] > self.ttl:
+            del self._hot[user_id]
+            cached = None
+        if cached is not None:
+            self._hot.move_to_end(user_id)
+            self.hits += 1
+            return None if cached[0] is _MISSING else cached[0]
+
+        self.misses += 1
+        state = await run_io(self._select, user_id) if self._conn is not None else None
+        if user_id in self._dirty:
+            # пока читали базу, пришла более свежая запись
+            return self._dirty[user_id]
+        self._remember(user_id, state if state is not None else _MISSING)
+        return state
+
+    def set_group(self, user_id: int, group: str):
+        self._put(user_id, UserState(group))
+
+    async def set_last_view(self, user_id: int, view: str):
+        state = await self.get(user_id)
+        if state is not None and state.last_view != view:
+            self._put(user_id, replace(state, last_view=view))
+
+    def _put(self, user_id: int, state: UserState):
+        self._dirty[user_id] = state
+        self._remember(user_id, state)
+
+    def _write(self, batch: Dict[int, UserState]):
+        now = time.time()
+        with self._db_lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO users (user_id, grp, last_view, updated) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(user_id) DO UPDATE SET"
+                " grp = excluded.grp, last_view = excluded.last_view, updated = excluded.updated",
+                [(uid, s.group, s.last_view, now) for uid, s in batch.items()],
+            )
+
+    async def flush(self):
+        if not self._dirty or self._conn is None:
+            return
+        batch, self._dirty = self._dirty, {}
+        try:
+            await run_io(self._write, batch)
+        except Exception as e:
+            logger.error("Не удалось сохранить %d пользователей: %s", len(batch), e)
+            # не теряем изменения: более свежие записи имеют приоритет
+            self._dirty = {**batch, **self._dirty}
+            return
+        self.flushed += len(batch)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hot": len(self._hot),
+            "dirty": len(self._dirty),
+            "hits": self.hits,
+            "misses": self.misses,
+            "flushed": self.flushed,
+        }
+
+
+user_states = UserStateStore(cfg.user_db, cfg.user_cache_size, cfg.user_flush_sec,
+                             cfg.user_cache_ttl if cfg.multi_worker else None)
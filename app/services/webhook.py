@@ -0,0 +1,49 @@
+import asyncio
+import logging
+from typing import Any, Dict, Set
+
+from aiohttp import web
+from aiogram import Bot
+from aiogram.methods import TelegramMethod
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    # апдейты обрабатываются в фоне, но очередь принятых ограничена: сверх неё отвечаем 503,
+    # и Telegram повторит доставку позже, а не мы будем копить задачи в памяти.
+    # Приём и фоновые задачи свои, поверх публичных feed_raw_update / verify_secret
+    def __init__(self, *args: Any, max_pending: int, **kwargs: Any):
+        super().__init__(*args, handle_in_background=False, **kwargs)
+        self.max_pending = max_pending
+        self.rejected = 0
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        bot = await self.resolve_bot(request)
+        if not self.verify_secret(request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), bot):
+            return web.Response(body="Unauthorized", status=401)
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            if self.rejected == 1 or self.rejected % 1000 == 0:
+                logger.warning("Webhook перегружен: %d апдейтов в очереди, отклонено %d.",
+                               self.pending, self.rejected)
+            return web.Response(status=503, headers={"Retry-After": "1"})
+
+        update = await request.json(loads=bot.session.json_loads)
+        task = asyncio.create_task(self._feed(bot, update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    __call__ = handle
+
+    async def _feed(self, bot: Bot, update: Dict[str, Any]):
+        result = await self.dispatcher.feed_raw_update(bot, update, **self.data)
+        if isinstance(result, TelegramMethod):
+            await self.dispatcher.silent_call_request(bot, result)
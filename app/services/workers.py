@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import BrokenExecutor, Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+from app.services.config import cfg
+
+logger = logging.getLogger(__name__)
+
+
+def _timed_call(fn: Callable, submitted: float, *args, **kwargs):
+    # time.monotonic на Linux общий для всех процессов, поэтому ожидание можно считать и в дочернем
+    started = time.monotonic()
+    return started - submitted, fn(*args, **kwargs)
+
+
+class WorkerPool:
+    def __init__(self, name: str, factory: Callable[[], Executor], max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._factory = factory
+        self._executor: Optional[Executor] = None
+        self.in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.run_total = 0.0
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = self._factory()
+        return self._executor
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self.in_flight - self.max_workers)
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        submitted = time.monotonic()
+        self.in_flight += 1
+        self.submitted += 1
+        try:
+            wait, result = await loop.run_in_executor(
+                self.executor, partial(_timed_call, fn, submitted, *args, **kwargs)
+            )
+        except BrokenExecutor:
+            self.failed += 1
+            logger.error("Пул %s сломан — будет пересоздан при следующем вызове.", self.name)
+            self.shutdown(wait=False)
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+        self.completed += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.run_total += time.monotonic() - submitted - wait
+        return result
+
+    def stats(self) -> Dict[str, float]:
+        done = self.completed or 1
+        return {
+            "workers": self.max_workers,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "wait_avg": self.wait_total / done,
+            "wait_max": self.wait_max,
+            "run_avg": self.run_total / done,
+        }
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+
+def _io_factory() -> Executor:
+    return ThreadPoolExecutor(max_workers=cfg.io_workers, thread_name_prefix="io")
+
+
+def _cpu_factory() -> Executor:
+    if cfg.parse_workers <= 0:
+        return ThreadPoolExecutor(max_workers=1, thread_name_prefix="parse")
+    # spawn: форк процесса с запущенным event loop и потоками небезопасен
+    return ProcessPoolExecutor(max_workers=cfg.parse_workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+io_pool = WorkerPool("io", _io_factory, cfg.io_workers)
+cpu_pool = WorkerPool("parse", _cpu_factory, max(cfg.parse_workers, 1))
+
+
+async def run_io(fn: Callable, *args, **kwargs) -> Any:
+    return await io_pool.run(fn, *args, **kwargs)
+
+
+async def run_cpu(fn: Callable, *args, **kwargs) -> Any:
+    return await cpu_pool.run(fn, *args, **kwargs)
+
+
+def stats() -> Dict[str, Dict[str, float]]:
+    return {io_pool.name: io_pool.stats(), cpu_pool.name: cpu_pool.stats()}
+
+
+def shutdown():
+    io_pool.shutdown()
+    cpu_pool.shutdown()
+    logger.info("Пулы воркеров остановлены.")
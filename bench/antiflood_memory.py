@@ -0,0 +1,45 @@
+import argparse
+import sys
+import time
+import tracemalloc
+
+from app.middlewares.antiflood import TokenBucketLimiter
+
+
+def run(users: int, per_sec: int, rate: float, burst: float):
+    limiter = TokenBucketLimiter(rate, burst)
+    tracemalloc.start()
+    step = 1.0 / per_sec
+    now = 0.0
+    checkpoints = {users * k // 10 for k in range(1, 11)}
+    t0 = time.perf_counter()
+    print(f"{'users':>9} {'tracked':>8} {'evicted':>9} {'memory, KiB':>12}")
+    for i in range(1, users + 1):
+        now += step
+        limiter.allow(i, now)
+        if i % 3 == 0:
+            # часть пользователей жмёт кнопку дважды подряд
+            limiter.allow(i, now)
+        if i in checkpoints:
+            current, _ = tracemalloc.get_traced_memory()
+            print(f"{i:>9} {len(limiter):>8} {limiter.evicted:>9} {current / 1024:>12.1f}")
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"allow(): {elapsed / users * 1e6:.2f} мкс/вызов, пик памяти {peak / 1024:.1f} KiB")
+    print(limiter.stats())
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Память TokenBucketLimiter на потоке уникальных пользователей")
+    ap.add_argument("--users", type=int, default=1_000_000)
+    ap.add_argument("--per-sec", type=int, default=1000, help="новых пользователей в секунду (синтетическое время)")
+    ap.add_argument("--rate", type=float, default=0.8)
+    ap.add_argument("--burst", type=float, default=3)
+    args = ap.parse_args(argv)
+    run(args.users, args.per_sec, args.rate, args.burst)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+import argparse
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from aiohttp import web
+
+from bench.generator import group_codes, make_sheet
+
+# Локальная замена экспорта Google Sheets: чётные листы отдают ETag и отвечают 304,
+# нечётные условных запросов не понимают и всегда присылают всё тело — тогда лист отсекается по хэшу
+ETAG, PLAIN = "etag", "plain"
+
+
+class StubSheets:
+    def __init__(self, sheets: int, groups: int, seed: int):
+        self.codes = group_codes(groups, seed)
+        self.per_sheet = -(-groups // sheets)
+        self.bodies: Dict[int, bytes] = {}
+        self.modes = {gid: ETAG if gid % 2 == 0 else PLAIN for gid in range(sheets)}
+        self.requests = 0
+        self.not_modified = 0
+        for gid in range(sheets):
+            self.edit(gid, seed)
+
+    def edit(self, gid: int, seed: int):
+        chunk = self.codes[gid * self.per_sheet:(gid + 1) * self.per_sheet]
+        self.bodies[gid] = make_sheet(chunk, seed + gid).encode("utf-8")
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        gid = int(request.match_info["gid"])
+        body = self.bodies.get(gid)
+        if body is None:
+            raise web.HTTPNotFound()
+        if self.modes[gid] == PLAIN:
+            return web.Response(body=body, content_type="text/csv")
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if request.headers.get("If-None-Match") == etag:
+            self.not_modified += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(body=body, content_type="text/csv", headers={"ETag": etag})
+
+
+def _mtimes(paths: List[Path]) -> Dict[str, int]:
+    return {p.name: p.stat().st_mtime_ns for p in paths}
+
+
+async def run(args, stub: StubSheets) -> int:
+    from app.services import csv_cache, schedule_store
+
+    app = web.Application()
+    app.router.add_get("/{id}/{gid}.csv", stub.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", args.port)
+    await site.start()
+
+    failures = 0
+
+    def check(ok: bool, what: str):
+        nonlocal failures
+        failures += not ok
+        print(f"  [{'ok' if ok else '!!'}] {what}")
+
+    async def round_(title: str):
+        t0 = time.perf_counter()
+        requests, not_modified = stub.requests, stub.not_modified
+        results = {d.gid: d for d in await csv_cache.download_all()}
+        print(f"{title}: {(time.perf_counter() - t0) * 1000:.0f} мс, запросов {stub.requests - requests}, "
+              f"304: {stub.not_modified - not_modified}")
+        return results, stub.not_modified - not_modified
+
+    try:
+        sheets = sorted(stub.bodies)
+        results, _ = await round_("первая загрузка")
+        check(all(results[g].changed for g in sheets), "все листы сохранены")
+        check(len(schedule_store.current().groups) == len(stub.codes), "все группы в хранилище")
+        files = csv_cache.list_cached_files()
+        before, generation = _mtimes(files), schedule_store.current().generation
+
+        results, not_modified = await round_("повтор без изменений")
+        check(not any(d.changed for d in results.values()), "ни один лист не помечен изменённым")
+        check(not_modified == sum(1 for g in sheets if stub.modes[g] == ETAG), "листы с ETag получили 304")
+        check(_mtimes(files) == before, "файлы кэша не переписаны (PLAIN отсечены по хэшу)")
+        check(schedule_store.current().generation == generation, "хранилище не пересобрано")
+
+        edited = [g for g in sheets if stub.modes[g] == ETAG][:1] + [g for g in sheets if stub.modes[g] == PLAIN][:1]
+        for gid in edited:
+            stub.edit(gid, args.seed + 1000)
+        results, _ = await round_("правка листов " + ", ".join(map(str, edited)))
+        check(sorted(g for g, d in results.items() if d.changed) == edited, "изменёнными считаются только правленые")
+        after = _mtimes(files)
+        check(sorted(n for n in after if after[n] != before[n]) == sorted(f"gid_{g}.slc" for g in edited),
+              "переписаны только их срезы")
+        check(schedule_store.current().generation > generation, "хранилище обновлено")
+    finally:
+        await csv_cache.close_session()
+        await site.stop()
+        await runner.cleanup()
+
+    print("Все проверки пройдены." if not failures else f"Провалено проверок: {failures}")
+    return 1 if failures else 0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Условная загрузка листов (ETag/304 и отсев по хэшу) на локальной заглушке")
+    ap.add_argument("--groups", type=int, default=300)
+    ap.add_argument("--sheets", type=int, default=6)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--port", type=int, default=8089)
+    args = ap.parse_args(argv)
+
+    workdir = Path(tempfile.mkdtemp(prefix="tgbot-download-"))
+    # config читает окружение при импорте, поэтому приложение импортируем только после этого
+    os.environ["CACHE_DIR"] = str(workdir / "csv")
+    os.environ["USER_DB"] = str(workdir / "users.sqlite3")
+    os.environ["SPREADSHEET_ID"] = "stub"
+    os.environ["SHEETS_BASE_URL"] = f"http://127.0.0.1:{args.port}/{{id}}/{{gid}}.csv"
+    os.environ["GIDS"] = ",".join(str(g) for g in range(args.sheets))
+    os.environ.setdefault("PARSE_WORKERS", "0")
+
+    stub = StubSheets(args.sheets, args.groups, args.seed)
+    return asyncio.run(run(args, stub))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+import asyncio
+import random
+from datetime import datetime
+from typing import List, Optional
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage, TelegramMethod
+from aiogram.types import Chat, Message, User
+
+BOT_TOKEN = "123456:bench"
+
+
+class FakeSession(BaseSession):
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, p429: float = 0.0,
+                 retry_after: int = 1, seed: Optional[int] = None):
+        super().__init__()
+        self.latency = latency
+        self.jitter = jitter
+        self.p429 = p429
+        self.retry_after = retry_after
+        self.rnd = random.Random(seed)
+        self.requests: List[TelegramMethod] = []
+        self.rate_limited = 0
+
+    async def close(self):
+        pass
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None):
+        delay = self.latency + self.rnd.uniform(0, self.jitter) if (self.latency or self.jitter) else 0
+        if delay:
+            await asyncio.sleep(delay)
+        if self.p429 and self.rnd.random() < self.p429:
+            self.rate_limited += 1
+            raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=self.retry_after)
+        self.requests.append(method)
+        if isinstance(method, SendMessage):
+            return Message(
+                message_id=len(self.requests),
+                date=datetime.now(),
+                chat=Chat(id=method.chat_id, type="private"),
+                text=method.text,
+            )
+        return True
+
+
+def fake_bot(session: Optional[FakeSession] = None) -> Bot:
+    return Bot(BOT_TOKEN, session=session or FakeSession())
+
+
+def message_update(update_id: int, user_id: int, text: str) -> dict:
+    user = User(id=user_id, is_bot=False, first_name=f"user{user_id}")
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(datetime.now().timestamp()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": user.model_dump(exclude_none=True),
+            "text": text,
+        },
+    }
@@ -0,0 +1,100 @@
+import argparse
+import csv
+import random
+import sys
+from io import StringIO
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+DAYS = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота"]
+TIMES = ["8:30", "10:10", "11:50", "13:35", "15:15", "16:55", "18:35"]
+WEEKS = ["в", "н"]
+SUBJECTS = [
+    "Математический анализ", "Линейная алгебра", "Физика", "Программирование",
+    "Базы данных", "Дискретная математика", "История", "Английский язык",
+    "Физическая культура", "Операционные системы", "Теория вероятностей",
+]
+TYPES = ["лекция", "практика", "лаб. работа", "семинар"]
+BUILDINGS = ["Кремлевская, 35", "Профессора Нужина, 1/37", "Кремлевская, 18", "Пушкина, 1/55"]
+SURNAMES = ["Иванов", "Петров", "Сидорова", "Кузнецов", "Смирнова", "Попов", "Васильева", "Зайцев", "Морозова"]
+
+# Колонки одной группы: предмет, здание, ауд. 1, ауд. 2, вид, 2 служебные, преподаватель
+GROUP_WIDTH = 8
+
+
+def group_codes(n: int, seed: int = 0) -> List[str]:
+    rnd = random.Random(seed)
+    codes = set()
+    while len(codes) < n:
+        codes.add(f"{rnd.randint(1, 9)}{rnd.randint(1, 9)}{rnd.randint(0, 99999):05d}")
+    return sorted(codes)
+
+
+def _teacher(rnd: random.Random) -> str:
+    names = [f"{rnd.choice(SURNAMES)} {rnd.choice('АБВГДЕИКМНОП')}.{rnd.choice('АБВГДЕИКМНОП')}." for _ in range(rnd.choice((1, 1, 1, 2)))]
+    return rnd.choice(("; ", ", ", "  ")).join(names)
+
+
+def make_sheet(codes: List[str], seed: int = 0, density: float = 0.45) -> str:
+    rnd = random.Random(seed)
+    head0 = ["День недели", "Время", "Неделя"]
+    head1 = ["", "", ""]
+    for code in codes:
+        # как в листах КФУ: «09-825» — первые три цифры кода группы
+        head0 += [f"09-{code[:3]} ({code})"] + [""] * (GROUP_WIDTH - 1)
+        head1 += ["Дисциплина", "Здание", "Ауд.", "Ауд.", "Вид занятия", "", "", "Преподаватель"]
+
+    out = StringIO()
+    w = csv.writer(out)
+    w.writerow(head0)
+    w.writerow(head1)
+    for day in DAYS:
+        first = True
+        for t in TIMES:
+            for week in WEEKS:
+                row = [day if first else "", t, week]
+                first = False
+                for _ in codes:
+                    if rnd.random() < density:
+                        room = rnd.randint(100, 1599)
+                        row += [
+                            rnd.choice(SUBJECTS),
+                            rnd.choice(BUILDINGS),
+                            f"{room}.0" if rnd.random() < 0.3 else str(room),
+                            str(rnd.randint(100, 1599)) if rnd.random() < 0.1 else "",
+                            rnd.choice(TYPES),
+                            "", "",
+                            _teacher(rnd),
+                        ]
+                    else:
+                        row += [""] * GROUP_WIDTH
+                w.writerow(row)
+    return out.getvalue()
+
+
+def generate(out_dir: Path, groups: int, sheets: int, seed: int = 0) -> Dict[int, Tuple[str, ...]]:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    codes = group_codes(groups, seed)
+    per_sheet = -(-len(codes) // sheets)
+    layout: Dict[int, Tuple[str, ...]] = {}
+    for gid in range(sheets):
+        chunk = codes[gid * per_sheet:(gid + 1) * per_sheet]
+        (out_dir / f"gid_{gid}.csv").write_text(make_sheet(chunk, seed + gid), encoding="utf-8")
+        layout[gid] = tuple(chunk)
+    return layout
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Генератор синтетических листов расписания в формате КФУ")
+    ap.add_argument("out_dir", type=Path)
+    ap.add_argument("--groups", type=int, default=300)
+    ap.add_argument("--sheets", type=int, default=6)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    layout = generate(args.out_dir, args.groups, args.sheets, args.seed)
+    print(f"Сгенерировано {sum(len(c) for c in layout.values())} групп в {len(layout)} листах: {args.out_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Set
+
+from bench.generator import generate
+
+# что делает студент за один заход: ищет группу (если ещё не выбрана) и смотрит расписание
+SEARCH = "search"
+TODAY = "📅 Сегодня"
+TOMORROW = "📅 Завтра"
+WEEK_MENU = "📋 Вся неделя"
+WEEK = "🔎 Текущая неделя"
+NEXT_WEEK = "➡️ Следующая неделя"
+
+
+def _rss_kib() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        # не Linux: только пиковое значение
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _percentile(sorted_samples: List[float], q: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * q))]
+
+
+class Stage:
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.sessions = 0
+        self.latency: Dict[str, List[float]] = defaultdict(list)
+        self.errors = 0
+        self.started = time.perf_counter()
+        self.finished = self.started
+        self.rss_before = _rss_kib()
+        self.rss_after = self.rss_before
+
+    def report(self) -> Dict[str, object]:
+        everything = sorted(x for xs in self.latency.values() for x in xs)
+        elapsed = max(1e-9, self.finished - self.started)
+        return {
+            "rate": self.rate,
+            "sessions": self.sessions,
+            "updates": len(everything),
+            "errors": self.errors,
+            "throughput": len(everything) / elapsed,
+            "p50_ms": _percentile(everything, 0.5) * 1000,
+            "p90_ms": _percentile(everything, 0.9) * 1000,
+            "p99_ms": _percentile(everything, 0.99) * 1000,
+            "max_ms": (everything[-1] if everything else 0.0) * 1000,
+            "by_action_p99_ms": {k: _percentile(sorted(v), 0.99) * 1000 for k, v in self.latency.items()},
+            "rss_kib": self.rss_after,
+            "rss_growth_kib": self.rss_after - self.rss_before,
+        }
+
+
+class LoadTest:
+    def __init__(self, dp, bot, codes: List[str], users: int, think: float, search_prefix: float, seed: int):
+        self.dp = dp
+        self.bot = bot
+        self.codes = codes
+        self.users = users
+        self.think = think
+        self.search_prefix = search_prefix
+        self.rnd = random.Random(seed)
+        self.update_id = 0
+        # группа, которую «помнит» пользователь; у вернувшихся поиск уже не нужен
+        self.groups: Dict[int, str] = {}
+        self.busy: Set[int] = set()
+
+    async def _send(self, stage: Stage, user_id: int, text: str, action: str):
+        from aiogram.types import Update
+        from bench.fake_bot import message_update
+
+        self.update_id += 1
+        update = Update.model_validate(message_update(self.update_id, user_id, text), context={"bot": self.bot})
+        t0 = time.perf_counter()
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception:
+            stage.errors += 1
+        stage.latency[action].append(time.perf_counter() - t0)
+
+    async def _pause(self):
+        if self.think:
+            await asyncio.sleep(self.rnd.expovariate(1 / self.think))
+
+    async def session(self, stage: Stage, user_id: int):
+        stage.sessions += 1
+        group = self.groups.get(user_id)
+        if group is None:
+            group = self.groups[user_id] = self.rnd.choice(self.codes)
+            if self.rnd.random() < self.search_prefix:
+                # сначала неполный номер или номер из шапки листа («09-825») — бот предложит варианты
+                partial = group[:4] if self.rnd.random() < 0.5 else f"09-{group[:3]}"
+                await self._send(stage, user_id, partial, SEARCH)
+                await self._pause()
+            await self._send(stage, user_id, group, SEARCH)
+            await self._pause()
+        await self._send(stage, user_id, TODAY, TODAY)
+        if self.rnd.random() < 0.3:
+            await self._pause()
+            await self._send(stage, user_id, TOMORROW, TOMORROW)
+        if self.rnd.random() < 0.5:
+            await self._pause()
+            await self._send(stage, user_id, WEEK_MENU, WEEK_MENU)
+            await self._pause()
+            view = WEEK if self.rnd.random() < 0.8 else NEXT_WEEK
+            await self._send(stage, user_id, view, view)
+
+    async def run_stage(self, rate: float, duration: float) -> Stage:
+        # приход студентов — пуассоновский поток с интенсивностью rate заходов в секунду
+        stage = Stage(rate)
+        tasks = set()
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(self.rnd.expovariate(rate))
+            user_id = self.rnd.randint(1, self.users)
+            if user_id in self.busy:
+                continue
+            self.busy.add(user_id)
+            task = asyncio.create_task(self.session(stage, user_id))
+            tasks.add(task)
+            task.add_done_callback(lambda t, uid=user_id: (tasks.discard(t), self.busy.discard(uid)))
+        if tasks:
+            await asyncio.gather(*tasks)
+        stage.finished = time.perf_counter()
+        gc.collect()
+        stage.rss_after = _rss_kib()
+        return stage
+
+
+async def run(args) -> Dict[str, object]:
+    from app.main import build_dispatcher
+    from app.services import csv_cache, metrics, schedule_store
+    from app.services.sender import sender
+    from bench.fake_bot import FakeSession, fake_bot
+
+    csv_cache.import_raw_files()
+    await csv_cache.rebuild_group_index()
+    await csv_cache.rebuild_schedule_store()
+    codes = sorted(schedule_store.current().groups)
+
+    session = FakeSession(latency=args.latency, jitter=args.jitter, p429=args.p429,
+                          retry_after=args.retry_after, seed=args.seed)
+    bot = fake_bot(session)
+    dp = build_dispatcher()
+    test = LoadTest(dp, bot, codes, args.users, args.think, args.search_prefix, args.seed)
+
+    rss_start = _rss_kib()
+    print(f"{'заходов/с':>9} {'заходов':>8} {'апдейтов':>9} {'апд/с':>8} {'p50, мс':>9} {'p90, мс':>9} "
+          f"{'p99, мс':>9} {'max, мс':>9} {'RSS, МиБ':>9} {'прирост':>8}")
+    stages = []
+    for rate in args.rate:
+        r = (await test.run_stage(rate, args.duration)).report()
+        stages.append(r)
+        print(f"{rate:>9g} {r['sessions']:>8} {r['updates']:>9} {r['throughput']:>8.1f} {r['p50_ms']:>9.1f} "
+              f"{r['p90_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['max_ms']:>9.1f} {r['rss_kib'] / 1024:>9.1f} "
+              f"{r['rss_growth_kib'] / 1024:>+8.1f}")
+        if args.p99_limit and r["p99_ms"] > args.p99_limit:
+            print(f"p99 превысил {args.p99_limit:g} мс — дальше не разгоняем")
+            break
+
+    throttled = sum(metrics.throttled_total.get(e) for e in ("Message", "CallbackQuery"))
+    await sender.close()
+    return {
+        "stages": stages,
+        "bot_api_requests": len(session.requests),
+        "rate_limited_429": session.rate_limited,
+        "throttled": throttled,
+        "rss_start_kib": rss_start,
+        "rss_end_kib": _rss_kib(),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Нагрузочный прогон: синтетические студенты через настоящий Dispatcher")
+    ap.add_argument("--groups", type=int, default=300)
+    ap.add_argument("--sheets", type=int, default=6)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--users", type=int, default=5000, help="сколько разных студентов")
+    ap.add_argument("--rate", type=lambda s: [float(x) for x in s.split(",")], default=[10, 25, 50, 100],
+                    help="ступени нагрузки, заходов в секунду через запятую")
+    ap.add_argument("--duration", type=float, default=20, help="длительность ступени, сек")
+    ap.add_argument("--think", type=float, default=1.5, help="средняя пауза между нажатиями, сек")
+    ap.add_argument("--search-prefix", type=float, default=0.2, help="доля поисков с неполным номером")
+    ap.add_argument("--latency", type=float, default=0.05, help="задержка ответа Bot API, сек")
+    ap.add_argument("--jitter", type=float, default=0.05, help="случайная добавка к задержке, сек")
+    ap.add_argument("--p429", type=float, default=0.0, help="вероятность ответа 429 Too Many Requests")
+    ap.add_argument("--retry-after", type=int, default=1)
+    ap.add_argument("--p99-limit", type=float, default=0.0, help="остановиться, когда p99 превысит столько мс")
+    ap.add_argument("--real-limits", action="store_true",
+                    help="оставить лимиты отправки из конфига (~30 сообщений/с), иначе меряем сам процесс")
+    ap.add_argument("--out", type=Path, help="записать результаты в JSON")
+    args = ap.parse_args(argv)
+
+    workdir = Path(tempfile.mkdtemp(prefix="tgbot-load-"))
+    # config читает окружение при импорте, поэтому приложение импортируем только после этого
+    os.environ["CACHE_DIR"] = str(workdir / "csv")
+    os.environ["USER_DB"] = str(workdir / "users.sqlite3")
+    os.environ.setdefault("PARSE_WORKERS", "0")
+    if not args.real_limits:
+        os.environ.setdefault("SEND_CHAT_BURST", "1000")
+        os.environ.setdefault("SEND_GLOBAL_RATE", "1000000")
+
+    generate(workdir / "csv", args.groups, args.sheets, args.seed)
+    result = asyncio.run(run(args))
+
+    print(f"запросов к Bot API: {result['bot_api_requests']}, ответов 429: {result['rate_limited_429']}, "
+          f"отсечено антифлудом: {result['throttled']:.0f}")
+    print(f"RSS: {result['rss_start_kib'] / 1024:.1f} → {result['rss_end_kib'] / 1024:.1f} МиБ")
+    if args.out:
+        result["meta"] = {"timestamp": datetime.now().isoformat(timespec="seconds"), **{
+            k: v for k, v in vars(args).items() if k != "out"}}
+        args.out.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"Результаты записаны в {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+import argparse
+import math
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+from app.services import parser
+from app.services.csv_cache import import_raw_files, list_cached_files
+from app.services.sheet_slices import read_projected
+
+
+def _norm(value):
+    # pandas >= 3 оставляет NaN вместо пустой строки
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    return value
+
+
+def _normalize(parsed: Dict[str, List[dict]]):
+    return {code: [{k: _norm(v) for k, v in d.items()} for d in lessons] for code, lessons in parsed.items()}
+
+
+def _sheets():
+    # листы в кэше — срезы; для сравнения движков собираем CSV из колонок всех групп листа
+    return [(path, *read_projected(path)) for path in list_cached_files()]
+
+
+def check_equivalence() -> int:
+    mismatches = 0
+    for path, text, cols in _sheets():
+        a = _normalize(parser.parse_sheet(text, cols, engine="pandas"))
+        b = _normalize(parser.parse_sheet(text, cols, engine="csv"))
+        for code in cols:
+            if a.get(code) != b.get(code):
+                mismatches += 1
+                print(f"[!] {path.name}: группа {code} различается")
+        for code, col in list(cols.items())[:20]:
+            if _normalize({code: parser.parse_schedule(text, code, engine="pandas")}) != \
+                    _normalize({code: parser.parse_schedule(text, code, engine="csv")}):
+                mismatches += 1
+                print(f"[!] {path.name}: parse_schedule({code}) различается")
+        print(f"{path.name}: {len(cols)} групп проверено")
+    return mismatches
+
+
+def _import_time(module: str) -> float:
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip())
+
+
+def benchmark(repeat: int):
+    sheets = [(text, cols) for _, text, cols in _sheets()]
+
+    for engine in ("pandas", "csv"):
+        imported = _import_time(parser.ENGINES[engine])
+        parser.get_engine(engine)
+
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            for text, cols in sheets:
+                parser.parse_sheet(text, cols, engine=engine)
+        per_refresh = (time.perf_counter() - t0) / repeat
+        print(f"{engine:>6}: импорт {imported * 1000:.1f} мс, разбор всех листов {per_refresh * 1000:.1f} мс")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Сравнение движков parse_schedule на кэшированных листах")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--skip-check", action="store_true")
+    args = ap.parse_args(argv)
+
+    import_raw_files()
+    if not list_cached_files():
+        print("Кэш CSV пуст — нечего сравнивать.")
+        return 1
+
+    if not args.skip_check:
+        mismatches = check_equivalence()
+        print("Результаты совпадают." if not mismatches else f"Расхождений: {mismatches}")
+        if mismatches:
+            return 1
+    benchmark(args.repeat)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+
+from bench.generator import generate
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    n = len(samples)
+    return {
+        "n": n,
+        "mean_us": statistics.fmean(samples) * 1e6,
+        "p50_us": samples[n // 2] * 1e6,
+        "p99_us": samples[min(n - 1, int(n * 0.99))] * 1e6,
+        "min_us": samples[0] * 1e6,
+    }
+
+
+def measure(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return _summary(samples)
+
+
+async def ameasure(fn: Callable[[], Awaitable[object]], repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - t0)
+    return _summary(samples)
+
+
+async def run_cases(layout, repeat: int) -> Dict[str, Dict[str, float]]:
+    from app.handlers.schedule_buttons import filter_by_week, filter_lessons_by_day, format_day_schedule, render_day
+    from app.main import build_dispatcher
+    from app.services import csv_cache, parser
+    from app.services.schedule_store import get_lessons
+    from bench.fake_bot import FakeSession, fake_bot, message_update
+
+    csv_cache.import_raw_files()
+    await csv_cache.rebuild_group_index()
+    await csv_cache.rebuild_schedule_store()
+
+    codes = [c for chunk in layout.values() for c in chunk]
+    sheets = {gid: (csv_cache._raw_path(gid).read_text(encoding="utf-8"), chunk) for gid, chunk in layout.items()}
+    results: Dict[str, Dict[str, float]] = {}
+    it = iter(range(10 ** 9))
+
+    def next_code():
+        return codes[next(it) % len(codes)]
+
+    results["find_group_schedule_local"] = await ameasure(
+        lambda: csv_cache.find_group_schedule_local(next_code()), repeat)
+
+    for engine in parser.ENGINES:
+        parser.get_engine(engine)
+
+        def one_group(engine=engine):
+            gid = next(it) % len(sheets)
+            text, chunk = sheets[gid]
+            parser.parse_schedule(text, chunk[0], engine=engine)
+
+        def whole_sheet(engine=engine):
+            gid = next(it) % len(sheets)
+            text, chunk = sheets[gid]
+            parser.parse_sheet(text, {code: csv_cache.lookup_group(code)[1] for code in chunk}, engine=engine)
+
+        results[f"parse_schedule[{engine}]"] = measure(one_group, max(3, repeat // 50))
+        results[f"parse_sheet[{engine}]"] = measure(whole_sheet, max(3, repeat // 200))
+
+    day_lists = [filter_lessons_by_day(get_lessons(c), "Понедельник") for c in codes]
+    results["filter_by_week"] = measure(
+        lambda: filter_by_week(day_lists[next(it) % len(day_lists)], target_date=date.today()), repeat)
+    results["format_day_schedule"] = measure(
+        lambda: format_day_schedule(day_lists[next(it) % len(day_lists)], "Понедельник"), repeat)
+
+    def cached_render():
+        code = next_code()
+        render_day(code, get_lessons(code), "Понедельник", "в")
+
+    results["render_day[cached]"] = measure(cached_render, repeat)
+
+    session = FakeSession()
+    bot = fake_bot(session)
+    dp = build_dispatcher()
+    users = iter(range(1, 10 ** 9))
+
+    async def cmd_schedule():
+        uid = next(users)
+        await dp.feed_raw_update(bot, message_update(uid, uid, next_code()))
+
+    results["cmd_schedule"] = await ameasure(cmd_schedule, repeat)
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline_path: Path):
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))["results"]
+    print(f"\nСравнение с {baseline_path}:")
+    for name, r in results.items():
+        old = baseline.get(name)
+        if old:
+            print(f"  {name:<28} {r['p50_us'] / old['p50_us'] * 100 - 100:+7.1f}% (p50)")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Бенчмарки горячих путей бота на синтетическом расписании")
+    ap.add_argument("--groups", type=int, default=300)
+    ap.add_argument("--sheets", type=int, default=6)
+    ap.add_argument("--repeat", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", type=Path, default=Path("bench_results.json"))
+    ap.add_argument("--baseline", type=Path, help="JSON прошлого прогона для сравнения")
+    args = ap.parse_args(argv)
+
+    workdir = Path(tempfile.mkdtemp(prefix="tgbot-bench-"))
+    # config читает окружение при импорте, поэтому приложение импортируем только после этого
+    os.environ["CACHE_DIR"] = str(workdir / "csv")
+    os.environ["USER_DB"] = str(workdir / "users.sqlite3")
+    os.environ.setdefault("PARSE_WORKERS", "0")
+    # парсеры меряем на целых листах, поэтому исходные CSV оставляем рядом со срезами
+    os.environ["KEEP_RAW_CSV"] = "1"
+    os.environ.setdefault("SEND_CHAT_BURST", "1000")
+    os.environ.setdefault("SEND_GLOBAL_RATE", "1000000")
+
+    layout = generate(workdir / "csv", args.groups, args.sheets, args.seed)
+    results = asyncio.run(run_cases(layout, args.repeat))
+
+    from app.services.config import cfg
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "groups": args.groups,
+            "sheets": args.sheets,
+            "repeat": args.repeat,
+            "parser_engine": cfg.parser_engine,
+        },
+        "results": results,
+    }
+    args.out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    for name, r in results.items():
+        print(f"{name:<28} p50 {r['p50_us']:10.1f} мкс  p99 {r['p99_us']:10.1f} мкс  (n={r['n']})")
+    print(f"Результаты записаны в {args.out}")
+    if args.baseline:
+        compare(results, args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+
+from app.main import _concurrency_limiter, build_dispatcher, build_webhook_app
+from app.services.config import cfg
+from bench.fake_bot import FakeSession, fake_bot, message_update
+
+
+async def run(updates: int, users: int, concurrency: int, latency: float, port: int):
+    session = FakeSession(latency=latency)
+    bot = fake_bot(session)
+    dp = build_dispatcher()
+    app = build_webhook_app(dp, bot)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", port)
+    await site.start()
+
+    url = f"http://127.0.0.1:{port}{cfg.webhook_path}"
+    headers = {"X-Telegram-Bot-Api-Secret-Token": cfg.webhook_secret} if cfg.webhook_secret else {}
+    accept = []
+    rejected = 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async with aiohttp.ClientSession() as client:
+        async def post(i: int):
+            nonlocal rejected
+            async with sem:
+                t0 = time.perf_counter()
+                # как Telegram: на 503 доставка повторяется, пока апдейт не примут
+                while True:
+                    async with client.post(url, json=message_update(i, 1 + i % users, "/start"),
+                                           headers=headers) as resp:
+                        await resp.read()
+                    if resp.status != 503:
+                        break
+                    rejected += 1
+                    await asyncio.sleep(0.05)
+                assert resp.status == 200, resp.status
+                accept.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(post(i) for i in range(1, updates + 1)))
+        accepted = time.perf_counter() - t0
+        await _concurrency_limiter(dp).drain(60)
+        total = time.perf_counter() - t0
+
+    await site.stop()
+    await runner.cleanup()
+
+    accept.sort()
+    print(f"апдейтов: {updates}, пользователей: {users}")
+    print(f"приём:     {updates / accepted:8.0f} апд/с, p50 {statistics.median(accept) * 1000:.1f} мс, "
+          f"p99 {accept[int(len(accept) * 0.99) - 1] * 1000:.1f} мс")
+    print(f"обработка: {updates / total:8.0f} апд/с, запросов к Bot API: {len(session.requests)}")
+    print(f"отклонено (503): {rejected}, лимит очереди: {cfg.webhook_max_pending}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Пропускная способность webhook-режима на синтетических апдейтах")
+    ap.add_argument("--updates", type=int, default=5000)
+    ap.add_argument("--users", type=int, default=1000)
+    ap.add_argument("--concurrency", type=int, default=100, help="одновременных POST-запросов")
+    ap.add_argument("--latency", type=float, default=0.0, help="задержка ответа Bot API, сек")
+    ap.add_argument("--port", type=int, default=18080)
+    args = ap.parse_args(argv)
+    asyncio.run(run(args.updates, args.users, args.concurrency, args.latency, args.port))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
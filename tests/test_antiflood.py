@@ -0,0 +1,40 @@
+from app.middlewares.antiflood import TokenBucketLimiter
+
+
+def test_burst_then_refill():
+    limiter = TokenBucketLimiter(rate=1.0, burst=3)
+    assert [limiter.allow(1, now=0.0) for _ in range(4)] == [True, True, True, False]
+    # через секунду набежал ровно один токен
+    assert limiter.allow(1, now=1.0)
+    assert not limiter.allow(1, now=1.0)
+    assert limiter.stats()["throttled"] == 2
+
+
+def test_users_are_independent():
+    limiter = TokenBucketLimiter(rate=1.0, burst=1)
+    assert limiter.allow(1, now=0.0)
+    assert not limiter.allow(1, now=0.1)
+    assert limiter.allow(2, now=0.1)
+
+
+def test_idle_buckets_are_evicted():
+    limiter = TokenBucketLimiter(rate=1.0, burst=2)
+    for uid in range(1000):
+        limiter.allow(uid, now=0.0)
+    assert len(limiter) == 1000
+    # после burst / rate секунд простоя корзины полные — их больше не храним
+    limiter.allow(5000, now=2.0)
+    assert len(limiter) == 1
+    assert limiter.stats()["evicted"] == 1000
+
+
+def test_eviction_does_not_reset_active_users():
+    limiter = TokenBucketLimiter(rate=1.0, burst=2)
+    limiter.allow(1, now=0.0)
+    limiter.allow(1, now=0.0)
+    limiter.allow(2, now=0.0)
+    # пользователь 1 только что исчерпал корзину и продолжает слать — его не выселяют
+    assert not limiter.allow(1, now=0.5)
+    limiter.allow(3, now=2.1)
+    assert len(limiter) == 2
+    assert limiter.allow(1, now=2.1)
@@ -0,0 +1,119 @@
+import asyncio
+
+from aiogram.exceptions import TelegramBadRequest
+
+from app.services import changes, digest
+from app.services.changes import ADDED, CHANGED, REMOVED, ChangeFeed, GroupDiff, diff_lessons
+from app.services.digest import DigestStore
+from app.services.schedule_store import Lesson, ScheduleStore
+from app.services.sender import MessageSender
+from app.services.user_state import UserStateStore
+from bench.fake_bot import FakeSession, fake_bot
+
+GROUP = "8251160"
+
+
+def _lesson(day="Понедельник", time="8:30", week="", subject="Физика", room="101", teacher="Иванов И.И."):
+    return Lesson(GROUP, day, time, week, subject, "Кремлевская", room, "", "лекция", teacher)
+
+
+def test_diff_kinds():
+    old = [_lesson(), _lesson(time="10:10", subject="Химия")]
+    new = [_lesson(room="205"), _lesson(day="Вторник", subject="История")]
+    diff = diff_lessons(old, new)
+    assert [(c.kind, c.day, c.time) for c in diff] == [
+        (CHANGED, "Понедельник", "8:30"),
+        (REMOVED, "Понедельник", "10:10"),
+        (ADDED, "Вторник", "8:30"),
+    ]
+    assert diff[0].fields() == [("room1", "101", "205")]
+
+
+def test_same_lessons_no_diff():
+    assert diff_lessons([_lesson()], [_lesson()]) == []
+
+
+def test_feed_skips_first_load_and_acks():
+    feed = ChangeFeed()
+    feed.on_update(ScheduleStore({GROUP: (_lesson(),)}, generation=1), {GROUP})
+    assert feed.unsent() == []
+    feed.on_update(ScheduleStore({GROUP: (_lesson(room="205"),)}, generation=2), {GROUP})
+    unsent = feed.unsent()
+    assert [d.generation for d in unsent] == [2]
+    assert feed.recent(GROUP) == unsent
+    feed.ack(unsent)
+    assert feed.unsent() == []
+    assert feed.recent(GROUP) == unsent
+
+
+class _Session(FakeSession):
+    async def make_request(self, bot, method, timeout=None):
+        if method.chat_id == 2:
+            raise TelegramBadRequest(method=method, message="Bad Request: chat not found")
+        return await super().make_request(bot, method, timeout)
+
+
+def test_notices_survive_a_crash_and_resume(tmp_path, monkeypatch):
+    path = str(tmp_path / "users.sqlite3")
+
+    async def scenario():
+        users = UserStateStore(path)
+        await users.open()
+        for uid in (1, 2, 3):
+            users.set_group(uid, GROUP)
+        await users.flush()
+        monkeypatch.setattr(changes, "user_states", users)
+        monkeypatch.setattr(digest, "sender", MessageSender(global_rate=1000, chat_rate=1000))
+        session = _Session()
+        bot = fake_bot(session)
+
+        store = DigestStore(path)
+        await store.open()
+        for uid in (1, 2, 3):
+            await store.subscribe(uid, uid)
+        monkeypatch.setattr(changes, "digest_store", store)
+        monkeypatch.setattr(digest, "digest_store", store)
+
+        feed = ChangeFeed()
+        feed._unsent.append(GroupDiff(GROUP, 2, 0.0, ()))
+        monkeypatch.setattr(changes, "change_feed", feed)
+
+        # процесс «падает» на второй контрольной точке — после второго подписчика
+        checkpoint, calls = store.checkpoint, []
+
+        async def crashing(broadcast_id, progress):
+            calls.append(broadcast_id)
+            if len(calls) == 2:
+                raise RuntimeError("crash")
+            await checkpoint(broadcast_id, progress)
+
+        monkeypatch.setattr(store, "checkpoint", crashing)
+        try:
+            await changes.notify(bot, lambda diffs: "изменения", batch=1)
+        except RuntimeError:
+            pass
+        assert feed.unsent() == []
+        assert await store.notice_batches() == [1]
+        await store.close()
+
+        # «перезапуск»: новое подключение к той же базе, лента в памяти пуста
+        restarted = DigestStore(path)
+        await restarted.open()
+        monkeypatch.setattr(changes, "digest_store", restarted)
+        monkeypatch.setattr(digest, "digest_store", restarted)
+        monkeypatch.setattr(changes, "change_feed", ChangeFeed())
+        sent = await changes.notify(bot, lambda diffs: "изменения", batch=1)
+
+        batches = await restarted.notice_batches()
+        active = await asyncio.to_thread(restarted._query, "SELECT user_id, active FROM subscriptions")
+        await restarted.close()
+        await users.close()
+        return session, sent, batches, dict(active)
+
+    session, sent, batches, active = asyncio.run(scenario())
+    assert [m.chat_id for m in session.requests] == [1, 3]
+    # счёт продолжается с контрольной точки: доставка до падения тоже учтена
+    assert sent == 2
+    assert batches == []
+    # «chat not found» отписывает так же, как блокировка бота
+    assert active == {1: 1, 2: 0, 3: 1}
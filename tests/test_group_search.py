@@ -0,0 +1,55 @@
+import pytest
+
+from app.services.group_search import GroupSearch, normalize_query
+
+CODES = ["8251160", "8251161", "8251170", "8252001", "9251160"]
+
+
+@pytest.fixture
+def search():
+    return GroupSearch(CODES)
+
+
+def test_exact_match_wins(search):
+    assert search.suggest("8251160") == ["8251160"]
+
+
+def test_prefix(search):
+    assert search.prefix("82511") == ["8251160", "8251161", "8251170"]
+    assert search.prefix("82511", limit=2) == ["8251160", "8251161"]
+    assert search.count_prefix("825") == 4
+    assert search.count_prefix("7") == 0
+
+
+@pytest.mark.parametrize("typo, expected", [
+    ("8251169", ["8251160", "8251161"]),   # замена
+    ("82511600", ["8251160"]),             # лишняя цифра
+    ("825160", ["8251160"]),               # пропущенная цифра
+    ("8215160", ["8251160"]),              # перестановка соседних
+])
+def test_one_typo(search, typo, expected):
+    assert search.near(typo) == expected
+
+
+def test_two_typos_are_not_suggested(search):
+    assert search.near("8255560") == []
+
+
+def test_suggest_fills_with_near_matches(search):
+    assert search.suggest("9251161") == ["8251161", "9251160"]
+
+
+def test_rebuild_replaces_codes(search):
+    search.build(["1111111"])
+    assert "8251160" not in search
+    assert search.suggest("111111") == ["1111111"]
+
+
+@pytest.mark.parametrize("text, code", [
+    ("09-825", "825"),
+    (" 09 - 825 ", "825"),
+    ("8251160", "8251160"),
+    ("гр. 825-1160", "8251160"),
+])
+def test_normalize_query(text, code):
+    assert normalize_query(text) == code
@@ -0,0 +1,89 @@
+import math
+import os
+from pathlib import Path
+
+import pytest
+
+from app.services import parser_csv, sheet_slices
+from app.services.csv_cache import SLICE_SUFFIX
+from app.services.config import cfg
+from bench.generator import group_codes, make_sheet
+
+parser_pandas = pytest.importorskip("app.services.parser_pandas")
+
+CODE = "1234567"
+
+
+def _norm(parsed):
+    # pandas >= 3 оставляет NaN вместо пустой строки
+    return {
+        code: [{k: "" if isinstance(v, float) and math.isnan(v) else v for k, v in d.items()} for d in lessons]
+        for code, lessons in parsed.items()
+    }
+
+
+def _sheet(subjects, rooms=None):
+    rooms = rooms or ["101"] * len(subjects)
+    rows = [f"Понедельник,8:30,в,{s},Кремлевская,{r},,лекция,,,Иванов И.И." for s, r in zip(subjects, rooms)]
+    return "\n".join([f"День недели,Время,Неделя,09-123 ({CODE}),,,,,,,", ",,,a,b,c,d,e,f,g,h", *rows]) + "\n"
+
+
+def _assert_same(text, columns):
+    assert _norm(parser_csv.parse_sheet(text, columns)) == _norm(parser_pandas.parse_sheet(text, columns))
+    for code in columns:
+        assert _norm({code: parser_csv.parse_schedule(text, code)}) == \
+            _norm({code: parser_pandas.parse_schedule(text, code)})
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_generated_sheets(seed):
+    codes = group_codes(40, seed)
+    text = make_sheet(codes, seed)
+    _assert_same(text, {code: 3 + i * 8 for i, code in enumerate(codes)})
+
+
+@pytest.mark.parametrize("subjects", [
+    ["false", "NA", "True"],
+    ["false", "", "TRUE"],
+    ["False", "True"],
+    ["٣", "4"],
+    ["3", "١٢"],
+    ["1", "NA", "2"],
+    ["1.5", ""],
+    ["1e3", "inf"],
+    [" 7 ", "x"],
+])
+def test_type_inference(subjects):
+    _assert_same(_sheet(subjects), {CODE: 3})
+
+
+@pytest.mark.parametrize("rooms", [["101.0", "NA", "205"], ["٣.0", "4.0"], ["1", "2"]])
+def test_rooms(rooms):
+    _assert_same(_sheet(["Физика"] * len(rooms), rooms), {CODE: 3})
+
+
+def _cached_sheets():
+    # настоящие листы из кэша бота (CACHE_DIR): сырые CSV и сжатые срезы
+    d = Path(os.getenv("CACHE_DIR", cfg.cache_dir))
+    if not d.is_dir():
+        return []
+    return sorted(d.glob("gid_*.csv")) + sorted(d.glob(f"gid_*{SLICE_SUFFIX}"))
+
+
+@pytest.mark.parametrize(
+    "path",
+    _cached_sheets() or [pytest.param(None, marks=pytest.mark.skip(reason="в кэше нет листов"))],
+    ids=lambda p: p.name if p else "none",
+)
+def test_cached_sheets(path, tmp_path):
+    if path.suffix == ".csv":
+        text = path.read_text(encoding="utf-8", errors="ignore")
+        # колонки групп берём из индекса среза, как при обычной загрузке
+        slc = tmp_path / "sheet.slc"
+        sheet_slices.write(slc, text)
+        with sheet_slices.SheetReader(slc) as reader:
+            columns = dict(reader.groups)
+    else:
+        text, columns = sheet_slices.read_projected(path)
+    assert columns
+    _assert_same(text, columns)
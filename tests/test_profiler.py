@@ -0,0 +1,46 @@
+import tracemalloc
+import zipfile
+
+from app.services.profiler import SAMPLE, SLOW, Profiler
+
+
+def _profiler(tmp_path, **kwargs) -> Profiler:
+    p = Profiler(str(tmp_path), sample_rate=1.0, slow_ms=100, **kwargs)
+    p.configure(enabled=True)
+    return p
+
+
+def test_tracemalloc_runs_only_while_profiling(tmp_path):
+    p = _profiler(tmp_path)
+    assert not tracemalloc.is_tracing()
+    profile = p.begin("h")
+    assert tracemalloc.is_tracing()
+    data = [bytes(1000) for _ in range(100)]
+    capture = p.finish("h", profile, 0.5, 0.1, {"event": "Message"})
+    del data
+    assert not tracemalloc.is_tracing()
+    assert capture["meta"]["kind"] == SLOW
+    assert capture["meta"]["traced_peak"] >= 100_000
+    # снимок сделан в момент апдейта, запись в пуле его только разбирает
+    assert capture["memory"] is not None
+
+    path = p.write_capture(capture)
+    with zipfile.ZipFile(path) as zf:
+        assert {"profile.prof", "memory.tracemalloc", "meta.json", "report.txt"} <= set(zf.namelist())
+
+
+def test_fast_sample_has_no_memory_snapshot(tmp_path):
+    p = _profiler(tmp_path)
+    capture = p.finish("h", p.begin("h"), 0.01, 0.01, {})
+    assert capture["meta"]["kind"] == SAMPLE
+    assert capture["memory"] is None
+    assert not tracemalloc.is_tracing()
+
+
+def test_without_trace_frames_tracemalloc_stays_off(tmp_path):
+    p = _profiler(tmp_path, trace_frames=0)
+    profile = p.begin("h")
+    assert not tracemalloc.is_tracing()
+    capture = p.finish("h", profile, 0.5, 0.1, {})
+    assert capture["memory"] is None
+    assert "traced_peak" not in capture["meta"]
@@ -0,0 +1,103 @@
+import asyncio
+from datetime import date
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from app.services import config, ics, schedule_store, semester
+from app.services.schedule_store import Lesson
+from app.services.semester import HOLIDAY, OUTSIDE, CalendarIndex, Semester, week_dates
+
+GROUP = "8251160"
+# семестр начался в среду: первая неделя «в» длится до воскресенья
+START = date(2025, 9, 3)
+
+
+def _lesson(day: str, week: str = "", subject: str = "Физика") -> Lesson:
+    return Lesson(GROUP, day, "8:30", week, subject, "Кремлевская", "101", "", "лекция", "Иванов И.И.")
+
+
+def test_week_parity_switches_on_monday():
+    sem = Semester(START)
+    assert sem.week_type(date(2025, 9, 3)) == "в"
+    assert sem.week_type(date(2025, 9, 7)) == "в"
+    assert sem.week_type(date(2025, 9, 8)) == "н"
+    assert sem.week_type(date(2025, 9, 15)) == "в"
+
+
+def test_day_off():
+    sem = Semester(START, date(2025, 12, 30), [date(2025, 11, 4)])
+    assert sem.day_off(date(2025, 11, 4)) == HOLIDAY
+    assert sem.day_off(date(2025, 9, 2)) == OUTSIDE
+    assert sem.day_off(date(2025, 12, 31)) == OUTSIDE
+    assert sem.day_off(date(2025, 11, 5)) is None
+
+
+def test_holiday_ranges(monkeypatch):
+    monkeypatch.setenv("HOLIDAYS", "2025-11-04, 2025-12-30..2026-01-02, garbage")
+    assert config._parse_dates("HOLIDAYS") == [
+        date(2025, 11, 4), date(2025, 12, 30), date(2025, 12, 31), date(2026, 1, 1), date(2026, 1, 2),
+    ]
+
+
+@pytest.mark.parametrize("value", ["", "   ", "not-a-date"])
+def test_empty_or_bad_date_falls_back(monkeypatch, value):
+    monkeypatch.setenv("SEMESTER_START", value)
+    assert config._parse_date("SEMESTER_START", "2025-09-01") == date(2025, 9, 1)
+
+
+def test_week_dates():
+    assert week_dates(date(2025, 9, 7)) == [date(2025, 9, d) for d in range(1, 7)]
+
+
+def test_calendar_resolves_dates(monkeypatch):
+    # окно дат считается от «сегодня» бота
+    monkeypatch.setattr(semester, "local_today", lambda: date(2025, 9, 8))
+    schedule_store.install({GROUP: (_lesson("Понедельник", "в"), _lesson("Понедельник", "н", "Химия"),
+                                    _lesson("Вторник"))}, {})
+    index = CalendarIndex(Semester(START, holidays=[date(2025, 9, 16)]), horizon_days=30)
+    assert [les.subject for les in index.on(GROUP, date(2025, 9, 8))] == ["Химия"]
+    assert [les.subject for les in index.on(GROUP, date(2025, 9, 15))] == ["Физика"]
+    # праздник в окне — занятий нет, хотя по расписанию вторник
+    assert [les.subject for les in index.on(GROUP, date(2025, 9, 9))] == ["Физика"]
+    assert index.on(GROUP, date(2025, 9, 16)) == ()
+    # за окном дат — по чётности недели
+    assert [les.subject for les in index.on(GROUP, date(2025, 11, 17))] == ["Химия"]
+    # до начала семестра занятий нет
+    assert index.on(GROUP, date(2025, 9, 1)) == ()
+
+    dates = [d for d, _ in index.occurrences(GROUP)]
+    assert date(2025, 9, 16) not in dates
+    # окно начинается с начала семестра, а в среду занятий нет
+    assert dates[0] == date(2025, 9, 8)
+
+
+def test_ics_etag_and_304():
+    async def scenario():
+        schedule_store.install({GROUP: (_lesson("Понедельник"), _lesson("Среда"))}, {})
+        app = web.Application()
+        ics.add_routes(app)
+        async with TestClient(TestServer(app)) as client:
+            first = await client.get(f"/ics/{GROUP}.ics")
+            body = await first.read()
+            etag = first.headers["ETag"]
+            again = await client.get(f"/ics/{GROUP}.ics", headers={"If-None-Match": etag})
+            weak = await client.get(f"/ics/{GROUP}.ics", headers={"If-None-Match": f'"x", W/{etag}'})
+            missing = await client.get("/ics/0000000.ics")
+
+            schedule_store.install({GROUP: (_lesson("Понедельник", subject="Химия"),)}, {})
+            changed = await client.get(f"/ics/{GROUP}.ics", headers={"If-None-Match": etag})
+            changed_body = await changed.read()
+        return first, body, etag, again, weak, missing, changed, changed_body
+
+    first, body, etag, again, weak, missing, changed, changed_body = asyncio.run(scenario())
+    assert first.status == 200
+    assert first.content_type == ics.CONTENT_TYPE
+    assert body.startswith(b"BEGIN:VCALENDAR\r\n") and b"SUMMARY:" in body
+    assert again.status == 304 and again.headers["ETag"] == etag
+    assert weak.status == 304
+    assert missing.status == 404
+    assert changed.status == 200
+    assert changed.headers["ETag"] != etag
+    assert "Химия".encode() in changed_body
@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+
+from app.services.sender import BULK, INTERACTIVE, MessageSender
+from bench.fake_bot import FakeSession, fake_bot
+
+CHAT = 42
+
+
+class ScriptedSession(FakeSession):
+    # отвечает 429 на тексты из rate_limited; тексты из held ждут release
+    def __init__(self, rate_limited=(), held=(), retry_after: float = 0.05):
+        super().__init__()
+        self.rate_limited_texts = set(rate_limited)
+        self.held = set(held)
+        self.release = asyncio.Event()
+        self.started = asyncio.Event()
+        self.attempts = []
+        self.retry_after = retry_after
+
+    async def make_request(self, bot, method, timeout=None):
+        self.attempts.append((time.monotonic(), method.text))
+        self.started.set()
+        if method.text in self.held:
+            await self.release.wait()
+        if method.text in self.rate_limited_texts:
+            raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=self.retry_after)
+        return await super().make_request(bot, method, timeout)
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_retry_after_pauses_then_gives_up():
+    async def scenario():
+        session = ScriptedSession(rate_limited={"a"})
+        sender = MessageSender(global_rate=1000, chat_rate=1000, chat_burst=10, max_retries=2)
+        with pytest.raises(TelegramRetryAfter):
+            await sender.send_message(fake_bot(session), CHAT, "a")
+        await sender.close()
+        return session, sender
+
+    session, sender = _run(scenario())
+    stamps = [t for t, _ in session.attempts]
+    assert len(stamps) == 3
+    # каждую следующую попытку чат ждёт retry_after
+    assert all(b - a >= 0.045 for a, b in zip(stamps, stamps[1:]))
+    assert (sender.sent, sender.failed, sender.retried) == (0, 1, 3)
+
+
+def test_cancelled_caller_does_not_stall_chat():
+    async def scenario():
+        session = ScriptedSession(rate_limited={"a"}, held={"a"})
+        bot = fake_bot(session)
+        sender = MessageSender(global_rate=1000, chat_rate=1000, chat_burst=10, max_retries=0)
+        first = asyncio.create_task(sender.send_message(bot, CHAT, "a"))
+        await session.started.wait()
+        # пока «a» отправляется, вызывающий уходит, а следом в тот же чат встаёт «b»
+        first.cancel()
+        second = asyncio.create_task(sender.send_message(bot, CHAT, "b"))
+        await asyncio.sleep(0)
+        session.release.set()
+        reply = await asyncio.wait_for(second, 2)
+        await sender.close()
+        return reply, first, sender
+
+    reply, first, sender = _run(scenario())
+    assert reply.text == "b"
+    assert first.cancelled()
+    assert (sender.sent, sender.failed) == (1, 1)
+
+
+def test_interactive_overtakes_queued_bulk():
+    async def scenario():
+        session = ScriptedSession()
+        bot = fake_bot(session)
+        sender = MessageSender(global_rate=1000, chat_rate=20, chat_burst=1)
+        bulk = [asyncio.create_task(sender.send_message(bot, CHAT, t, BULK)) for t in ("bulk1", "bulk2")]
+        await session.started.wait()
+        reply = asyncio.create_task(sender.send_message(bot, CHAT, "reply", INTERACTIVE))
+        await asyncio.gather(reply, *bulk)
+        await sender.close()
+        return session
+
+    session = _run(scenario())
+    assert [text for _, text in session.attempts] == ["bulk1", "reply", "bulk2"]
@@ -0,0 +1,63 @@
+import dataclasses
+
+import pytest
+
+from app.services import csv_cache, parser_csv, sheet_slices
+from app.services.parser import parse_sheet_file
+from bench.generator import group_codes, make_sheet
+
+
+@pytest.fixture
+def sheet():
+    codes = group_codes(30, seed=3)
+    return codes, make_sheet(codes, 3)
+
+
+def test_index_and_size(tmp_path, sheet):
+    codes, text = sheet
+    path = tmp_path / "gid_0.slc"
+    size = sheet_slices.write(path, text, sha256="abc")
+    with sheet_slices.SheetReader(path) as reader:
+        assert set(reader.groups) == set(codes)
+        assert reader.index["sha256"] == "abc"
+    assert size < len(text.encode("utf-8"))
+
+
+def test_projection_parses_like_the_full_sheet(tmp_path, sheet):
+    codes, text = sheet
+    path = tmp_path / "gid_0.slc"
+    sheet_slices.write(path, text)
+    with sheet_slices.SheetReader(path) as reader:
+        columns = dict(reader.groups)
+    full = parser_csv.parse_sheet(text, columns)
+
+    wanted = {code: columns[code] for code in codes[::7]}
+    projected, remapped = sheet_slices.read_projected(path, wanted)
+    assert set(remapped) == set(wanted)
+    assert parser_csv.parse_sheet(projected, remapped) == {code: full[code] for code in wanted}
+    assert parse_sheet_file(str(path), wanted, engine="csv") == {code: full[code] for code in wanted}
+
+    code = codes[0]
+    assert parser_csv.parse_schedule(sheet_slices.read_group_csv(path, columns[code]), code) == full[code]
+    assert sheet_slices.read_group_csv(path, 10_000) is None
+
+
+def test_foreign_file_is_rejected(tmp_path):
+    path = tmp_path / "gid_0.slc"
+    path.write_bytes(b"day,time\n" * 10)
+    with pytest.raises(ValueError):
+        sheet_slices.SheetReader(path)
+
+
+def test_raw_csv_import(tmp_path, monkeypatch, sheet):
+    codes, text = sheet
+    monkeypatch.setenv("CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(csv_cache, "cfg", dataclasses.replace(csv_cache.cfg, keep_raw_csv=False))
+    (tmp_path / "gid_4.csv").write_text(text, encoding="utf-8")
+
+    csv_cache.import_raw_files()
+    assert [p.name for p in csv_cache.list_cached_files()] == ["gid_4.slc"]
+    assert not (tmp_path / "gid_4.csv").exists()
+    index = csv_cache.build_group_index()
+    assert set(index) == set(codes)
+    assert {gid for gid, _ in index.values()} == {4}
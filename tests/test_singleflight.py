@@ -0,0 +1,53 @@
+import asyncio
+from datetime import datetime
+
+from aiogram.types import Chat, Message, User
+
+from app.middlewares.singleflight import SingleFlightMiddleware
+
+
+def _message(message_id: int, user_id: int, text: str) -> Message:
+    return Message(
+        message_id=message_id,
+        date=datetime.now(),
+        chat=Chat(id=user_id, type="private"),
+        from_user=User(id=user_id, is_bot=False, first_name="u"),
+        text=text,
+    )
+
+
+def _run_pair(first: Message, second: Message):
+    async def scenario():
+        mw = SingleFlightMiddleware()
+        calls = []
+        release = asyncio.Event()
+
+        async def handler(event, data):
+            calls.append(event.message_id)
+            await release.wait()
+            return event.message_id
+
+        tasks = [asyncio.create_task(mw(handler, first, {}))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(mw(handler, second, {})))
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*tasks)
+        return mw, calls, results
+
+    return asyncio.run(scenario())
+
+
+def test_identical_repeat_runs_handler_once():
+    mw, calls, results = _run_pair(_message(1, 7, "📋 Вся неделя"), _message(2, 7, "📋 Вся неделя"))
+    assert calls == [1]
+    assert results == [1, None]
+    assert mw.coalesced == 1
+    assert mw.in_flight == 0
+
+
+def test_different_requests_run_in_parallel():
+    mw, calls, results = _run_pair(_message(1, 7, "📅 Сегодня"), _message(2, 7, "📅 Завтра"))
+    assert calls == [1, 2]
+    assert results == [1, 2]
+    assert mw.coalesced == 0
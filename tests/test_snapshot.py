@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from app.services import csv_cache, schedule_store, snapshot
+from app.services.schedule_store import Lesson, ScheduleStore
+
+
+def _store() -> ScheduleStore:
+    a = Lesson("8251160", "Понедельник", "8:30", "в", "Физика", "Кремлевская", "101", "", "лекция", "Иванов И.И.")
+    b = Lesson("8251160", "Вторник", "10:10", "", "Химия", "Кремлевская", "", "", "", "")
+    c = Lesson("8251161", "Понедельник", "8:30", "в", "Физика", "Кремлевская", "101", "", "лекция", "Иванов И.И.")
+    return ScheduleStore({"8251160": (a, b), "8251161": (c,), "9999999": ()},
+                         {"8251160": (0, 3), "8251161": (0, 11)}, generation=5)
+
+
+def test_roundtrip(tmp_path):
+    store = _store()
+    hashes = {"0": "ab" * 32, "1": "cd" * 32}
+    snapshot_id = snapshot.save(str(tmp_path), store, hashes)
+
+    assert snapshot.read_id(str(tmp_path)) == snapshot_id
+    loaded_id, groups, sources, loaded_hashes = snapshot.load(str(tmp_path))
+    assert loaded_id == snapshot_id
+    assert groups == store.groups
+    assert sources == store.sources
+    assert loaded_hashes == hashes
+
+
+def test_strings_are_shared(tmp_path):
+    snapshot.save(str(tmp_path), _store())
+    _, groups, _, _ = snapshot.load(str(tmp_path))
+    assert groups["8251160"][0].subject is groups["8251161"][0].subject
+
+
+def test_missing_snapshot(tmp_path):
+    assert snapshot.load(str(tmp_path)) is None
+    assert snapshot.read_id(str(tmp_path)) is None
+
+
+@pytest.mark.parametrize("damage", [
+    lambda data: b"NOTSNAP\x00" + data[8:],
+    lambda data: data[:8] + (snapshot.VERSION + 1).to_bytes(2, "little") + data[10:],
+    lambda data: data[:20],
+])
+def test_damaged_or_foreign_snapshot_is_ignored(tmp_path, damage):
+    snapshot.save(str(tmp_path), _store())
+    path = tmp_path / snapshot.SNAPSHOT_FILE
+    path.write_bytes(damage(path.read_bytes()))
+    assert snapshot.load(str(tmp_path)) is None
+
+
+def test_warm_start_serves_snapshot_then_revalidates(tmp_path, monkeypatch):
+    store = _store()
+    snapshot.save(str(tmp_path), store, {"0": "old"})
+    seen, revalidated = [], []
+
+    async def revalidate(built_from):
+        # данные снимка уже отдаются, пока идёт проверка
+        seen.append((built_from, set(schedule_store.current().groups)))
+        schedule_store.install({"8251160": store.groups["8251160"]}, {"8251160": (0, 3)})
+
+    async def on_revalidated():
+        revalidated.append(schedule_store.current().generation)
+
+    async def scenario():
+        monkeypatch.setattr(csv_cache, "revalidate", revalidate)
+        assert await snapshot.warm_start(str(tmp_path), on_revalidated)
+        await snapshot._revalidate_task
+
+    asyncio.run(scenario())
+    assert seen == [({"0": "old"}, set(store.groups))]
+    assert len(revalidated) == 1
+    assert set(schedule_store.current().groups) == {"8251160"}
+
+
+def test_warm_start_without_snapshot(tmp_path):
+    async def never():
+        raise AssertionError
+
+    assert not asyncio.run(snapshot.warm_start(str(tmp_path), never))
@@ -0,0 +1,53 @@
+import asyncio
+
+from aiogram import Dispatcher
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from app.services.webhook import BoundedRequestHandler
+from bench.fake_bot import fake_bot, message_update
+
+PATH = "/webhook"
+SECRET = "s3cret"
+HEADERS = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+
+
+def test_backlog_is_bounded():
+    async def scenario():
+        release = asyncio.Event()
+        handled = []
+        dp = Dispatcher()
+
+        @dp.message()
+        async def on_message(message):
+            await release.wait()
+            handled.append(message.message_id)
+
+        handler = BoundedRequestHandler(dispatcher=dp, bot=fake_bot(), secret_token=SECRET, max_pending=2)
+        app = web.Application()
+        handler.register(app, path=PATH)
+
+        async with TestClient(TestServer(app)) as client:
+            statuses = []
+            for i in range(1, 4):
+                resp = await client.post(PATH, json=message_update(i, 1, "/start"), headers=HEADERS)
+                statuses.append(resp.status)
+            unauthorized = (await client.post(PATH, json=message_update(9, 1, "/start"))).status
+            pending = handler.pending
+
+            release.set()
+            while handler.pending:
+                await asyncio.sleep(0.01)
+            # очередь освободилась — повторная доставка принимается
+            retry = (await client.post(PATH, json=message_update(3, 1, "/start"), headers=HEADERS)).status
+            while handler.pending:
+                await asyncio.sleep(0.01)
+        return statuses, unauthorized, pending, retry, handled, handler.rejected
+
+    statuses, unauthorized, pending, retry, handled, rejected = asyncio.run(scenario())
+    assert statuses == [200, 200, 503]
+    assert unauthorized == 401
+    assert pending == 2
+    assert retry == 200
+    assert sorted(handled) == [1, 2, 3]
+    assert rejected == 1